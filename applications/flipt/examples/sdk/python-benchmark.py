@@ -0,0 +1,501 @@
+"""
+Flipt Python SDK Benchmark
+
+Load generator for the clients in python-example.py. Two modes:
+
+client   Concurrent evaluations through FliptClient and CachedFliptClient
+         with a configurable workload (entities, flags, context cardinality,
+         boolean/variant mix). Reports p50/p95/p99 latency, requests per
+         second, cache hit rate and the rate of failed Flipt calls, optionally
+         as JSON for regression tracking. Exits non-zero when the error rate
+         exceeds --max-error-rate.
+
+fastapi  Requests per second through the FastAPI example, comparing one
+         AsyncFliptClient shared for the app's lifetime (the example's
+         lifespan setup) with a new client, and new connections, per request.
+
+Both run against FLIPT_URL, or against an in-process stub Flipt server with
+--stub. The stub serves flags generated for the workload and evaluates them
+with LocalEvaluator, so no Flipt instance is needed.
+
+Install: pip install requests httpx fastapi
+Usage:
+    export FLIPT_URL=http://localhost:8080
+    python python-benchmark.py client --provision --concurrency 16 --duration 10
+    python python-benchmark.py client --stub --entities 100000 --output bench.json
+    python python-benchmark.py fastapi --duration 10 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import hashlib
+import importlib.util
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import requests
+
+SDK_EXAMPLE = Path(__file__).resolve().parent / "python-example.py"
+NAMESPACE = "default"
+PLANS = ["free", "pro", "enterprise", "team", "trial", "edu", "gov", "startup"]
+
+
+def load_sdk_example():
+    """Import python-example.py (not importable by name)"""
+    spec = importlib.util.spec_from_file_location("flipt_sdk_example", SDK_EXAMPLE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# ---------------------------------------------------------------------------
+# Workload flags
+# ---------------------------------------------------------------------------
+
+def workload_flags(flags: int, variant_ratio: float):
+    """Return (boolean_flag_keys, variant_flag_keys) for the workload"""
+    variants = round(flags * variant_ratio)
+    return (
+        [f"bench-bool-{i}" for i in range(flags - variants)],
+        [f"bench-variant-{i}" for i in range(variants)],
+    )
+
+
+def build_snapshot(boolean_flags, variant_flags):
+    """A namespace snapshot targeting the 'plan' context key, for the stub"""
+    segment = {
+        "key": "bench-paid",
+        "matchType": "ANY_SEGMENT_MATCH_TYPE",
+        "constraints": [{
+            "type": "STRING_CONSTRAINT_COMPARISON_TYPE",
+            "property": "plan",
+            "operator": "isoneof",
+            "value": json.dumps(["pro", "enterprise", "team"]),
+        }],
+    }
+    flags = []
+    for key in boolean_flags:
+        flags.append({
+            "key": key,
+            "enabled": False,
+            "type": "BOOLEAN_FLAG_TYPE",
+            "rollouts": [
+                {"rank": 1, "type": "SEGMENT_ROLLOUT_TYPE",
+                 "segment": {"value": True, "segments": [segment]}},
+                {"rank": 2, "type": "THRESHOLD_ROLLOUT_TYPE",
+                 "threshold": {"percentage": 25.0, "value": True}},
+            ],
+        })
+    for key in variant_flags:
+        flags.append({
+            "key": key,
+            "enabled": True,
+            "type": "VARIANT_FLAG_TYPE",
+            "rules": [{
+                "rank": 1,
+                "segments": [segment],
+                "distributions": [
+                    {"variant": {"key": "control"}, "rollout": 50.0},
+                    {"variant": {"key": "treatment"}, "rollout": 50.0},
+                ],
+            }],
+        })
+    return {"namespace": {"key": NAMESPACE}, "flags": flags}
+
+
+class StubFlipt:
+    """In-process stand-in for Flipt's evaluation and snapshot endpoints
+
+    The snapshot endpoint honours If-None-Match, and set_snapshot() swaps
+    the flags being served, so flag watchers can be exercised too.
+    """
+
+    def __init__(self, sdk, snapshot, latency_ms: float = 0.0):
+        self.sdk = sdk
+        self.latency_ms = latency_ms
+        self.set_snapshot(snapshot)
+        stub = self
+
+        def evaluate(req):
+            flag = stub.evaluator.flags.get(req.get("flagKey"))
+            if flag is None:
+                return {"errorResponse": {"flagKey": req.get("flagKey"), "reason": "NOT_FOUND_ERROR_EVALUATION_REASON"}}
+            args = (req["flagKey"], req.get("entityId", ""), req.get("context"))
+            if flag["type"] == "BOOLEAN_FLAG_TYPE":
+                return {"booleanResponse": stub.evaluator.evaluate_boolean(*args)}
+            return {"variantResponse": stub.evaluator.evaluate_variant(*args)}
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately; avoid delayed-ACK stalls
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, payload, headers=()):
+                data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if stub.latency_ms:
+                    time.sleep(stub.latency_ms / 1000)
+                if "/snapshot/namespace/" in self.path:
+                    body, etag = stub.body, stub.etag
+                    if self.headers.get("If-None-Match") == etag:
+                        return self._reply(304, b"", [("ETag", etag)])
+                    return self._reply(200, body, [("ETag", etag)])
+                self._reply(404, {"message": "not found"})
+
+            def do_POST(self):
+                req = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if stub.latency_ms:
+                    time.sleep(stub.latency_ms / 1000)
+                if self.path.endswith("/batch"):
+                    return self._reply(200, {"responses": [evaluate(r) for r in req.get("requests", [])]})
+                result = evaluate(req)
+                kind = "booleanResponse" if self.path.endswith("/boolean") else "variantResponse"
+                if kind in result:
+                    return self._reply(200, result[kind])
+                self._reply(400, {"message": "wrong flag type or flag not found"})
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def set_snapshot(self, snapshot):
+        """Serve *snapshot* from now on"""
+        body = json.dumps(snapshot).encode()
+        self.evaluator = self.sdk.LocalEvaluator(snapshot)
+        self.body, self.etag = body, f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def provision(url, boolean_flags, variant_flags):
+    """Create the workload flags on a real Flipt instance"""
+    session = requests.Session()
+    api = f"{url}/api/v1/namespaces/{NAMESPACE}"
+
+    def create(path, payload):
+        resp = session.post(f"{api}{path}", json=payload, timeout=10)
+        if resp.status_code not in (200, 409):
+            raise SystemExit(f"Provisioning {path} failed: {resp.status_code} {resp.text}")
+        return resp.json() if resp.status_code == 200 else {}
+
+    create("/segments", {"key": "bench-paid", "name": "bench-paid", "matchType": "ANY_MATCH_TYPE"})
+    create("/segments/bench-paid/constraints", {
+        "type": "STRING_COMPARISON_TYPE", "property": "plan", "operator": "isoneof",
+        "value": json.dumps(["pro", "enterprise", "team"]),
+    })
+    for key in boolean_flags:
+        create("/flags", {"key": key, "name": key, "type": "BOOLEAN_FLAG_TYPE", "enabled": False})
+        create(f"/flags/{key}/rollouts", {
+            "rank": 1, "type": "SEGMENT_ROLLOUT_TYPE",
+            "segment": {"segmentKey": "bench-paid", "value": True},
+        })
+        create(f"/flags/{key}/rollouts", {
+            "rank": 2, "type": "THRESHOLD_ROLLOUT_TYPE",
+            "threshold": {"percentage": 25.0, "value": True},
+        })
+    for key in variant_flags:
+        create("/flags", {"key": key, "name": key, "type": "VARIANT_FLAG_TYPE", "enabled": True})
+        variant_ids = [
+            create(f"/flags/{key}/variants", {"key": v}).get("id") for v in ("control", "treatment")
+        ]
+        rule = create(f"/flags/{key}/rules", {"segmentKey": "bench-paid", "rank": 1})
+        if rule.get("id"):
+            for variant_id in variant_ids:
+                create(f"/flags/{key}/rules/{rule['id']}/distributions", {
+                    "variantId": variant_id, "rollout": 50.0,
+                })
+
+
+def cleanup(url, boolean_flags, variant_flags):
+    session = requests.Session()
+    api = f"{url}/api/v1/namespaces/{NAMESPACE}"
+    for key in boolean_flags + variant_flags:
+        session.delete(f"{api}/flags/{key}", timeout=10)
+    session.delete(f"{api}/segments/bench-paid", timeout=10)
+
+
+# ---------------------------------------------------------------------------
+# client mode
+# ---------------------------------------------------------------------------
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def error_summary(metrics):
+    """Flipt calls recorded by a FlagMetrics instance, by outcome
+
+    Failed calls still return a default to the caller, so they only show up
+    here: anything but "ok" (errors, timeouts, short circuits) counts.
+    """
+    outcomes = {}
+    for key, count in metrics.snapshot()["outcomes"].items():
+        outcome = key.rsplit(":", 1)[1]
+        outcomes[outcome] = outcomes.get(outcome, 0) + count
+    calls = sum(outcomes.values())
+    errors = calls - outcomes.get("ok", 0)
+    return {
+        "flipt_calls": calls,
+        "errors": errors,
+        "error_rate": round(errors / calls, 4) if calls else 0.0,
+        "outcomes": outcomes,
+    }
+
+
+def run_workload(client, boolean_flags, variant_flags, args):
+    """Evaluate random (entity, flag, context) triples from worker threads"""
+    all_flags = [(k, False) for k in boolean_flags] + [(k, True) for k in variant_flags]
+    plans = PLANS[: max(1, args.context_cardinality)]
+    deadline = time.monotonic() + args.duration
+    per_worker = args.requests // args.concurrency if args.requests else None
+
+    def worker(seed):
+        rng = random.Random(seed)
+        latencies = []
+        while (per_worker is None and time.monotonic() < deadline) or (
+            per_worker is not None and len(latencies) < per_worker
+        ):
+            flag_key, is_variant = rng.choice(all_flags)
+            entity_id = f"entity-{rng.randrange(args.entities)}"
+            context = {"plan": rng.choice(plans), "region": f"region-{rng.randrange(4)}"}
+            evaluate = client.evaluate_variant if is_variant else client.evaluate_boolean
+            start = time.perf_counter()
+            evaluate(NAMESPACE, flag_key, entity_id, context)
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(worker, range(args.concurrency)))
+    elapsed = time.monotonic() - start
+
+    latencies = sorted(l for worker_latencies in results for l in worker_latencies)
+    return {
+        "requests": len(latencies),
+        "elapsed_seconds": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 3),
+            "p95": round(percentile(latencies, 95) * 1000, 3),
+            "p99": round(percentile(latencies, 99) * 1000, 3),
+            "max": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        },
+    }
+
+
+def cmd_client(sdk, args):
+    boolean_flags, variant_flags = workload_flags(args.flags, args.variant_ratio)
+
+    def run(url):
+        results = {}
+        if "raw" in args.clients:
+            print(f"Running FliptClient workload against {url} ...")
+            metrics = sdk.FlagMetrics()
+            client = sdk.FliptClient(url=url, instrumentation=metrics)
+            results["raw"] = run_workload(client, boolean_flags, variant_flags, args)
+            results["raw"].update(error_summary(metrics))
+        if "cached" in args.clients:
+            print(f"Running CachedFliptClient workload against {url} ...")
+            metrics = sdk.FlagMetrics()
+            cached = sdk.CachedFliptClient(
+                sdk.FliptClient(url=url, instrumentation=metrics),
+                ttl_seconds=args.ttl,
+                max_size=args.cache_size,
+            )
+            cached.load_context_keys(NAMESPACE)
+            results["cached"] = run_workload(cached, boolean_flags, variant_flags, args)
+            results["cached"].update(error_summary(metrics))
+            stats = cached.cache.stats()
+            lookups = stats["hits"] + stats["misses"]
+            results["cached"]["cache"] = {
+                **stats,
+                "hit_rate": round(stats["hits"] / lookups, 4) if lookups else 0.0,
+            }
+        return results
+
+    if args.stub:
+        snapshot = build_snapshot(boolean_flags, variant_flags)
+        with StubFlipt(sdk, snapshot, latency_ms=args.stub_latency_ms) as stub:
+            results = run(stub.url)
+    else:
+        url = os.getenv("FLIPT_URL", "http://localhost:8080").rstrip("/")
+        if args.provision:
+            provision(url, boolean_flags, variant_flags)
+        try:
+            results = run(url)
+        finally:
+            if args.provision:
+                cleanup(url, boolean_flags, variant_flags)
+
+    report = {
+        "workload": {
+            "target": "stub" if args.stub else "flipt",
+            "concurrency": args.concurrency,
+            "duration_seconds": None if args.requests else args.duration,
+            "requests": args.requests,
+            "entities": args.entities,
+            "flags": args.flags,
+            "variant_ratio": args.variant_ratio,
+            "context_cardinality": args.context_cardinality,
+            "ttl_seconds": args.ttl,
+            "cache_size": args.cache_size,
+            "max_error_rate": args.max_error_rate,
+        },
+        "results": results,
+    }
+
+    print(f"\n{'client':<8} {'requests':>9} {'rps':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'hit rate':>9} {'errors':>8}")
+    for name, r in results.items():
+        hit_rate = f"{r['cache']['hit_rate']:.1%}" if "cache" in r else "-"
+        lat = r["latency_ms"]
+        print(f"{name:<8} {r['requests']:>9} {r['rps']:>10.1f} {lat['p50']:>8.3f} {lat['p95']:>8.3f} {lat['p99']:>8.3f} {hit_rate:>9} {r['error_rate']:>8.2%}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+    # Failed evaluations return defaults fast; don't let them pass as a speedup
+    failing = {
+        name: r["outcomes"] for name, r in results.items() if r["error_rate"] > args.max_error_rate
+    }
+    if failing:
+        for name, outcomes in failing.items():
+            print(f"{name}: error rate {results[name]['error_rate']:.2%} exceeds "
+                  f"{args.max_error_rate:.2%} (Flipt calls by outcome: {outcomes})")
+        raise SystemExit(1)
+
+
+# ---------------------------------------------------------------------------
+# fastapi mode
+# ---------------------------------------------------------------------------
+
+def create_per_request_app(sdk):
+    """The FastAPI example, but building a new client for every request"""
+    app = sdk.create_fastapi_app()
+
+    async def per_request_flags(request: sdk.Request):
+        async with sdk.AsyncFliptClient() as client:
+            yield sdk.AsyncLazyFlags(client, request.headers.get("X-User-ID", "anonymous"))
+
+    app.dependency_overrides[sdk.get_feature_flags] = per_request_flags
+    return app
+
+
+async def drive(app, path: str, duration: float, concurrency: int) -> float:
+    """Hit *path* from *concurrency* workers for *duration* seconds, return RPS"""
+    import httpx
+
+    completed = 0
+
+    async def worker(client: "httpx.AsyncClient", n: int):
+        nonlocal completed
+        deadline = time.monotonic() + duration
+        i = 0
+        while time.monotonic() < deadline:
+            resp = await client.get(path, headers={"X-User-ID": f"user-{n}-{i}"})
+            resp.raise_for_status()
+            completed += 1
+            i += 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            start = time.monotonic()
+            await asyncio.gather(*(worker(client, n) for n in range(concurrency)))
+            elapsed = time.monotonic() - start
+
+    return completed / elapsed
+
+
+def cmd_fastapi(sdk, args):
+    if sdk.create_fastapi_app is None:
+        raise SystemExit("FastAPI and httpx are required: pip install fastapi httpx")
+
+    def run():
+        scenarios = {
+            "per-request": create_per_request_app(sdk),
+            "shared": sdk.create_fastapi_app(max_connections=args.concurrency),
+        }
+        results = {}
+        for name, app in scenarios.items():
+            print(f"Running {name} client for {args.duration}s at concurrency {args.concurrency} ...")
+            results[name] = asyncio.run(drive(app, args.path, args.duration, args.concurrency))
+            print(f"  {results[name]:.0f} req/s")
+        return results
+
+    if args.stub:
+        snapshot = build_snapshot(sdk.DEFAULT_FLAGS, [])
+        with StubFlipt(sdk, snapshot, args.stub_latency_ms) as stub:
+            os.environ["FLIPT_URL"] = stub.url
+            results = run()
+    else:
+        results = run()
+
+    print(f"\nSpeedup (shared vs per-request): {results['shared'] / results['per-request']:.2f}x")
+
+
+def main():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--stub", action="store_true", help="Run against an in-process stub instead of FLIPT_URL")
+    common.add_argument("--stub-latency-ms", type=float, default=0.0, help="Artificial latency added by the stub")
+    common.add_argument("--duration", type=float, default=10, help="Seconds per scenario")
+    common.add_argument("--concurrency", type=int, default=16, help="Concurrent workers")
+
+    parser = argparse.ArgumentParser(description="Flipt Python SDK benchmark")
+    modes = parser.add_subparsers(dest="mode", required=True)
+
+    client = modes.add_parser("client", parents=[common], help="FliptClient / CachedFliptClient workload")
+    client.add_argument("--clients", nargs="+", choices=["raw", "cached"], default=["raw", "cached"])
+    client.add_argument("--requests", type=int, default=0, help="Total evaluations (overrides --duration)")
+    client.add_argument("--entities", type=int, default=10000, help="Distinct entity IDs")
+    client.add_argument("--flags", type=int, default=20, help="Distinct flags")
+    client.add_argument("--variant-ratio", type=float, default=0.25, help="Fraction of flags that are variant flags")
+    client.add_argument("--context-cardinality", type=int, default=4, help=f"Distinct 'plan' values (max {len(PLANS)})")
+    client.add_argument("--ttl", type=float, default=60, help="CachedFliptClient TTL in seconds")
+    client.add_argument("--cache-size", type=int, default=10000, help="CachedFliptClient max entries")
+    client.add_argument("--provision", action="store_true", help="Create (and afterwards delete) the workload flags in Flipt")
+    client.add_argument("--output", help="Write results as JSON to this file")
+    client.add_argument("--max-error-rate", type=float, default=0.01,
+                        help="Exit non-zero if more than this fraction of Flipt calls fail")
+
+    fastapi = modes.add_parser("fastapi", parents=[common], help="Shared vs per-request client in the FastAPI example")
+    fastapi.add_argument("--path", default="/dashboard", help="FastAPI route to request")
+
+    args = parser.parse_args()
+    sdk = load_sdk_example()
+    if args.mode == "client":
+        cmd_client(sdk, args)
+    else:
+        cmd_fastapi(sdk, args)
+
+
+if __name__ == "__main__":
+    main()
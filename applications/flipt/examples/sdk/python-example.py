@@ -8,31 +8,311 @@ Install: pip install flipt
 """
 
 import os
-from typing import Dict, Optional
-from datetime import datetime, timedelta
+import asyncio
+import bisect
+import hashlib
+import json
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar, copy_context
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from datetime import datetime, timezone
 import requests
 
 
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised instead of calling Flipt while the circuit breaker is open"""
+
+
+class LatencyBudgetExceeded(requests.exceptions.Timeout):
+    """Raised instead of calling Flipt once the request's latency budget is spent"""
+
+
+class CircuitBreaker:
+    """Stops calling Flipt after repeated failures
+
+    After *failure_threshold* consecutive failures the breaker opens and
+    calls fail fast with CircuitOpenError. After *reset_timeout* seconds a
+    single probe call is let through; success closes the breaker, failure
+    opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.short_circuited = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Return True if a call may go through to Flipt"""
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            if self.state == self.CLOSED:
+                return True
+            self.short_circuited += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (
+                self.state == self.CLOSED and self.failures >= self.failure_threshold
+            ):
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self.trips += 1
+
+    def record_inconclusive(self) -> None:
+        """Note a call that says nothing about Flipt's health"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                # Let the next call probe again
+                self.state = self.OPEN
+                self._opened_at = time.monotonic() - self.reset_timeout
+
+    def stats(self) -> Dict[str, Any]:
+        """Breaker state and counters, for metrics"""
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "trips": self.trips,
+            "short_circuited": self.short_circuited,
+        }
+
+
+_latency_budget: ContextVar[Optional[float]] = ContextVar("flipt_latency_budget", default=None)
+
+
+@contextmanager
+def latency_budget(seconds: float):
+    """Share a latency budget across every flag evaluated inside the block
+
+    Each Flipt call's timeout is capped at the time left; once the budget
+    is spent, evaluations return their defaults without calling Flipt.
+    """
+    token = _latency_budget.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _latency_budget.reset(token)
+
+
+class Instrumentation:
+    """Receives flag evaluation and cache events
+
+    Pass an instance as *instrumentation* to FliptClient, AsyncFliptClient or
+    CachedFliptClient and override the hooks you need. Clients skip all
+    bookkeeping when no instrumentation is set.
+    """
+
+    def on_evaluation(
+        self, kind: str, namespace_key: str, flag_key: str, duration: float, outcome: str
+    ) -> None:
+        """Called after every call to Flipt
+
+        *kind* is "boolean" or "variant", *duration* is in seconds and
+        *outcome* one of "ok", "error", "timeout", "short_circuit" or
+        "budget_exceeded".
+        """
+
+    def on_cache(self, event: str, namespace_key: str, flag_key: str) -> None:
+        """Called on every cache lookup with *event* "hit", "stale" or "miss",
+        and with "refresh_error" when a background refresh fails
+        """
+
+
+def _error_outcome(error: Exception) -> str:
+    if isinstance(error, CircuitOpenError):
+        return "short_circuit"
+    if isinstance(error, LatencyBudgetExceeded):
+        return "budget_exceeded"
+    if isinstance(error, requests.exceptions.Timeout):
+        return "timeout"
+    return "error"
+
+
+class FlagMetrics(Instrumentation):
+    """In-process per-flag latency histograms and outcome counters"""
+
+    BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency: Dict[str, List[int]] = {}
+        self.latency_sum: Dict[str, float] = {}
+        self.outcomes: Dict[Tuple[str, str], int] = {}
+        self.cache: Dict[Tuple[str, str], int] = {}
+
+    def on_evaluation(self, kind, namespace_key, flag_key, duration, outcome):
+        key = f"{namespace_key}/{flag_key}"
+        bucket = bisect.bisect_left(self.BUCKETS, duration)
+        with self._lock:
+            counts = self.latency.setdefault(key, [0] * (len(self.BUCKETS) + 1))
+            counts[bucket] += 1
+            self.latency_sum[key] = self.latency_sum.get(key, 0.0) + duration
+            self.outcomes[(key, outcome)] = self.outcomes.get((key, outcome), 0) + 1
+
+    def on_cache(self, event, namespace_key, flag_key):
+        key = (f"{namespace_key}/{flag_key}", event)
+        with self._lock:
+            self.cache[key] = self.cache.get(key, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current histograms (bucket upper bounds in seconds) and counters"""
+        with self._lock:
+            return {
+                "buckets": list(self.BUCKETS) + ["+Inf"],
+                "latency": {k: list(v) for k, v in self.latency.items()},
+                "latency_sum": dict(self.latency_sum),
+                "outcomes": {f"{k}:{o}": n for (k, o), n in self.outcomes.items()},
+                "cache": {f"{k}:{e}": n for (k, e), n in self.cache.items()},
+            }
+
+
+try:
+    from opentelemetry import metrics, trace
+
+    class OpenTelemetryInstrumentation(Instrumentation):
+        """Records evaluations as OpenTelemetry spans and metrics
+
+        Install: pip install opentelemetry-api (plus an SDK and exporter)
+        """
+
+        def __init__(self, meter_provider=None, tracer_provider=None):
+            meter = metrics.get_meter("flipt.client", meter_provider=meter_provider)
+            self.tracer = trace.get_tracer("flipt.client", tracer_provider=tracer_provider)
+            self.duration = meter.create_histogram(
+                "flipt.evaluation.duration", unit="s", description="Flipt flag evaluation latency"
+            )
+            self.evaluations = meter.create_counter(
+                "flipt.evaluations", description="Flipt flag evaluations by outcome"
+            )
+            self.cache_lookups = meter.create_counter(
+                "flipt.cache.lookups", description="Flag cache lookups by result"
+            )
+
+        def on_evaluation(self, kind, namespace_key, flag_key, duration, outcome):
+            attributes = {
+                "flipt.kind": kind,
+                "flipt.namespace": namespace_key,
+                "flipt.flag": flag_key,
+                "flipt.outcome": outcome,
+            }
+            self.duration.record(duration, attributes)
+            self.evaluations.add(1, attributes)
+
+            # The hook fires after the call, so back-date the span's start
+            end = time.time_ns()
+            span = self.tracer.start_span(
+                f"flipt.evaluate_{kind}",
+                start_time=end - int(duration * 1e9),
+                attributes=attributes,
+            )
+            if outcome != "ok":
+                span.set_status(trace.Status(trace.StatusCode.ERROR, outcome))
+            span.end(end_time=end)
+
+        def on_cache(self, event, namespace_key, flag_key):
+            self.cache_lookups.add(
+                1, {"flipt.namespace": namespace_key, "flipt.flag": flag_key, "flipt.cache": event}
+            )
+
+except ImportError:
+    print("OpenTelemetry not installed, skipping OpenTelemetry instrumentation")
+    OpenTelemetryInstrumentation = None
+
+
 class FliptClient:
     """Simple Flipt HTTP client for Python"""
 
-    def __init__(self, url: str = None, auth_token: str = None):
+    def __init__(
+        self,
+        url: str = None,
+        auth_token: str = None,
+        connect_timeout: float = 1.0,
+        read_timeout: float = 2.0,
+        breaker: Optional[CircuitBreaker] = None,
+        instrumentation: Optional[Instrumentation] = None,
+    ):
         self.url = url or os.getenv("FLIPT_URL", "http://flipt.flipt.svc.cluster.local:8080")
         self.auth_token = auth_token
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.instrumentation = instrumentation
         self.session = requests.Session()
+        self._batch_supported = True
+        # Shared by evaluate_batch's per-flag fallback; threads start on first use
+        self._executor = ThreadPoolExecutor(max_workers=10, thread_name_prefix="flipt-batch")
 
         if self.auth_token:
             self.session.headers.update({"Authorization": f"Bearer {self.auth_token}"})
 
-    def evaluate_boolean(
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Send a request with timeouts, the latency budget and the circuit breaker"""
+        connect_timeout, read_timeout = self.connect_timeout, self.read_timeout
+        deadline = _latency_budget.get()
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise LatencyBudgetExceeded("latency budget exhausted")
+            connect_timeout = min(connect_timeout, remaining)
+            read_timeout = min(read_timeout, remaining)
+
+        if not self.breaker.allow():
+            raise CircuitOpenError("circuit breaker is open")
+
+        try:
+            response = self.session.request(
+                method, url, timeout=(connect_timeout, read_timeout), **kwargs
+            )
+        except requests.exceptions.Timeout:
+            # A timeout cut short by the budget says nothing about Flipt's health
+            if read_timeout < self.read_timeout:
+                self.breaker.record_inconclusive()
+            else:
+                self.breaker.record_failure()
+            raise
+        except requests.exceptions.RequestException:
+            self.breaker.record_failure()
+            raise
+
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        response.raise_for_status()
+        return response
+
+    def _evaluate(
         self,
+        kind: str,
         namespace_key: str,
         flag_key: str,
         entity_id: str,
-        context: Optional[Dict[str, str]] = None,
-    ) -> bool:
-        """Evaluate a boolean feature flag"""
-        url = f"{self.url}/api/v1/evaluate/v1/boolean"
+        context: Optional[Dict[str, str]],
+    ) -> Dict[str, Any]:
+        """Call Flipt's boolean or variant endpoint, raising on failure"""
+        url = f"{self.url}/api/v1/evaluate/v1/{kind}"
 
         payload = {
             "namespaceKey": namespace_key,
@@ -41,11 +321,52 @@ class FliptClient:
             "context": context or {},
         }
 
+        start = time.perf_counter()
+        outcome = "ok"
+        try:
+            response = self._request("POST", url, json=payload)
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            outcome = _error_outcome(e)
+            raise
+        finally:
+            if self.instrumentation is not None:
+                self.instrumentation.on_evaluation(
+                    kind, namespace_key, flag_key, time.perf_counter() - start, outcome
+                )
+
+    def evaluate_boolean_or_raise(
+        self,
+        namespace_key: str,
+        flag_key: str,
+        entity_id: str,
+        context: Optional[Dict[str, str]] = None,
+    ) -> bool:
+        """Evaluate a boolean feature flag, raising RequestException on failure"""
+        data = self._evaluate("boolean", namespace_key, flag_key, entity_id, context)
+        return data.get("enabled", False)
+
+    def evaluate_variant_or_raise(
+        self,
+        namespace_key: str,
+        flag_key: str,
+        entity_id: str,
+        context: Optional[Dict[str, str]] = None,
+    ) -> Optional[str]:
+        """Evaluate a variant feature flag, raising RequestException on failure"""
+        data = self._evaluate("variant", namespace_key, flag_key, entity_id, context)
+        return data.get("variantKey")
+
+    def evaluate_boolean(
+        self,
+        namespace_key: str,
+        flag_key: str,
+        entity_id: str,
+        context: Optional[Dict[str, str]] = None,
+    ) -> bool:
+        """Evaluate a boolean feature flag"""
         try:
-            response = self.session.post(url, json=payload)
-            response.raise_for_status()
-            data = response.json()
-            return data.get("enabled", False)
+            return self.evaluate_boolean_or_raise(namespace_key, flag_key, entity_id, context)
         except requests.exceptions.RequestException as e:
             print(f"Error evaluating flag: {e}")
             return False  # Default to false on error
@@ -58,24 +379,329 @@ class FliptClient:
         context: Optional[Dict[str, str]] = None,
     ) -> Optional[str]:
         """Evaluate a variant feature flag"""
-        url = f"{self.url}/api/v1/evaluate/v1/variant"
-
-        payload = {
-            "namespaceKey": namespace_key,
-            "flagKey": flag_key,
-            "entityId": entity_id,
-            "context": context or {},
-        }
-
         try:
-            response = self.session.post(url, json=payload)
-            response.raise_for_status()
-            data = response.json()
-            return data.get("variantKey")
+            return self.evaluate_variant_or_raise(namespace_key, flag_key, entity_id, context)
         except requests.exceptions.RequestException as e:
             print(f"Error evaluating variant: {e}")
             return None
 
+    def evaluate_batch(
+        self,
+        namespace_key: str,
+        flag_keys: List[str],
+        entity_id: str,
+        context: Optional[Dict[str, str]] = None,
+        variant_flags: Iterable[str] = (),
+    ) -> Dict[str, Any]:
+        """Evaluate several flags in a single round trip.
+
+        Returns a dict of flag key to result: a bool for boolean flags and the
+        variant key (or None) for variant flags. Flags that fail to evaluate
+        get the same defaults as evaluate_boolean / evaluate_variant. If the
+        server has no batch endpoint (405 or 501), the flags are evaluated
+        concurrently one by one instead, using evaluate_variant for keys in
+        *variant_flags* and evaluate_boolean for everything else.
+        """
+        variant_flags = set(variant_flags)
+
+        if self._batch_supported:
+            try:
+                return self._evaluate_batch_request(
+                    namespace_key, flag_keys, entity_id, context, variant_flags
+                )
+            except requests.exceptions.HTTPError as e:
+                # A 404 is a missing namespace or flag, not a missing endpoint
+                if e.response is None or e.response.status_code not in (405, 501):
+                    print(f"Error evaluating batch: {e}")
+                    return self._batch_defaults(flag_keys, variant_flags)
+                self._batch_supported = False
+            except requests.exceptions.RequestException as e:
+                print(f"Error evaluating batch: {e}")
+                return self._batch_defaults(flag_keys, variant_flags)
+
+        def evaluate(flag_key: str):
+            if flag_key in variant_flags:
+                return self.evaluate_variant(namespace_key, flag_key, entity_id, context)
+            return self.evaluate_boolean(namespace_key, flag_key, entity_id, context)
+
+        if not flag_keys:
+            return {}
+        # Run each call in a copy of our context so the latency budget applies
+        contexts = [copy_context() for _ in flag_keys]
+        results = self._executor.map(lambda ctx, k: ctx.run(evaluate, k), contexts, flag_keys)
+        return dict(zip(flag_keys, results))
+
+    def _evaluate_batch_request(
+        self,
+        namespace_key: str,
+        flag_keys: List[str],
+        entity_id: str,
+        context: Optional[Dict[str, str]],
+        variant_flags: set,
+    ) -> Dict[str, Any]:
+        url = f"{self.url}/evaluate/v1/batch"
+
+        payload = {
+            "requests": [
+                {
+                    "namespaceKey": namespace_key,
+                    "flagKey": flag_key,
+                    "entityId": entity_id,
+                    "context": context or {},
+                }
+                for flag_key in flag_keys
+            ]
+        }
+
+        response = self._request("POST", url, json=payload)
+        data = response.json()
+
+        return self._parse_batch_response(
+            data, flag_keys, self._batch_defaults(flag_keys, variant_flags)
+        )
+
+    @staticmethod
+    def _parse_batch_response(
+        data: Dict[str, Any], flag_keys: List[str], defaults: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        # Responses come back in request order
+        results = dict(defaults)
+        for flag_key, item in zip(flag_keys, data.get("responses", [])):
+            if "booleanResponse" in item:
+                results[flag_key] = item["booleanResponse"].get("enabled", False)
+            elif "variantResponse" in item:
+                results[flag_key] = item["variantResponse"].get("variantKey") or None
+            else:
+                error = item.get("errorResponse", {})
+                print(f"Error evaluating flag {flag_key}: {error.get('reason')}")
+        return results
+
+    @staticmethod
+    def _batch_defaults(flag_keys: List[str], variant_flags: set) -> Dict[str, Any]:
+        return {k: None if k in variant_flags else False for k in flag_keys}
+
+    def get_snapshot(self, namespace_key: str) -> Dict[str, Any]:
+        """Fetch the full evaluation state (flags, rules, rollouts) of a namespace"""
+        snapshot, _ = self.poll_snapshot(namespace_key)
+        return snapshot
+
+    def poll_snapshot(
+        self, namespace_key: str, etag: Optional[str] = None
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """Fetch a namespace snapshot unless it still matches *etag*
+
+        Returns (snapshot, etag); snapshot is None when nothing has changed.
+        """
+        url = f"{self.url}/internal/v1/evaluation/snapshot/namespace/{namespace_key}"
+        headers = {"If-None-Match": etag} if etag else {}
+
+        response = self._request("GET", url, headers=headers)
+        if response.status_code == 304:
+            return None, etag
+        return response.json(), response.headers.get("ETag")
+
+
+# Asyncio client, for use from async frameworks such as FastAPI
+try:
+    import httpx
+
+    class AsyncFliptClient:
+        """Asyncio Flipt HTTP client with a bounded keep-alive connection pool
+
+        Install: pip install httpx (or httpx[http2] for http2=True)
+        """
+
+        def __init__(
+            self,
+            url: str = None,
+            auth_token: str = None,
+            max_connections: int = 100,
+            max_keepalive_connections: int = 20,
+            http2: bool = False,
+            timeout: float = 2.0,
+            retries: int = 2,
+            instrumentation: Optional[Instrumentation] = None,
+        ):
+            self.url = url or os.getenv("FLIPT_URL", "http://flipt.flipt.svc.cluster.local:8080")
+            self.auth_token = auth_token
+            self.instrumentation = instrumentation
+            self._batch_supported = True
+
+            headers = {}
+            if self.auth_token:
+                headers["Authorization"] = f"Bearer {self.auth_token}"
+
+            # HTTP/2 multiplexes concurrent evaluations over a few connections.
+            # Transport retries only cover failed connection attempts.
+            transport = httpx.AsyncHTTPTransport(
+                http2=http2,
+                retries=retries,
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_keepalive_connections,
+                ),
+            )
+            self.session = httpx.AsyncClient(
+                headers=headers,
+                transport=transport,
+                timeout=httpx.Timeout(timeout),
+            )
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            await self.aclose()
+
+        async def aclose(self):
+            """Close pooled connections"""
+            await self.session.aclose()
+
+        async def evaluate_boolean(
+            self,
+            namespace_key: str,
+            flag_key: str,
+            entity_id: str,
+            context: Optional[Dict[str, str]] = None,
+        ) -> bool:
+            """Evaluate a boolean feature flag"""
+            url = f"{self.url}/api/v1/evaluate/v1/boolean"
+
+            payload = {
+                "namespaceKey": namespace_key,
+                "flagKey": flag_key,
+                "entityId": entity_id,
+                "context": context or {},
+            }
+
+            start = time.perf_counter()
+            outcome = "ok"
+            try:
+                response = await self.session.post(url, json=payload)
+                response.raise_for_status()
+                data = response.json()
+                return data.get("enabled", False)
+            except httpx.HTTPError as e:
+                outcome = "timeout" if isinstance(e, httpx.TimeoutException) else "error"
+                print(f"Error evaluating flag: {e}")
+                return False  # Default to false on error
+            finally:
+                if self.instrumentation is not None:
+                    self.instrumentation.on_evaluation(
+                        "boolean", namespace_key, flag_key, time.perf_counter() - start, outcome
+                    )
+
+        async def evaluate_variant(
+            self,
+            namespace_key: str,
+            flag_key: str,
+            entity_id: str,
+            context: Optional[Dict[str, str]] = None,
+        ) -> Optional[str]:
+            """Evaluate a variant feature flag"""
+            url = f"{self.url}/api/v1/evaluate/v1/variant"
+
+            payload = {
+                "namespaceKey": namespace_key,
+                "flagKey": flag_key,
+                "entityId": entity_id,
+                "context": context or {},
+            }
+
+            start = time.perf_counter()
+            outcome = "ok"
+            try:
+                response = await self.session.post(url, json=payload)
+                response.raise_for_status()
+                data = response.json()
+                return data.get("variantKey")
+            except httpx.HTTPError as e:
+                outcome = "timeout" if isinstance(e, httpx.TimeoutException) else "error"
+                print(f"Error evaluating variant: {e}")
+                return None
+            finally:
+                if self.instrumentation is not None:
+                    self.instrumentation.on_evaluation(
+                        "variant", namespace_key, flag_key, time.perf_counter() - start, outcome
+                    )
+
+        async def evaluate_multiple(
+            self,
+            namespace_key: str,
+            flag_keys: List[str],
+            entity_id: str,
+            context: Optional[Dict[str, str]] = None,
+            variant_flags: Iterable[str] = (),
+        ) -> Dict[str, Any]:
+            """Evaluate several flags concurrently
+
+            Keys in *variant_flags* are evaluated with evaluate_variant, all
+            others with evaluate_boolean.
+            """
+            variant_flags = set(variant_flags)
+            results = await asyncio.gather(
+                *(
+                    self.evaluate_variant(namespace_key, flag_key, entity_id, context)
+                    if flag_key in variant_flags
+                    else self.evaluate_boolean(namespace_key, flag_key, entity_id, context)
+                    for flag_key in flag_keys
+                )
+            )
+            return dict(zip(flag_keys, results))
+
+        async def evaluate_batch(
+            self,
+            namespace_key: str,
+            flag_keys: List[str],
+            entity_id: str,
+            context: Optional[Dict[str, str]] = None,
+            variant_flags: Iterable[str] = (),
+        ) -> Dict[str, Any]:
+            """Evaluate several flags in a single round trip
+
+            Same contract as FliptClient.evaluate_batch, falling back to
+            evaluate_multiple if the server has no batch endpoint.
+            """
+            variant_flags = set(variant_flags)
+            defaults = FliptClient._batch_defaults(flag_keys, variant_flags)
+
+            if self._batch_supported:
+                url = f"{self.url}/evaluate/v1/batch"
+                payload = {
+                    "requests": [
+                        {
+                            "namespaceKey": namespace_key,
+                            "flagKey": flag_key,
+                            "entityId": entity_id,
+                            "context": context or {},
+                        }
+                        for flag_key in flag_keys
+                    ]
+                }
+
+                try:
+                    response = await self.session.post(url, json=payload)
+                    response.raise_for_status()
+                    data = response.json()
+                except httpx.HTTPStatusError as e:
+                    if e.response.status_code not in (405, 501):
+                        print(f"Error evaluating batch: {e}")
+                        return defaults
+                    self._batch_supported = False
+                except httpx.HTTPError as e:
+                    print(f"Error evaluating batch: {e}")
+                    return defaults
+                else:
+                    return FliptClient._parse_batch_response(data, flag_keys, defaults)
+
+            return await self.evaluate_multiple(
+                namespace_key, flag_keys, entity_id, context, variant_flags
+            )
+
+except ImportError:
+    print("httpx not installed, skipping async client")
+    AsyncFliptClient = None
+
 
 # Example 1: Simple boolean flag evaluation
 def check_boolean_flag(client: FliptClient, user_id: str = "user-123") -> bool:
@@ -125,28 +751,147 @@ def check_variant_flag(client: FliptClient, user_id: str = "user-456") -> str:
 
 
 # Example 3: Batch evaluation
+DEFAULT_FLAGS = ["new_dashboard", "dark_mode", "beta_features"]
+
+
 def evaluate_multiple_flags(
     client: FliptClient, user_id: str, context: Dict[str, str]
 ) -> Dict[str, bool]:
-    """Evaluate multiple feature flags at once"""
-    flags = ["new_dashboard", "dark_mode", "beta_features"]
-    results = {}
+    """Evaluate multiple feature flags in one request"""
+    flags = DEFAULT_FLAGS
+
+    try:
+        results = client.evaluate_batch(
+            namespace_key="default",
+            flag_keys=flags,
+            entity_id=user_id,
+            context=context,
+        )
+    except Exception as e:
+        print(f"Error evaluating flags {flags}: {e}")
+        results = {}
+
+    results = {flag_key: results.get(flag_key, False) for flag_key in flags}
+
+    print(f"Feature flags for user: {results}")
+    return results
+
+
+# Per-request lazy flags
+class LazyFlags:
+    """Per-request feature flags, evaluated on first read and memoized
+
+    Nothing is sent to Flipt until a flag is read, so requests that never
+    look at a flag cost no Flipt I/O. Flags a view is known to need can be
+    fetched up front in one batch with prefetch().
+    """
+
+    def __init__(
+        self,
+        client,
+        entity_id: str,
+        context: Optional[Dict[str, str]] = None,
+        namespace_key: str = "default",
+        variant_flags: Iterable[str] = (),
+    ):
+        self.client = client
+        self.entity_id = entity_id
+        self.context = context or {}
+        self.namespace_key = namespace_key
+        self.variant_flags = set(variant_flags)
+        self._values: Dict[str, Any] = {}
+
+    def _default(self, flag_key: str):
+        return None if flag_key in self.variant_flags else False
+
+    def __getitem__(self, flag_key: str):
+        if flag_key not in self._values:
+            evaluate = (
+                self.client.evaluate_variant
+                if flag_key in self.variant_flags
+                else self.client.evaluate_boolean
+            )
+            try:
+                value = evaluate(self.namespace_key, flag_key, self.entity_id, self.context)
+            except Exception as e:
+                print(f"Error evaluating flag {flag_key}: {e}")
+                value = self._default(flag_key)
+            self._values[flag_key] = value
+        return self._values[flag_key]
+
+    def get(self, flag_key: str, default: Any = None):
+        value = self[flag_key]
+        return default if value is None else value
+
+    def prefetch(self, flag_keys: Iterable[str]) -> None:
+        """Evaluate flags that haven't been read yet in one batch"""
+        missing = [k for k in flag_keys if k not in self._values]
+        if not missing:
+            return
+        if not hasattr(self.client, "evaluate_batch"):
+            for flag_key in missing:
+                self[flag_key]
+            return
 
-    for flag_key in flags:
         try:
-            result = client.evaluate_boolean(
-                namespace_key="default",
-                flag_key=flag_key,
-                entity_id=user_id,
-                context=context,
+            self._values.update(
+                self.client.evaluate_batch(
+                    self.namespace_key,
+                    missing,
+                    self.entity_id,
+                    self.context,
+                    variant_flags=self.variant_flags,
+                )
             )
-            results[flag_key] = result
         except Exception as e:
-            print(f"Error evaluating flag {flag_key}: {e}")
-            results[flag_key] = False
+            print(f"Error prefetching flags {missing}: {e}")
+            self._values.update({k: self._default(k) for k in missing})
 
-    print(f"Feature flags for user: {results}")
-    return results
+    def to_dict(self) -> Dict[str, Any]:
+        """Flags evaluated so far in this request"""
+        return dict(self._values)
+
+
+class AsyncLazyFlags(LazyFlags):
+    """LazyFlags for asyncio clients such as AsyncFliptClient
+
+    Flags are read with ``await flags.get(key)``; indexing would have to
+    block on the event loop, so it raises TypeError instead.
+    """
+
+    def __getitem__(self, flag_key: str):
+        raise TypeError(f"AsyncLazyFlags can't be indexed; use await flags.get({flag_key!r})")
+
+    def __contains__(self, flag_key: str):
+        raise TypeError(
+            f"AsyncLazyFlags can't be tested with 'in'; use await flags.get({flag_key!r})"
+        )
+
+    async def get(self, flag_key: str, default: Any = None):
+        if flag_key not in self._values:
+            await self.prefetch([flag_key])
+        value = self._values[flag_key]
+        return default if value is None else value
+
+    async def prefetch(self, flag_keys: Iterable[str]) -> None:
+        """Evaluate flags that haven't been read yet in one batch"""
+        missing = [k for k in flag_keys if k not in self._values]
+        if not missing:
+            return
+
+        try:
+            self._values.update(
+                await self.client.evaluate_batch(
+                    self.namespace_key,
+                    missing,
+                    self.entity_id,
+                    self.context,
+                    variant_flags=self.variant_flags,
+                )
+            )
+        except Exception as e:
+            print(f"Error prefetching flags {missing}: {e}")
+            self._values.update({k: self._default(k) for k in missing})
 
 
 # Example 4: Flask middleware
@@ -154,8 +899,17 @@ try:
     from flask import Flask, request, g
     from functools import wraps
 
-    def feature_flags_middleware(client: FliptClient):
-        """Flask middleware to add feature flags to request context"""
+    def feature_flags_middleware(
+        client: FliptClient,
+        prefetch: Iterable[str] = (),
+        latency_budget_seconds: Optional[float] = None,
+    ):
+        """Flask middleware to add lazily evaluated feature flags to request context
+
+        Flags in *prefetch* are evaluated up front in a single batch. With
+        *latency_budget_seconds*, flags still unread once the view has used
+        up that much time get their defaults instead of waiting on Flipt.
+        """
 
         def decorator(f):
             @wraps(f)
@@ -168,13 +922,15 @@ try:
                     "userAgent": request.headers.get("User-Agent", ""),
                 }
 
-                try:
-                    g.features = evaluate_multiple_flags(client, user_id, context)
-                except Exception as e:
-                    print(f"Error loading feature flags: {e}")
-                    g.features = {}
-
-                return f(*args, **kwargs)
+                budget = (
+                    latency_budget(latency_budget_seconds)
+                    if latency_budget_seconds is not None
+                    else nullcontext()
+                )
+                with budget:
+                    g.features = LazyFlags(client, user_id, context)
+                    g.features.prefetch(prefetch)
+                    return f(*args, **kwargs)
 
             return decorated_function
 
@@ -193,9 +949,9 @@ try:
                 return "Showing old dashboard v1"
 
         @app.route("/api/config")
-        @feature_flags_middleware(client)
+        @feature_flags_middleware(client, prefetch=DEFAULT_FLAGS)
         def config():
-            return {"features": g.features, "version": "1.0.0"}
+            return {"features": g.features.to_dict(), "version": "1.0.0"}
 
         return app
 
@@ -205,50 +961,387 @@ except ImportError:
 
 
 # Example 5: Cached client with TTL
-class CachedFliptClient:
-    """Flipt client with local caching"""
+class LRUCache:
+    """Bounded, thread-safe LRU cache with a per-entry TTL
+
+    Keys are spread over several independently locked stripes so threads
+    rarely contend. Expired entries are kept until they are evicted or
+    overwritten, so callers can still fall back to them on errors.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl_seconds: float = 60, stripes: int = 16):
+        self.ttl = ttl_seconds
+        # At least one entry per stripe, so never more stripes than entries;
+        # the remainder goes to the first stripes so capacity is max_size
+        stripes = max(1, min(stripes, max_size))
+        per_stripe, extra = divmod(max_size, stripes)
+        self._capacity = [per_stripe + (i < extra) for i in range(stripes)]
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._stripes = [OrderedDict() for _ in range(stripes)]
+        # Counters are kept per stripe so they are only touched under its lock
+        self._hits = [0] * stripes
+        self._misses = [0] * stripes
+        self._evictions = [0] * stripes
+
+    def _index(self, key: str) -> int:
+        return hash(key) % len(self._stripes)
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Return (value, seconds until expiry) for *key*, or None if not cached
+
+        The remaining time is negative once the entry has expired.
+        """
+        i = self._index(key)
+        with self._locks[i]:
+            entry = self._stripes[i].get(key)
+            if entry is None:
+                self._misses[i] += 1
+                return None
+
+            value, expires_at = entry
+            remaining = expires_at - time.monotonic()
+            if remaining > 0:
+                self._stripes[i].move_to_end(key)
+                self._hits[i] += 1
+            else:
+                self._misses[i] += 1
+            return value, remaining
+
+    def set(self, key: str, value: Any) -> None:
+        i = self._index(key)
+        stripe = self._stripes[i]
+        with self._locks[i]:
+            stripe[key] = (value, time.monotonic() + self.ttl)
+            stripe.move_to_end(key)
+            while len(stripe) > self._capacity[i]:
+                stripe.popitem(last=False)
+                self._evictions[i] += 1
+
+    def clear(self) -> None:
+        for lock, stripe in zip(self._locks, self._stripes):
+            with lock:
+                stripe.clear()
+
+    def invalidate_prefix(self, prefixes: Tuple[str, ...]) -> int:
+        """Drop every entry whose key starts with one of *prefixes*"""
+        removed = 0
+        for lock, stripe in zip(self._locks, self._stripes):
+            with lock:
+                for key in [k for k in stripe if k.startswith(prefixes)]:
+                    del stripe[key]
+                    removed += 1
+        return removed
+
+    def __len__(self) -> int:
+        return sum(len(stripe) for stripe in self._stripes)
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss/eviction counters and current size"""
+        return {
+            "hits": sum(self._hits),
+            "misses": sum(self._misses),
+            "evictions": sum(self._evictions),
+            "size": len(self),
+        }
 
-    def __init__(self, client: FliptClient, ttl_seconds: int = 60):
-        self.client = client
-        self.cache = {}
-        self.ttl = timedelta(seconds=ttl_seconds)
 
-    def _get_cache_key(self, namespace_key: str, flag_key: str, entity_id: str) -> str:
-        return f"{namespace_key}:{flag_key}:{entity_id}"
+def _referenced_context_keys(flag: Dict[str, Any]) -> set:
+    """Context properties that a snapshot flag's rules and rollouts constrain on"""
+    segments = []
+    for rule in flag.get("rules") or []:
+        segments.extend(rule.get("segments") or [])
+    for rollout in flag.get("rollouts") or []:
+        segments.extend((rollout.get("segment") or {}).get("segments") or [])
 
-    def evaluate_boolean(
+    return {
+        c.get("property", "")
+        for segment in segments
+        for c in segment.get("constraints") or []
+        if "ENTITY_ID" not in c.get("type", "")
+    }
+
+
+class CachedFliptClient:
+    """Flipt client with a bounded local cache
+
+    Only one lookup per cache key is sent to Flipt at a time; concurrent
+    callers for the same key wait for it instead of all missing at once.
+    Entries expired for less than *stale_while_revalidate_seconds* are
+    served immediately while a background thread refreshes them. Only
+    successful lookups are cached: when Flipt fails, the previous value is
+    kept and served, and the error default is returned only if there is none.
+    """
+
+    def __init__(
+        self,
+        client: FliptClient,
+        ttl_seconds: int = 60,
+        max_size: int = 10000,
+        stale_while_revalidate_seconds: float = 30,
+        refresh_workers: int = 4,
+        instrumentation: Optional[Instrumentation] = None,
+    ):
+        self.client = client
+        self.instrumentation = instrumentation
+        self.cache = LRUCache(max_size=max_size, ttl_seconds=ttl_seconds)
+        self.stale_while_revalidate = stale_while_revalidate_seconds
+        # (namespace, flag) -> context keys the flag's segments reference
+        self.context_keys: Dict[Tuple[str, str], set] = {}
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+        self.refresh_errors = 0
+        self._refresher = ThreadPoolExecutor(
+            max_workers=refresh_workers, thread_name_prefix="flipt-refresh"
+        )
+
+    def load_context_keys(self, namespace_key: str = "default") -> bool:
+        """Learn which context keys each flag uses, so unrelated keys don't split the cache"""
+        try:
+            snapshot = self.client.get_snapshot(namespace_key)
+        except requests.exceptions.RequestException as e:
+            print(f"Error loading context keys for {namespace_key}: {e}")
+            return False
+
+        self._update_context_keys(namespace_key, snapshot)
+        return True
+
+    def _update_context_keys(self, namespace_key: str, snapshot: Dict[str, Any]) -> None:
+        for flag in snapshot.get("flags") or []:
+            self.context_keys[(namespace_key, flag["key"])] = _referenced_context_keys(flag)
+
+    def invalidate(self, namespace_key: str, flag_keys: Iterable[str]) -> int:
+        """Drop cached results for the given flags"""
+        prefixes = tuple(f"{namespace_key}:{flag_key}:" for flag_key in flag_keys)
+        return self.cache.invalidate_prefix(prefixes) if prefixes else 0
+
+    def watch(self, namespace_key: str = "default", interval: float = 5.0) -> "FlagWatcher":
+        """Start a background watcher that invalidates only flags that change
+
+        With a watcher running, ttl_seconds can be raised to hours.
+        """
+
+        def on_change(namespace_key, changed, snapshot):
+            self._update_context_keys(namespace_key, snapshot)
+            self.invalidate(namespace_key, changed)
+
+        watcher = FlagWatcher(self.client, namespace_key, on_change, interval=interval)
+        watcher.start()
+        return watcher
+
+    def _context_hash(
+        self, namespace_key: str, flag_key: str, context: Optional[Dict[str, str]]
+    ) -> str:
+        keys = self.context_keys.get((namespace_key, flag_key))
+        if keys is None:
+            # Unknown flag: every context key may matter
+            items = sorted((context or {}).items())
+        else:
+            items = [(k, (context or {}).get(k, "")) for k in sorted(keys)]
+        if not items:
+            return "-"
+        encoded = json.dumps(items, separators=(",", ":")).encode()
+        return hashlib.blake2b(encoded, digest_size=8).hexdigest()
+
+    def _get_cache_key(
         self,
         namespace_key: str,
         flag_key: str,
         entity_id: str,
         context: Optional[Dict[str, str]] = None,
-    ) -> bool:
-        """Evaluate flag with caching"""
-        cache_key = self._get_cache_key(namespace_key, flag_key, entity_id)
+    ) -> str:
+        context_hash = self._context_hash(namespace_key, flag_key, context)
+        return f"{namespace_key}:{flag_key}:{entity_id}:{context_hash}"
+
+    def _begin_refresh(self, cache_key: str) -> Tuple[Future, bool]:
+        """Return the in-flight lookup for *cache_key* and whether we own it"""
+        with self._inflight_lock:
+            future = self._inflight.get(cache_key)
+            if future is not None:
+                return future, False
+            future = self._inflight[cache_key] = Future()
+            return future, True
+
+    def _refresh(self, cache_key: str, future: Future, evaluate, args) -> None:
+        try:
+            result = evaluate(*args)
+            # Update cache
+            self.cache.set(cache_key, result)
+            future.set_result(result)
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(cache_key, None)
+
+    def _on_refresh_done(self, namespace_key: str, flag_key: str, future: Future) -> None:
+        # _refresh never caches a failed lookup, so the stale value stays
+        if future.exception() is None:
+            return
+        with self._inflight_lock:
+            self.refresh_errors += 1
+        print(f"Background refresh failed, keeping stale value: {future.exception()}")
+        if self.instrumentation is not None:
+            self.instrumentation.on_cache("refresh_error", namespace_key, flag_key)
+
+    def _evaluate_cached(self, evaluate, default, namespace_key, flag_key, entity_id, context):
+        args = (namespace_key, flag_key, entity_id, context)
+        cache_key = self._get_cache_key(namespace_key, flag_key, entity_id, context)
         cached = self.cache.get(cache_key)
 
         # Check if cache is valid
-        if cached:
-            value, timestamp = cached
-            if datetime.now() - timestamp < self.ttl:
-                return value
-
-        # Fetch fresh value
-        try:
-            result = self.client.evaluate_boolean(
-                namespace_key, flag_key, entity_id, context
-            )
+        if cached and cached[1] > 0:
+            if self.instrumentation is not None:
+                self.instrumentation.on_cache("hit", namespace_key, flag_key)
+            return cached[0]
+
+        # Flipt is failing: keep serving what we have rather than defaults
+        breaker = getattr(self.client, "breaker", None)
+        if cached and breaker is not None and breaker.state == CircuitBreaker.OPEN:
+            if self.instrumentation is not None:
+                self.instrumentation.on_cache("stale", namespace_key, flag_key)
+            return cached[0]
+
+        future, owner = self._begin_refresh(cache_key)
+
+        # Recently expired: serve the old value and refresh in the background
+        if cached and -cached[1] < self.stale_while_revalidate:
+            if owner:
+                future.add_done_callback(
+                    lambda f: self._on_refresh_done(namespace_key, flag_key, f)
+                )
+                self._refresher.submit(self._refresh, cache_key, future, evaluate, args)
+            if self.instrumentation is not None:
+                self.instrumentation.on_cache("stale", namespace_key, flag_key)
+            return cached[0]
 
-            # Update cache
-            self.cache[cache_key] = (result, datetime.now())
+        if self.instrumentation is not None:
+            self.instrumentation.on_cache("miss", namespace_key, flag_key)
 
-            return result
-        except Exception as e:
-            # Return stale cache on error if available
+        # Fetch fresh value, or wait for the lookup already in flight
+        if owner:
+            self._refresh(cache_key, future, evaluate, args)
+        try:
+            return future.result()
+        except requests.exceptions.RequestException as e:
+            # Return stale cache on error if available; never cache the default
             if cached:
                 print(f"Using stale cache due to error: {e}")
                 return cached[0]
-            raise
+            print(f"Error evaluating flag {flag_key}: {e}")
+            return default
+
+    def evaluate_boolean(
+        self,
+        namespace_key: str,
+        flag_key: str,
+        entity_id: str,
+        context: Optional[Dict[str, str]] = None,
+    ) -> bool:
+        """Evaluate flag with caching"""
+        return self._evaluate_cached(
+            self.client.evaluate_boolean_or_raise,
+            False,
+            namespace_key,
+            flag_key,
+            entity_id,
+            context,
+        )
+
+    def evaluate_variant(
+        self,
+        namespace_key: str,
+        flag_key: str,
+        entity_id: str,
+        context: Optional[Dict[str, str]] = None,
+    ) -> Optional[str]:
+        """Evaluate variant flag with caching"""
+        return self._evaluate_cached(
+            self.client.evaluate_variant_or_raise,
+            None,
+            namespace_key,
+            flag_key,
+            entity_id,
+            context,
+        )
+
+
+class FlagWatcher:
+    """Watches a namespace for flag changes on a daemon thread
+
+    Flipt v1 has no change stream, so the watcher polls the namespace
+    snapshot with If-None-Match; an unchanged namespace costs a 304 with no
+    body. When the snapshot changes, each flag is fingerprinted and
+    *on_change(namespace_key, changed_flag_keys, snapshot)* is called with
+    the flags that were added, removed or modified.
+    """
+
+    def __init__(
+        self,
+        client: FliptClient,
+        namespace_key: str,
+        on_change,
+        interval: float = 5.0,
+        etag: Optional[str] = None,
+    ):
+        self.client = client
+        self.namespace_key = namespace_key
+        self.on_change = on_change
+        self.interval = interval
+        self.etag = etag
+        self.fingerprints: Dict[str, str] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _fingerprint(flag: Dict[str, Any]) -> str:
+        encoded = json.dumps(flag, sort_keys=True, separators=(",", ":")).encode()
+        return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+    def poll_once(self) -> set:
+        """Check for changes once, returning the keys of flags that changed"""
+        snapshot, self.etag = self.client.poll_snapshot(self.namespace_key, self.etag)
+        if snapshot is None:
+            return set()
+
+        fingerprints = {
+            flag["key"]: self._fingerprint(flag) for flag in snapshot.get("flags") or []
+        }
+        changed = {
+            key
+            for key in fingerprints.keys() | self.fingerprints.keys()
+            if fingerprints.get(key) != self.fingerprints.get(key)
+        }
+        if changed:
+            try:
+                self.on_change(self.namespace_key, changed, snapshot)
+            except Exception:
+                # Fetch the snapshot again next time so the callback is retried
+                self.etag = None
+                raise
+        self.fingerprints = fingerprints
+        return changed
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+            except requests.exceptions.RequestException as e:
+                print(f"Error watching namespace {self.namespace_key}: {e}")
+            except Exception as e:
+                # A failing on_change callback must not stop the watcher
+                print(f"Error handling changes in namespace {self.namespace_key}: {e!r}")
+            self._stop.wait(self.interval)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._run, name=f"flipt-watch-{self.namespace_key}", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval + 1)
 
 
 # Example 6: Django middleware
@@ -271,13 +1364,8 @@ try:
                 "userAgent": request.META.get("HTTP_USER_AGENT", ""),
             }
 
-            try:
-                request.features = evaluate_multiple_flags(
-                    self.client, str(user_id), context
-                )
-            except Exception as e:
-                print(f"Error loading feature flags: {e}")
-                request.features = {}
+            # Flags are only evaluated when a view reads them
+            request.features = LazyFlags(self.client, str(user_id), context)
 
 except ImportError:
     print("Django not installed, skipping Django examples")
@@ -285,12 +1373,16 @@ except ImportError:
 
 # Example 7: FastAPI dependency
 try:
+    from contextlib import asynccontextmanager
     from fastapi import FastAPI, Depends, Request
     from fastapi.responses import JSONResponse
 
-    def get_feature_flags(request: Request):
-        """FastAPI dependency for feature flags"""
-        client = FliptClient()
+    if AsyncFliptClient is None:
+        raise ImportError("httpx is required for the FastAPI example")
+
+    async def get_feature_flags(request: Request) -> AsyncLazyFlags:
+        """FastAPI dependency for lazily evaluated feature flags"""
+        client = request.app.state.flipt
         user_id = request.headers.get("X-User-ID", "anonymous")
         context = {
             "email": request.headers.get("X-User-Email", ""),
@@ -299,34 +1391,764 @@ try:
             "userAgent": request.headers.get("User-Agent", ""),
         }
 
-        try:
-            return evaluate_multiple_flags(client, user_id, context)
-        except Exception as e:
-            print(f"Error loading feature flags: {e}")
-            return {}
+        return AsyncLazyFlags(client, user_id, context)
 
     # Example FastAPI app
-    def create_fastapi_app() -> FastAPI:
-        app = FastAPI()
+    def create_fastapi_app(
+        max_connections: int = 100, timeout: float = 2.0, retries: int = 2
+    ) -> FastAPI:
+        @asynccontextmanager
+        async def lifespan(app: FastAPI):
+            # One client per app so every request shares the connection pool
+            async with AsyncFliptClient(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                timeout=timeout,
+                retries=retries,
+            ) as client:
+                app.state.flipt = client
+                yield
+
+        app = FastAPI(lifespan=lifespan)
 
         @app.get("/dashboard")
-        def dashboard(features: dict = Depends(get_feature_flags)):
-            if features.get("new_dashboard", False):
+        async def dashboard(features: AsyncLazyFlags = Depends(get_feature_flags)):
+            if await features.get("new_dashboard", False):
                 return {"message": "Showing new dashboard v2"}
             else:
                 return {"message": "Showing old dashboard v1"}
 
         @app.get("/api/config")
-        def config(features: dict = Depends(get_feature_flags)):
-            return {"features": features, "version": "1.0.0"}
+        async def config(features: AsyncLazyFlags = Depends(get_feature_flags)):
+            await features.prefetch(DEFAULT_FLAGS)
+            return {"features": features.to_dict(), "version": "1.0.0"}
 
         return app
 
 except ImportError:
-    print("FastAPI not installed, skipping FastAPI examples")
+    print("FastAPI or httpx not installed, skipping FastAPI examples")
     create_fastapi_app = None
 
 
+# Example 8: Local in-process evaluation from a namespace snapshot
+#
+# The evaluation logic below mirrors Flipt's server-side evaluator so that a
+# locally evaluated flag returns exactly what the API would have returned.
+
+TOTAL_BUCKET_NUM = 1000
+PERCENT_MULTIPLIER = TOTAL_BUCKET_NUM / 100
+
+
+def _parse_bool(value: str) -> bool:
+    """Parse a boolean the same way Go's strconv.ParseBool does"""
+    if value in ("1", "t", "T", "true", "TRUE", "True"):
+        return True
+    if value in ("0", "f", "F", "false", "FALSE", "False"):
+        return False
+    raise ValueError(f"parsing boolean from {value!r}")
+
+
+def _parse_datetime(value: str) -> datetime:
+    """Parse an RFC3339 timestamp or a plain date"""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"parsing datetime from {value!r}")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def _compare(operator: str, left, right) -> bool:
+    if operator == "eq":
+        return left == right
+    if operator == "neq":
+        return left != right
+    if operator == "lt":
+        return left < right
+    if operator == "lte":
+        return left <= right
+    if operator == "gt":
+        return left > right
+    if operator == "gte":
+        return left >= right
+    return False
+
+
+def _matches_string(operator: str, expected: str, v: str) -> bool:
+    if operator == "empty":
+        return len(v.strip()) == 0
+    if operator == "notempty":
+        return len(v.strip()) != 0
+    if v == "":
+        return False
+
+    if operator == "eq":
+        return expected == v
+    if operator == "neq":
+        return expected != v
+    if operator == "prefix":
+        return v.strip().startswith(expected)
+    if operator == "suffix":
+        return v.strip().endswith(expected)
+    if operator == "contains":
+        return expected in v
+    if operator == "notcontains":
+        return expected not in v
+    if operator in ("isoneof", "isnotoneof"):
+        try:
+            values = json.loads(expected)
+        except ValueError:
+            return False
+        # Flipt only matches against a JSON array; anything else matches nothing
+        if not isinstance(values, list):
+            return False
+        return (v in values) == (operator == "isoneof")
+    return False
+
+
+def _matches_number(operator: str, expected: str, v: str) -> bool:
+    if operator == "notpresent":
+        return len(v.strip()) == 0
+    if operator == "present":
+        return len(v.strip()) != 0
+    if v == "":
+        return False
+
+    try:
+        n = float(v)
+    except ValueError:
+        raise ValueError(f"parsing number from {v!r}")
+
+    if operator in ("isoneof", "isnotoneof"):
+        try:
+            values = json.loads(expected)
+        except ValueError:
+            raise ValueError(f"parsing number list from {expected!r}")
+        if not isinstance(values, list):
+            return False
+        try:
+            values = [float(x) for x in values]
+        except (ValueError, TypeError):
+            raise ValueError(f"parsing number list from {expected!r}")
+        return (n in values) == (operator == "isoneof")
+
+    try:
+        value = float(expected)
+    except ValueError:
+        raise ValueError(f"parsing number from {expected!r}")
+    return _compare(operator, n, value)
+
+
+def _matches_boolean(operator: str, v: str) -> bool:
+    if operator == "notpresent":
+        return len(v.strip()) == 0
+    if operator == "present":
+        return len(v.strip()) != 0
+    if v == "":
+        return False
+
+    value = _parse_bool(v)
+    if operator == "true":
+        return value
+    if operator == "false":
+        return not value
+    return False
+
+
+def _matches_datetime(operator: str, expected: str, v: str) -> bool:
+    if operator == "notpresent":
+        return len(v.strip()) == 0
+    if operator == "present":
+        return len(v.strip()) != 0
+    if v == "":
+        return False
+
+    return _compare(operator, _parse_datetime(v), _parse_datetime(expected))
+
+
+def _match_constraint(
+    constraint: Dict[str, Any], entity_id: str, context: Dict[str, str]
+) -> bool:
+    """Return True if a single segment constraint matches the request"""
+    ctype = constraint.get("type", "")
+    operator = constraint.get("operator", "")
+    expected = constraint.get("value", "")
+
+    if "ENTITY_ID" in ctype:
+        return _matches_string(operator, expected, entity_id)
+
+    v = str(context.get(constraint.get("property", ""), ""))
+    if "NUMBER" in ctype:
+        return _matches_number(operator, expected, v)
+    if "BOOLEAN" in ctype:
+        return _matches_boolean(operator, v)
+    if "DATETIME" in ctype:
+        return _matches_datetime(operator, expected, v)
+    if "STRING" in ctype:
+        return _matches_string(operator, expected, v)
+    return False
+
+
+def _match_segments(
+    segments: List[Dict[str, Any]],
+    segment_operator: str,
+    entity_id: str,
+    context: Dict[str, str],
+) -> Tuple[bool, List[str]]:
+    """Match a rule's or rollout's segments, returning (matched, segment_keys)"""
+    segment_keys = []
+
+    for segment in segments:
+        constraints = segment.get("constraints") or []
+
+        # Like Flipt, stop at the first match (ANY) or miss (ALL), so a later
+        # constraint that fails to parse can't turn a decided segment into an error
+        if "ANY" in segment.get("matchType", ""):
+            matched = not constraints or any(
+                _match_constraint(c, entity_id, context) for c in constraints
+            )
+        else:
+            matched = all(_match_constraint(c, entity_id, context) for c in constraints)
+
+        if matched:
+            segment_keys.append(segment["key"])
+
+    if "AND" in (segment_operator or ""):
+        return len(segment_keys) == len(segments), segment_keys
+    return len(segment_keys) > 0, segment_keys
+
+
+class LocalEvaluator:
+    """Flipt-compatible flag evaluator over a namespace snapshot"""
+
+    def __init__(self, snapshot: Dict[str, Any]):
+        self.snapshot = snapshot
+        self.flags = {f["key"]: f for f in snapshot.get("flags") or []}
+
+    def evaluate_boolean(
+        self, flag_key: str, entity_id: str, context: Optional[Dict[str, str]] = None
+    ) -> Dict[str, Any]:
+        """Evaluate a boolean flag, returning a response shaped like the API's"""
+        context = context or {}
+        flag = self.flags.get(flag_key)
+        if flag is None:
+            raise KeyError(f"flag {flag_key!r} not found")
+        if flag.get("type") != "BOOLEAN_FLAG_TYPE":
+            raise ValueError(f"flag {flag_key!r} is not a boolean flag")
+
+        rollouts = sorted(flag.get("rollouts") or [], key=lambda r: r.get("rank", 0))
+        for rollout in rollouts:
+            threshold = rollout.get("threshold")
+            segment = rollout.get("segment")
+
+            if threshold is not None:
+                # Note: Flipt hashes entity+flag here but flag+entity for variants
+                bucket = zlib.crc32((entity_id + flag_key).encode()) % 100
+                if bucket < threshold.get("percentage", 0):
+                    return {
+                        "flagKey": flag_key,
+                        "enabled": bool(threshold.get("value", False)),
+                        "reason": "MATCH_EVALUATION_REASON",
+                    }
+            elif segment is not None:
+                matched, _ = _match_segments(
+                    segment.get("segments") or [],
+                    segment.get("segmentOperator", ""),
+                    entity_id,
+                    context,
+                )
+                if matched:
+                    return {
+                        "flagKey": flag_key,
+                        "enabled": bool(segment.get("value", False)),
+                        "reason": "MATCH_EVALUATION_REASON",
+                    }
+
+        return {
+            "flagKey": flag_key,
+            "enabled": bool(flag.get("enabled", False)),
+            "reason": "DEFAULT_EVALUATION_REASON",
+        }
+
+    def evaluate_variant(
+        self, flag_key: str, entity_id: str, context: Optional[Dict[str, str]] = None
+    ) -> Dict[str, Any]:
+        """Evaluate a variant flag, returning a response shaped like the API's"""
+        context = context or {}
+        flag = self.flags.get(flag_key)
+        if flag is None:
+            raise KeyError(f"flag {flag_key!r} not found")
+        if flag.get("type") == "BOOLEAN_FLAG_TYPE":
+            raise ValueError(f"flag {flag_key!r} is not a variant flag")
+
+        resp = {
+            "flagKey": flag_key,
+            "match": False,
+            "segmentKeys": [],
+            "variantKey": "",
+            "variantAttachment": "",
+            "reason": "UNKNOWN_EVALUATION_REASON",
+        }
+
+        if not flag.get("enabled", False):
+            resp["reason"] = "FLAG_DISABLED_EVALUATION_REASON"
+            return resp
+
+        rules = sorted(flag.get("rules") or [], key=lambda r: r.get("rank", 0))
+        for rule in rules:
+            matched, segment_keys = _match_segments(
+                rule.get("segments") or [],
+                rule.get("segmentOperator", ""),
+                entity_id,
+                context,
+            )
+            if not matched:
+                continue
+
+            resp["segmentKeys"] = segment_keys
+            distributions = [
+                d for d in rule.get("distributions") or [] if d.get("rollout", 0) > 0
+            ]
+            buckets = []
+            for d in distributions:
+                previous = buckets[-1] if buckets else 0
+                buckets.append(previous + int(d["rollout"] * PERCENT_MULTIPLIER))
+
+            # A matching rule without distributions is a match with no variant
+            if not distributions:
+                resp["match"] = True
+                resp["reason"] = "MATCH_EVALUATION_REASON"
+                return resp
+
+            bucket = zlib.crc32((flag_key + entity_id).encode()) % TOTAL_BUCKET_NUM
+            index = bisect.bisect_left(buckets, bucket + 1)
+            if index == len(distributions):
+                return resp
+
+            variant = distributions[index].get("variant") or {}
+            resp["match"] = True
+            resp["reason"] = "MATCH_EVALUATION_REASON"
+            resp["variantKey"] = variant.get("key", "")
+            resp["variantAttachment"] = variant.get("attachment", "")
+            return resp
+
+        default_variant = flag.get("defaultVariant")
+        if default_variant:
+            resp["reason"] = "DEFAULT_EVALUATION_REASON"
+            resp["variantKey"] = default_variant.get("key", "")
+            resp["variantAttachment"] = default_variant.get("attachment", "")
+        return resp
+
+
+class SnapshotStore:
+    """Namespace snapshots kept on disk so new processes start warm
+
+    Each namespace is stored in *directory* as ``<namespace>.json`` together
+    with its ETag. Files are written to a temporary name and renamed into
+    place, so readers never see a partial file. Every process parses its own
+    copy of the snapshot; what the file saves is the round trip to Flipt.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or os.getenv("FLIPT_SNAPSHOT_DIR", "/tmp/flipt-snapshots")
+
+    def path(self, namespace_key: str) -> str:
+        return os.path.join(self.directory, f"{namespace_key}.json")
+
+    def load(self, namespace_key: str) -> Optional[Tuple[Dict[str, Any], Optional[str]]]:
+        """Return (snapshot, etag) for a namespace, or None if there is no usable file"""
+        try:
+            with open(self.path(namespace_key), "rb") as f:
+                data = json.load(f)
+            return data["snapshot"], data.get("etag")
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            # A missing, empty or corrupt file just means a cold start
+            if not isinstance(e, FileNotFoundError):
+                print(f"Ignoring snapshot file for {namespace_key}: {e}")
+            return None
+
+    def save(self, namespace_key: str, snapshot: Dict[str, Any], etag: Optional[str]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(namespace_key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump({"etag": etag, "snapshot": snapshot}, f, separators=(",", ":"))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing snapshot file for {namespace_key}: {e}")
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+
+
+class LocalFliptClient:
+    """FliptClient drop-in that evaluates flags in-process from snapshots
+
+    With a *store*, snapshots are loaded from disk before Flipt is asked and
+    every snapshot fetched from Flipt is written back, so a freshly forked
+    worker serves its first request without any network I/O. Start watch()
+    to keep a snapshot loaded from disk up to date.
+    """
+
+    def __init__(
+        self,
+        client: FliptClient,
+        namespaces: Optional[List[str]] = None,
+        store: Optional[SnapshotStore] = None,
+    ):
+        self.client = client
+        self.store = store
+        self.evaluators: Dict[str, LocalEvaluator] = {}
+        self.etags: Dict[str, Optional[str]] = {}
+        for namespace_key in namespaces or []:
+            self._load(namespace_key)
+
+    def _set_snapshot(
+        self, namespace_key: str, snapshot: Dict[str, Any], etag: Optional[str], persist: bool
+    ) -> None:
+        self.evaluators[namespace_key] = LocalEvaluator(snapshot)
+        self.etags[namespace_key] = etag
+        if persist and self.store is not None:
+            self.store.save(namespace_key, snapshot, etag)
+
+    def _load(self, namespace_key: str) -> bool:
+        stored = self.store.load(namespace_key) if self.store is not None else None
+        if stored is None:
+            return self.refresh(namespace_key)
+        self._set_snapshot(namespace_key, *stored, persist=False)
+        return True
+
+    def refresh(self, namespace_key: str = "default") -> bool:
+        """Pull a fresh snapshot, keeping the previous one if Flipt is unreachable"""
+        try:
+            snapshot, etag = self.client.poll_snapshot(namespace_key)
+        except requests.exceptions.RequestException as e:
+            print(f"Error refreshing snapshot for {namespace_key}: {e}")
+            return False
+
+        self._set_snapshot(namespace_key, snapshot, etag, persist=True)
+        return True
+
+    def watch(self, namespace_key: str = "default", interval: float = 5.0) -> FlagWatcher:
+        """Swap in a new snapshot in the background whenever flags change"""
+
+        def on_change(namespace_key, changed, snapshot):
+            self._set_snapshot(namespace_key, snapshot, watcher.etag, persist=True)
+
+        # Start from the ETag we already hold so an unchanged namespace costs a 304
+        watcher = FlagWatcher(
+            self.client,
+            namespace_key,
+            on_change,
+            interval=interval,
+            etag=self.etags.get(namespace_key),
+        )
+        watcher.start()
+        return watcher
+
+    def _evaluator(self, namespace_key: str) -> Optional[LocalEvaluator]:
+        if namespace_key not in self.evaluators:
+            self._load(namespace_key)
+        return self.evaluators.get(namespace_key)
+
+    def evaluate_boolean(
+        self,
+        namespace_key: str,
+        flag_key: str,
+        entity_id: str,
+        context: Optional[Dict[str, str]] = None,
+    ) -> bool:
+        """Evaluate a boolean feature flag locally"""
+        evaluator = self._evaluator(namespace_key)
+        if evaluator is None:
+            return False
+
+        try:
+            return evaluator.evaluate_boolean(flag_key, entity_id, context)["enabled"]
+        except (KeyError, ValueError) as e:
+            print(f"Error evaluating flag: {e}")
+            return False
+
+    def evaluate_variant(
+        self,
+        namespace_key: str,
+        flag_key: str,
+        entity_id: str,
+        context: Optional[Dict[str, str]] = None,
+    ) -> Optional[str]:
+        """Evaluate a variant feature flag locally"""
+        evaluator = self._evaluator(namespace_key)
+        if evaluator is None:
+            return None
+
+        try:
+            result = evaluator.evaluate_variant(flag_key, entity_id, context)
+        except (KeyError, ValueError) as e:
+            print(f"Error evaluating variant: {e}")
+            return None
+        return result["variantKey"] or None
+
+
+# Vectorized bulk evaluation for offline jobs (cohort exports, backfills)
+try:
+    import numpy as np
+
+    def _context_string(value) -> str:
+        # None and NaN (how pandas marks missing values) count as absent
+        if value is None or (isinstance(value, float) and value != value):
+            return ""
+        if isinstance(value, bytes):
+            return value.decode()
+        return str(value)
+
+    def _factorize(values: Iterable, count: int) -> Tuple["np.ndarray", List[str]]:
+        """Map each value to an index into a list of its distinct string forms"""
+        if isinstance(values, np.ndarray) and values.dtype.kind in "biuUS":
+            if values.dtype.kind == "S":
+                # Compare bytes columns as text, not as their "b'...'" repr
+                values = np.char.decode(values, "utf-8")
+            uniques, codes = np.unique(values, return_inverse=True)
+            return codes, [_context_string(v.item()) for v in uniques]
+
+        index: Dict[str, int] = {}
+        codes = np.fromiter(
+            (index.setdefault(_context_string(v), len(index)) for v in values),
+            dtype=np.int64,
+            count=count,
+        )
+        return codes, list(index)
+
+    class BulkEvaluator:
+        """Evaluates one flag for many entities at once
+
+        Takes a namespace snapshot like LocalEvaluator and returns the same
+        results, but for a whole column of entity IDs. Context is a mapping
+        of property name to a column of values (lists, NumPy arrays, pandas
+        Series, or a DataFrame). Each constraint is checked once per distinct
+        value in its column and broadcast back, so low-cardinality properties
+        such as plan or country cost almost nothing however many rows there
+        are. Rows that fail to evaluate (e.g. an unparsable number) get the
+        same defaults LocalFliptClient returns: False or no variant.
+
+        Install: pip install numpy
+        """
+
+        NO_VARIANT = -1
+
+        def __init__(self, snapshot: Dict[str, Any]):
+            self.flags = {f["key"]: f for f in snapshot.get("flags") or []}
+
+        def _flag(self, flag_key: str) -> Dict[str, Any]:
+            flag = self.flags.get(flag_key)
+            if flag is None:
+                raise KeyError(f"flag {flag_key!r} not found")
+            return flag
+
+        @staticmethod
+        def _buckets(prefix: str, entity_ids, suffix: str, count: int) -> "np.ndarray":
+            # Seed the CRC with the prefix so only the per-entity part is hashed
+            seed = zlib.crc32(prefix.encode())
+            suffix = suffix.encode()
+            return np.fromiter(
+                (zlib.crc32(str(e).encode() + suffix, seed) for e in entity_ids),
+                dtype=np.uint32,
+                count=count,
+            )
+
+        class _Rows:
+            """Per-call state: entity IDs, context columns and their factorizations"""
+
+            def __init__(self, entity_ids, context):
+                self.entity_ids = entity_ids
+                self.context = context if context is not None else {}
+                self.count = len(entity_ids)
+                self.columns: Dict[str, Tuple["np.ndarray", List[str]]] = {}
+                self.constraints: Dict[Tuple, Tuple["np.ndarray", "np.ndarray"]] = {}
+
+            def column(self, prop: str):
+                if prop not in self.columns:
+                    values = self.context[prop] if prop in self.context else [""] * self.count
+                    self.columns[prop] = _factorize(np.asarray(values), self.count)
+                return self.columns[prop]
+
+        @staticmethod
+        def _match_constraint(constraint, rows) -> Tuple["np.ndarray", "np.ndarray"]:
+            """Return (matched, errored) masks for a single constraint"""
+            ctype = constraint.get("type", "")
+            operator = constraint.get("operator", "")
+            expected = constraint.get("value", "")
+            cache_key = (ctype, constraint.get("property", ""), operator, expected)
+            if cache_key in rows.constraints:
+                return rows.constraints[cache_key]
+
+            if "ENTITY_ID" in ctype:
+                # Entity IDs are mostly distinct, so match them row by row
+                result = np.fromiter(
+                    (_matches_string(operator, expected, str(e)) for e in rows.entity_ids),
+                    dtype=bool,
+                    count=rows.count,
+                )
+                rows.constraints[cache_key] = result, np.zeros(rows.count, dtype=bool)
+                return rows.constraints[cache_key]
+
+            # Reuse the scalar matcher on each distinct value so results agree exactly
+            codes, uniques = rows.column(constraint.get("property", ""))
+            scalar = dict(constraint, property="_")
+            matched = np.zeros(len(uniques), dtype=bool)
+            errored = np.zeros(len(uniques), dtype=bool)
+            for i, value in enumerate(uniques):
+                try:
+                    matched[i] = _match_constraint(scalar, "", {"_": value})
+                except ValueError:
+                    errored[i] = True
+            rows.constraints[cache_key] = matched[codes], errored[codes]
+            return rows.constraints[cache_key]
+
+        def _match_segments(self, segments, segment_operator, rows):
+            """Vectorized _match_segments, returning (matched, errored) masks"""
+            errored = np.zeros(rows.count, dtype=bool)
+            segment_matches = []
+
+            for segment in segments:
+                constraints = segment.get("constraints") or []
+                match_any = "ANY" in segment.get("matchType", "")
+                # Rows still undecided: a match decides ANY, a miss decides ALL.
+                # Only undecided rows see later constraints, and their errors.
+                undecided = np.ones(rows.count, dtype=bool)
+                for constraint in constraints:
+                    matched, failed = self._match_constraint(constraint, rows)
+                    errored |= undecided & failed
+                    undecided &= ~matched if match_any else matched
+
+                if match_any:
+                    segment_matches.append(~undecided if constraints else undecided)
+                else:
+                    segment_matches.append(undecided)
+
+            if not segment_matches:
+                matched = np.full(rows.count, "AND" in (segment_operator or ""))
+            elif "AND" in (segment_operator or ""):
+                matched = np.logical_and.reduce(segment_matches)
+            else:
+                matched = np.logical_or.reduce(segment_matches)
+            return matched, errored
+
+        def evaluate_boolean(self, flag_key: str, entity_ids, context=None) -> "np.ndarray":
+            """Evaluate a boolean flag, returning a bool array aligned with entity_ids"""
+            flag = self._flag(flag_key)
+            if flag.get("type") != "BOOLEAN_FLAG_TYPE":
+                raise ValueError(f"flag {flag_key!r} is not a boolean flag")
+
+            rows = self._Rows(entity_ids, context)
+            result = np.full(rows.count, bool(flag.get("enabled", False)))
+            pending = np.ones(rows.count, dtype=bool)
+            buckets = None
+
+            rollouts = sorted(flag.get("rollouts") or [], key=lambda r: r.get("rank", 0))
+            for rollout in rollouts:
+                threshold = rollout.get("threshold")
+                segment = rollout.get("segment")
+
+                if threshold is not None:
+                    if buckets is None:
+                        # Note: Flipt hashes entity+flag here but flag+entity for variants
+                        buckets = self._buckets("", entity_ids, flag_key, rows.count) % 100
+                    hit = pending & (buckets < threshold.get("percentage", 0))
+                    value = bool(threshold.get("value", False))
+                elif segment is not None:
+                    matched, errored = self._match_segments(
+                        segment.get("segments") or [], segment.get("segmentOperator", ""), rows
+                    )
+                    result[pending & errored] = False
+                    pending &= ~errored
+                    hit = pending & matched
+                    value = bool(segment.get("value", False))
+                else:
+                    continue
+
+                result[hit] = value
+                pending &= ~hit
+                if not pending.any():
+                    break
+
+            return result
+
+        def evaluate_variant(
+            self, flag_key: str, entity_ids, context=None
+        ) -> Tuple["np.ndarray", List[str]]:
+            """Evaluate a variant flag for every entity
+
+            Returns (codes, variant_keys): codes is an int16 array aligned
+            with entity_ids indexing into variant_keys, or NO_VARIANT (-1).
+            pandas.Categorical.from_codes(codes, variant_keys) turns it into a
+            column, with NO_VARIANT as a missing value.
+            """
+            flag = self._flag(flag_key)
+            if flag.get("type") == "BOOLEAN_FLAG_TYPE":
+                raise ValueError(f"flag {flag_key!r} is not a variant flag")
+
+            rows = self._Rows(entity_ids, context)
+            codes = np.full(rows.count, self.NO_VARIANT, dtype=np.int16)
+            variant_keys: List[str] = []
+
+            def code(variant) -> int:
+                key = (variant or {}).get("key", "")
+                if not key:
+                    return self.NO_VARIANT
+                if key not in variant_keys:
+                    variant_keys.append(key)
+                return variant_keys.index(key)
+
+            if not flag.get("enabled", False):
+                return codes, variant_keys
+
+            pending = np.ones(rows.count, dtype=bool)
+            buckets = None
+
+            rules = sorted(flag.get("rules") or [], key=lambda r: r.get("rank", 0))
+            for rule in rules:
+                matched, errored = self._match_segments(
+                    rule.get("segments") or [], rule.get("segmentOperator", ""), rows
+                )
+                pending &= ~errored
+                hit = pending & matched
+                pending &= ~hit
+                if not hit.any():
+                    continue
+
+                distributions = [
+                    d for d in rule.get("distributions") or [] if d.get("rollout", 0) > 0
+                ]
+                if not distributions:
+                    continue
+
+                if buckets is None:
+                    buckets = self._buckets(flag_key, entity_ids, "", rows.count) % TOTAL_BUCKET_NUM
+                bounds = np.cumsum([int(d["rollout"] * PERCENT_MULTIPLIER) for d in distributions])
+                index = np.searchsorted(bounds, buckets[hit] + 1, side="left")
+
+                # Rows past the last bound matched the rule but get no variant
+                lookup = np.array(
+                    [code(d.get("variant")) for d in distributions] + [self.NO_VARIANT],
+                    dtype=np.int16,
+                )
+                codes[hit] = lookup[index]
+
+                if not pending.any():
+                    break
+
+            if pending.any() and flag.get("defaultVariant"):
+                codes[pending] = code(flag["defaultVariant"])
+            return codes, variant_keys
+
+except ImportError:
+    print("NumPy not installed, skipping bulk evaluation examples")
+    BulkEvaluator = None
+
+
 def main():
     """Run all examples"""
     print("Flipt Python SDK Examples\n")
@@ -353,11 +2175,25 @@ def main():
 
     # Example 4: Cached evaluation
     print("Example 4: Cached Evaluation")
-    cached_client = CachedFliptClient(client, ttl_seconds=60)
+    flag_metrics = FlagMetrics()
+    client.instrumentation = flag_metrics
+    cached_client = CachedFliptClient(client, ttl_seconds=60, instrumentation=flag_metrics)
+    cached_client.load_context_keys("default")
     result1 = cached_client.evaluate_boolean("default", "new_dashboard", "user-123")
     print(f"First call (from API): {result1}")
     result2 = cached_client.evaluate_boolean("default", "new_dashboard", "user-123")
     print(f"Second call (from cache): {result2}")
+    print(f"Cache stats: {cached_client.cache.stats()}")
+    metrics_snapshot = flag_metrics.snapshot()
+    print(f"Evaluation outcomes: {metrics_snapshot['outcomes']}")
+    print(f"Cache lookups: {metrics_snapshot['cache']}")
+    print()
+
+    # Example 8: Local evaluation
+    print("Example 8: Local Evaluation")
+    local_client = LocalFliptClient(client, namespaces=["default"])
+    result = local_client.evaluate_boolean("default", "new_dashboard", "user-123")
+    print(f"Evaluated in-process: {result}")
     print()
 
     print("Examples completed!")
@@ -0,0 +1,494 @@
+"""Tests for the clients in python-example.py
+
+Run: pip install pytest requests && pytest test_python_example.py
+"""
+
+import asyncio
+import importlib.util
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+HERE = Path(__file__).resolve().parent
+
+
+def load(name, filename):
+    spec = importlib.util.spec_from_file_location(name, HERE / filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+sdk = load("flipt_sdk_example", "python-example.py")
+bench = load("flipt_sdk_benchmark", "python-benchmark.py")
+
+
+class FakeFlipt:
+    """Evaluation endpoint whose status and body the test controls"""
+
+    def __init__(self):
+        self.status = 200
+        self.body = {"enabled": True, "variantKey": "control"}
+        self.paths = []
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                fake.paths.append(self.path)
+                data = json.dumps(fake.body if fake.status == 200 else {"message": "boom"})
+                self.send_response(fake.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data.encode())
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def flipt():
+    fake = FakeFlipt()
+    yield fake
+    fake.close()
+
+
+def cached_value(cached, flag_key):
+    key = cached._get_cache_key("default", flag_key, "user-1")
+    entry = cached.cache.get(key)
+    return entry[0] if entry else None
+
+
+def test_or_raise_variants_raise_on_5xx(flipt):
+    client = sdk.FliptClient(url=flipt.url)
+    flipt.status = 503
+    with pytest.raises(sdk.requests.exceptions.HTTPError):
+        client.evaluate_boolean_or_raise("default", "flag", "user-1")
+    assert client.evaluate_boolean("default", "flag", "user-1") is False
+
+
+def test_5xx_keeps_previous_cached_value(flipt):
+    cached = sdk.CachedFliptClient(
+        sdk.FliptClient(url=flipt.url), ttl_seconds=0.05, stale_while_revalidate_seconds=0
+    )
+    assert cached.evaluate_boolean("default", "flag", "user-1") is True
+
+    flipt.status = 500
+    time.sleep(0.1)
+    assert cached.evaluate_boolean("default", "flag", "user-1") is True
+    assert cached_value(cached, "flag") is True
+
+
+def test_5xx_on_miss_returns_default_without_caching_it(flipt):
+    cached = sdk.CachedFliptClient(sdk.FliptClient(url=flipt.url))
+    flipt.status = 500
+    assert cached.evaluate_boolean("default", "flag", "user-1") is False
+    assert cached.evaluate_variant("default", "variant", "user-1") is None
+    assert len(cached.cache) == 0
+
+    flipt.status = 200
+    assert cached.evaluate_boolean("default", "flag", "user-1") is True
+
+
+def test_failed_background_refresh_keeps_stale_value(flipt):
+    metrics = sdk.FlagMetrics()
+    cached = sdk.CachedFliptClient(
+        sdk.FliptClient(url=flipt.url),
+        ttl_seconds=0.05,
+        stale_while_revalidate_seconds=30,
+        instrumentation=metrics,
+    )
+    assert cached.evaluate_boolean("default", "flag", "user-1") is True
+
+    flipt.status = 502
+    time.sleep(0.1)
+    # Served stale while the refresh runs (and fails) in the background
+    assert cached.evaluate_boolean("default", "flag", "user-1") is True
+    cached._refresher.shutdown(wait=True)
+
+    assert cached.refresh_errors == 1
+    assert metrics.snapshot()["cache"]["default/flag:refresh_error"] == 1
+    assert cached_value(cached, "flag") is True
+
+
+@pytest.mark.skipif(sdk.AsyncFliptClient is None, reason="httpx not installed")
+def test_async_lazy_flags_require_await(flipt):
+    async def run():
+        async with sdk.AsyncFliptClient(url=flipt.url) as client:
+            flags = sdk.AsyncLazyFlags(client, "user-1")
+            with pytest.raises(TypeError, match="await flags.get"):
+                flags["flag"]
+            with pytest.raises(TypeError, match="await flags.get"):
+                "flag" in flags
+            assert flags.to_dict() == {}
+            return await flags.get("flag")
+
+    flipt.body = {"responses": [{"booleanResponse": {"enabled": True}}]}
+    assert asyncio.run(run()) is True
+
+
+def test_batch_uses_evaluation_api_and_treats_404_as_error(flipt):
+    client = sdk.FliptClient(url=flipt.url)
+    flipt.body = {"responses": [{"booleanResponse": {"enabled": True}}]}
+    assert client.evaluate_batch("default", ["flag"], "user-1") == {"flag": True}
+    assert flipt.paths == ["/evaluate/v1/batch"]
+
+    flipt.status = 404
+    assert client.evaluate_batch("default", ["flag"], "user-1") == {"flag": False}
+    assert client._batch_supported
+
+
+def test_batch_falls_back_when_endpoint_is_missing(flipt):
+    client = sdk.FliptClient(url=flipt.url)
+    flipt.status = 501
+    assert client.evaluate_batch("default", ["a", "b"], "user-1") == {"a": False, "b": False}
+    assert not client._batch_supported
+
+    flipt.status = 200
+    assert client.evaluate_batch("default", ["a", "b"], "user-1") == {"a": True, "b": True}
+
+
+# Expected results follow Flipt's Go evaluator: constraints are checked in
+# order, ANY stops at the first match and ALL at the first miss, and a value
+# that fails to parse before that point fails the whole evaluation.
+PARITY_SEGMENTS = {
+    "pro-adults": {
+        "key": "pro-adults",
+        "matchType": "ALL_MATCH_TYPE",
+        "constraints": [
+            {
+                "type": "STRING_COMPARISON_TYPE",
+                "property": "plan",
+                "operator": "eq",
+                "value": "pro",
+            },
+            {
+                "type": "NUMBER_COMPARISON_TYPE",
+                "property": "age",
+                "operator": "gte",
+                "value": "18",
+            },
+        ],
+    },
+    "beta-or-recent": {
+        "key": "beta-or-recent",
+        "matchType": "ANY_MATCH_TYPE",
+        "constraints": [
+            {"type": "BOOLEAN_COMPARISON_TYPE", "property": "beta", "operator": "true"},
+            {
+                "type": "DATETIME_COMPARISON_TYPE",
+                "property": "signup",
+                "operator": "gte",
+                "value": "2024-01-01T00:00:00Z",
+            },
+        ],
+    },
+}
+
+PARITY_SNAPSHOT = {
+    "namespace": {"key": "default"},
+    "flags": [
+        {
+            "key": "all-segment",
+            "type": "BOOLEAN_FLAG_TYPE",
+            "enabled": False,
+            "rollouts": [
+                {
+                    "rank": 1,
+                    "type": "SEGMENT_ROLLOUT_TYPE",
+                    "segment": {"value": True, "segments": [PARITY_SEGMENTS["pro-adults"]]},
+                }
+            ],
+        },
+        {
+            "key": "any-segment",
+            "type": "BOOLEAN_FLAG_TYPE",
+            "enabled": False,
+            "rollouts": [
+                {
+                    "rank": 1,
+                    "type": "SEGMENT_ROLLOUT_TYPE",
+                    "segment": {"value": True, "segments": [PARITY_SEGMENTS["beta-or-recent"]]},
+                }
+            ],
+        },
+        {
+            "key": "multi-segment",
+            "type": "VARIANT_FLAG_TYPE",
+            "enabled": True,
+            "rules": [
+                {
+                    "rank": 1,
+                    "segmentOperator": "AND_SEGMENT_OPERATOR",
+                    "segments": [PARITY_SEGMENTS["pro-adults"], PARITY_SEGMENTS["beta-or-recent"]],
+                    "distributions": [{"variant": {"key": "both"}, "rollout": 100.0}],
+                },
+                {
+                    "rank": 2,
+                    "segmentOperator": "OR_SEGMENT_OPERATOR",
+                    "segments": [PARITY_SEGMENTS["pro-adults"], PARITY_SEGMENTS["beta-or-recent"]],
+                    "distributions": [{"variant": {"key": "either"}, "rollout": 100.0}],
+                },
+            ],
+        },
+    ],
+}
+
+ERROR = object()
+
+# (flag, context, expected enabled / variant key / ERROR, expected segment keys)
+PARITY_CASES = [
+    ("all-segment", {"plan": "pro", "age": "30"}, True, None),
+    ("all-segment", {"plan": "pro", "age": "12"}, False, None),
+    # ALL stops at the plan miss, so the unparsable age is never read
+    ("all-segment", {"plan": "free", "age": "thirty"}, False, None),
+    ("all-segment", {"plan": "pro", "age": "thirty"}, ERROR, None),
+    ("any-segment", {"beta": "true"}, True, None),
+    # ANY stops at the beta match, so the unparsable signup date is never read
+    ("any-segment", {"beta": "true", "signup": "last tuesday"}, True, None),
+    ("any-segment", {"beta": "false", "signup": "last tuesday"}, ERROR, None),
+    ("any-segment", {"beta": "false", "signup": "2024-06-01T00:00:00Z"}, True, None),
+    ("any-segment", {"beta": "false", "signup": "2023-06-01"}, False, None),
+    (
+        "multi-segment",
+        {"plan": "pro", "age": "40", "beta": "1"},
+        "both",
+        ["pro-adults", "beta-or-recent"],
+    ),
+    ("multi-segment", {"plan": "free", "age": "x", "beta": "1"}, "either", ["beta-or-recent"]),
+    ("multi-segment", {"plan": "pro", "age": "40", "beta": "0"}, "either", ["pro-adults"]),
+    ("multi-segment", {"plan": "free", "beta": "0"}, "", []),
+]
+
+
+@pytest.mark.parametrize("flag_key, context, expected, segment_keys", PARITY_CASES)
+def test_local_evaluator_parity(flag_key, context, expected, segment_keys):
+    evaluator = sdk.LocalEvaluator(PARITY_SNAPSHOT)
+    evaluate = (
+        evaluator.evaluate_variant if flag_key == "multi-segment" else evaluator.evaluate_boolean
+    )
+    if expected is ERROR:
+        with pytest.raises(ValueError):
+            evaluate(flag_key, "entity-1", context)
+        return
+
+    result = evaluate(flag_key, "entity-1", context)
+    if segment_keys is None:
+        assert result["enabled"] is expected
+    else:
+        assert result["variantKey"] == expected
+        assert result["segmentKeys"] == segment_keys
+
+
+@pytest.mark.skipif(getattr(sdk, "BulkEvaluator", None) is None, reason="numpy not installed")
+def test_bulk_evaluator_parity():
+    bulk = sdk.BulkEvaluator(PARITY_SNAPSHOT)
+    for flag_key in ("all-segment", "any-segment", "multi-segment"):
+        cases = [c for c in PARITY_CASES if c[0] == flag_key]
+        columns = {
+            prop: [context.get(prop, "") for _, context, _, _ in cases]
+            for prop in ("plan", "age", "beta", "signup")
+        }
+        entity_ids = ["entity-1"] * len(cases)
+        # Rows that fail to evaluate get the LocalFliptClient defaults
+        if flag_key == "multi-segment":
+            codes, keys = bulk.evaluate_variant(flag_key, entity_ids, columns)
+            got = [keys[c] if c != bulk.NO_VARIANT else "" for c in codes]
+            assert got == [e for _, _, e, _ in cases]
+        else:
+            got = list(bulk.evaluate_boolean(flag_key, entity_ids, columns))
+            assert got == [False if e is ERROR else e for _, _, e, _ in cases]
+
+
+@pytest.mark.skipif(getattr(sdk, "BulkEvaluator", None) is None, reason="numpy not installed")
+def test_bulk_evaluator_bytes_column_matches_str_column():
+    import numpy as np
+
+    bulk = sdk.BulkEvaluator(PARITY_SNAPSHOT)
+    entity_ids = ["entity-1", "entity-2"]
+    ages = np.array(["30", "30"])
+    as_str = bulk.evaluate_boolean(
+        "all-segment", entity_ids, {"plan": np.array(["pro", "free"]), "age": ages}
+    )
+    as_bytes = bulk.evaluate_boolean(
+        "all-segment", entity_ids, {"plan": np.array([b"pro", b"free"]), "age": ages}
+    )
+    as_list = bulk.evaluate_boolean(
+        "all-segment", entity_ids, {"plan": [b"pro", b"free"], "age": ages}
+    )
+    assert list(as_str) == [True, False]
+    assert list(as_bytes) == list(as_str)
+    assert list(as_list) == list(as_str)
+
+
+@pytest.mark.parametrize(
+    "operator, expected, value, matches",
+    [
+        ("isoneof", '["abc", "def"]', "abc", True),
+        ("isoneof", '["abc", "def"]', "b", False),
+        ("isnotoneof", '["abc", "def"]', "b", True),
+        # Only a JSON array matches; no substring or key tests on other JSON
+        ("isoneof", '"abc"', "b", False),
+        ("isoneof", '{"b": 1}', "b", False),
+        ("isnotoneof", '"abc"', "b", False),
+    ],
+)
+def test_string_one_of_requires_a_list(operator, expected, value, matches):
+    assert sdk._matches_string(operator, expected, value) is matches
+
+
+@pytest.mark.parametrize(
+    "operator, expected, value, matches",
+    [
+        ("isoneof", "[1, 2.5]", "2.5", True),
+        ("isnotoneof", "[1, 2.5]", "3", True),
+        ("isoneof", '"12"', "1", False),
+        ("isoneof", '{"1": 1}', "1", False),
+        ("isnotoneof", '"12"', "1", False),
+    ],
+)
+def test_number_one_of_requires_a_list(operator, expected, value, matches):
+    assert sdk._matches_number(operator, expected, value) is matches
+
+
+@pytest.mark.parametrize("max_size", [1, 3, 10, 16, 20, 100])
+def test_lru_cache_holds_exactly_max_size(max_size):
+    cache = sdk.LRUCache(max_size=max_size, ttl_seconds=60)
+    for i in range(1000):
+        cache.set(f"key-{i}", i)
+    assert len(cache) == max_size
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def stub_snapshot(**enabled):
+    snapshot = bench.build_snapshot(list(enabled), [])
+    for flag in snapshot["flags"]:
+        flag["enabled"] = enabled[flag["key"]]
+        flag["rollouts"] = []
+    return snapshot
+
+
+def test_watcher_invalidates_changed_flags_under_long_ttl():
+    with bench.StubFlipt(sdk, stub_snapshot(a=False, b=False)) as stub:
+        cached = sdk.CachedFliptClient(sdk.FliptClient(url=stub.url), ttl_seconds=3600)
+        watcher = cached.watch("default", interval=0.05)
+        try:
+            # The first poll reports every flag as changed
+            assert wait_for(lambda: watcher.fingerprints)
+            assert cached.evaluate_boolean("default", "a", "user-1") is False
+            assert cached.evaluate_boolean("default", "b", "user-1") is False
+            assert len(cached.cache) == 2
+
+            stub.set_snapshot(stub_snapshot(a=True, b=False))
+            assert wait_for(lambda: len(cached.cache) == 1)
+            assert cached.evaluate_boolean("default", "a", "user-1") is True
+            assert cached.cache.stats()["hits"] == 0
+            assert cached.evaluate_boolean("default", "b", "user-1") is False
+            assert cached.cache.stats()["hits"] == 1
+        finally:
+            watcher.stop()
+
+
+def test_watcher_survives_a_failing_callback():
+    calls = []
+
+    def on_change(namespace_key, changed, snapshot):
+        calls.append(changed)
+        if len(calls) == 1:
+            raise RuntimeError("callback failed")
+
+    with bench.StubFlipt(sdk, stub_snapshot(a=False)) as stub:
+        client = sdk.FliptClient(url=stub.url)
+        watcher = sdk.FlagWatcher(client, "default", on_change, interval=0.05)
+        watcher.start()
+        try:
+            # The failed change is delivered again, then later changes still arrive
+            assert wait_for(lambda: len(calls) == 2)
+            assert calls == [{"a"}, {"a"}]
+            stub.set_snapshot(stub_snapshot(a=True, b=False))
+            assert wait_for(lambda: len(calls) == 3)
+            assert calls[2] == {"a", "b"}
+            assert watcher._thread.is_alive()
+        finally:
+            watcher.stop()
+
+
+def test_unchanged_namespace_costs_a_304():
+    with bench.StubFlipt(sdk, stub_snapshot(a=True)) as stub:
+        client = sdk.FliptClient(url=stub.url)
+        snapshot, etag = client.poll_snapshot("default")
+        assert snapshot["flags"][0]["key"] == "a"
+        assert etag == stub.etag
+        assert client.poll_snapshot("default", etag) == (None, etag)
+
+
+def test_slow_flipt_times_out_to_default_and_trips_breaker():
+    with bench.StubFlipt(sdk, stub_snapshot(a=True), latency_ms=500) as stub:
+        client = sdk.FliptClient(
+            url=stub.url,
+            read_timeout=0.05,
+            breaker=sdk.CircuitBreaker(failure_threshold=2, reset_timeout=60),
+        )
+        start = time.monotonic()
+        assert client.evaluate_boolean("default", "a", "user-1") is False
+        assert client.evaluate_boolean("default", "a", "user-1") is False
+        assert time.monotonic() - start < 0.5
+        assert client.breaker.state == sdk.CircuitBreaker.OPEN
+        with pytest.raises(sdk.CircuitOpenError):
+            client.evaluate_boolean_or_raise("default", "a", "user-1")
+
+
+def test_watcher_retries_after_timeouts():
+    with bench.StubFlipt(sdk, stub_snapshot(a=False)) as stub:
+        client = sdk.FliptClient(
+            url=stub.url, read_timeout=0.05, breaker=sdk.CircuitBreaker(failure_threshold=100)
+        )
+        changes = []
+        watcher = sdk.FlagWatcher(
+            client, "default", lambda ns, changed, snap: changes.append(changed), interval=0.05
+        )
+        watcher.start()
+        try:
+            assert wait_for(lambda: changes == [{"a"}])
+            stub.latency_ms = 200
+            stub.set_snapshot(stub_snapshot(a=True))
+            time.sleep(0.3)
+            assert changes == [{"a"}]
+
+            # Polls that timed out are retried on the next interval
+            stub.latency_ms = 0
+            assert wait_for(lambda: changes == [{"a"}, {"a"}])
+        finally:
+            watcher.stop()
+
+
+def test_snapshot_store_round_trip(tmp_path):
+    store = sdk.SnapshotStore(str(tmp_path))
+    assert store.load("default") is None
+    store.save("default", PARITY_SNAPSHOT, '"etag-1"')
+    assert store.load("default") == (PARITY_SNAPSHOT, '"etag-1"')
+
+    (tmp_path / "default.json").write_text("")
+    assert store.load("default") is None
@@ -6,22 +6,358 @@ Quick test script for a running Flipt instance.
 3. Evaluates it via the evaluation API
 4. Cleans up
 
+With --parity it instead provisions a segment, a variant flag and a boolean
+flag, then checks that the local evaluation engine in
+examples/sdk/python-example.py returns the same result as the server for a
+range of entities and contexts.
+
+With --capacity it provisions --flags segments, flags and rollouts
+concurrently, fires a burst of --evaluations evaluations from --workers
+threads checking every result and reporting latency percentiles, then deletes
+the fixtures in parallel.
+
 Usage:
     pip install requests
     export FLIPT_URL=http://flipt.example.com   # defaults to http://localhost:8080
     python test-flipt.py
+    python test-flipt.py --parity --entities 500
+    python test-flipt.py --capacity --flags 50 --evaluations 5000 --workers 32
 """
 
+import argparse
+import importlib.util
 import requests
 import os
 import sys
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
 FLIPT_URL = os.getenv("FLIPT_URL", "http://localhost:8080")
 NAMESPACE = "default"
 FLAG_KEY = "test-flag"
 
+PARITY_SEGMENT = "parity-segment"
+PARITY_VARIANT_FLAG = "parity-variant"
+PARITY_BOOLEAN_FLAG = "parity-boolean"
+
+CAPACITY_PREFIX = "capacity"
+CAPACITY_PLANS = ("pro", "free", "team")
+
+REQUEST_TIMEOUT = 10
+
+SDK_EXAMPLE = Path(__file__).resolve().parents[2] / "examples" / "sdk" / "python-example.py"
+
+
+def load_sdk_example():
+    """Import examples/sdk/python-example.py (not importable by name)."""
+    spec = importlib.util.spec_from_file_location("flipt_sdk_example", SDK_EXAMPLE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _create(session, url, payload):
+    """POST a management API object, tolerating objects that already exist."""
+    resp = session.post(url, json=payload, timeout=REQUEST_TIMEOUT)
+    if resp.status_code not in (200, 409):
+        print(f"  Unexpected response from {url}: {resp.status_code} {resp.text}")
+        sys.exit(1)
+    return resp.json() if resp.status_code == 200 else {}
+
+
+def provision_parity_fixtures(session, base):
+    """Create a segment, a variant flag and a boolean flag covering rules and rollouts."""
+    api = f"{base}/api/v1/namespaces/{NAMESPACE}"
+
+    print(f"Creating segment '{PARITY_SEGMENT}' ...")
+    _create(session, f"{api}/segments", {
+        "key": PARITY_SEGMENT,
+        "name": "Parity Segment",
+        "matchType": "ANY_MATCH_TYPE",
+    })
+    for constraint in (
+        {"type": "STRING_COMPARISON_TYPE", "property": "plan", "operator": "eq", "value": "enterprise"},
+        {"type": "NUMBER_COMPARISON_TYPE", "property": "accountAge", "operator": "gte", "value": "365"},
+    ):
+        _create(session, f"{api}/segments/{PARITY_SEGMENT}/constraints", constraint)
+
+    print(f"Creating variant flag '{PARITY_VARIANT_FLAG}' ...")
+    _create(session, f"{api}/flags", {
+        "key": PARITY_VARIANT_FLAG,
+        "name": "Parity Variant",
+        "type": "VARIANT_FLAG_TYPE",
+        "enabled": True,
+    })
+    variant_ids = []
+    for key in ("control", "variant_a", "variant_b"):
+        variant = _create(session, f"{api}/flags/{PARITY_VARIANT_FLAG}/variants", {"key": key})
+        variant_ids.append(variant.get("id"))
+    rule = _create(session, f"{api}/flags/{PARITY_VARIANT_FLAG}/rules", {
+        "segmentKey": PARITY_SEGMENT,
+        "rank": 1,
+    })
+    if rule.get("id"):
+        for variant_id, rollout in zip(variant_ids, (34.0, 33.0, 33.0)):
+            _create(session, f"{api}/flags/{PARITY_VARIANT_FLAG}/rules/{rule['id']}/distributions", {
+                "variantId": variant_id,
+                "rollout": rollout,
+            })
+
+    print(f"Creating boolean flag '{PARITY_BOOLEAN_FLAG}' ...")
+    _create(session, f"{api}/flags", {
+        "key": PARITY_BOOLEAN_FLAG,
+        "name": "Parity Boolean",
+        "type": "BOOLEAN_FLAG_TYPE",
+        "enabled": False,
+    })
+    _create(session, f"{api}/flags/{PARITY_BOOLEAN_FLAG}/rollouts", {
+        "rank": 1,
+        "type": "SEGMENT_ROLLOUT_TYPE",
+        "segment": {"segmentKey": PARITY_SEGMENT, "value": True},
+    })
+    _create(session, f"{api}/flags/{PARITY_BOOLEAN_FLAG}/rollouts", {
+        "rank": 2,
+        "type": "THRESHOLD_ROLLOUT_TYPE",
+        "threshold": {"percentage": 30.0, "value": True},
+    })
+    print()
+
+
+def cleanup_parity_fixtures(session, base):
+    api = f"{base}/api/v1/namespaces/{NAMESPACE}"
+    print("Cleaning up parity fixtures ...")
+    for url in (
+        f"{api}/flags/{PARITY_VARIANT_FLAG}",
+        f"{api}/flags/{PARITY_BOOLEAN_FLAG}",
+        f"{api}/segments/{PARITY_SEGMENT}",
+    ):
+        resp = session.delete(url, timeout=REQUEST_TIMEOUT)
+        if resp.status_code != 200:
+            print(f"  Delete response for {url}: {resp.status_code} {resp.text}")
+    print()
+
+
+def _boolean_view(resp):
+    """Fields that must agree between server and local boolean evaluation."""
+    return resp.get("enabled", False), resp.get("reason", "UNKNOWN_EVALUATION_REASON")
+
+
+def _variant_view(resp):
+    """Fields that must agree between server and local variant evaluation."""
+    return (
+        resp.get("match", False),
+        resp.get("variantKey", ""),
+        resp.get("reason", "UNKNOWN_EVALUATION_REASON"),
+        sorted(resp.get("segmentKeys") or []),
+    )
+
+
+def run_parity(session, base, entities):
+    """Compare server-side and local evaluation for *entities* entities."""
+    sdk = load_sdk_example()
+    provision_parity_fixtures(session, base)
+
+    mismatches = 0
+    try:
+        client = sdk.FliptClient(url=base)
+        evaluator = sdk.LocalEvaluator(client.get_snapshot(NAMESPACE))
+
+        print(f"Comparing {entities} entities against the local engine ...")
+        for i in range(entities):
+            entity_id = f"parity-user-{i}"
+            context = {
+                "plan": ("enterprise", "free", "pro")[i % 3],
+                "accountAge": str((i * 37) % 730),
+            }
+            request = {"namespaceKey": NAMESPACE, "entityId": entity_id, "context": context}
+
+            resp = session.post(
+                f"{base}/evaluate/v1/boolean",
+                json={**request, "flagKey": PARITY_BOOLEAN_FLAG},
+                timeout=REQUEST_TIMEOUT,
+            )
+            resp.raise_for_status()
+            remote = resp.json()
+            local = evaluator.evaluate_boolean(PARITY_BOOLEAN_FLAG, entity_id, context)
+            if _boolean_view(remote) != _boolean_view(local):
+                mismatches += 1
+                print(f"  boolean mismatch for {entity_id}: remote={remote} local={local}")
+
+            resp = session.post(
+                f"{base}/evaluate/v1/variant",
+                json={**request, "flagKey": PARITY_VARIANT_FLAG},
+                timeout=REQUEST_TIMEOUT,
+            )
+            resp.raise_for_status()
+            remote = resp.json()
+            local = evaluator.evaluate_variant(PARITY_VARIANT_FLAG, entity_id, context)
+            if _variant_view(remote) != _variant_view(local):
+                mismatches += 1
+                print(f"  variant mismatch for {entity_id}: remote={remote} local={local}")
+    finally:
+        cleanup_parity_fixtures(session, base)
+
+    if mismatches:
+        print(f"Parity FAILED: {mismatches} mismatches across {entities} entities")
+        sys.exit(1)
+    print(f"Parity OK: {entities} entities evaluated identically.")
+
+
+def pooled_session(workers):
+    """A session whose connection pool can keep one connection per worker."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _capacity_keys(i):
+    return f"{CAPACITY_PREFIX}-segment-{i}", f"{CAPACITY_PREFIX}-flag-{i}"
+
+
+def _provision_capacity_fixture(session, api, i):
+    """Create one segment, one boolean flag and its segment + 50% threshold rollouts."""
+    segment_key, flag_key = _capacity_keys(i)
+    _create(session, f"{api}/segments", {
+        "key": segment_key,
+        "name": f"Capacity Segment {i}",
+        "matchType": "ALL_MATCH_TYPE",
+    })
+    _create(session, f"{api}/segments/{segment_key}/constraints", {
+        "type": "STRING_COMPARISON_TYPE", "property": "plan", "operator": "eq", "value": "pro",
+    })
+    _create(session, f"{api}/flags", {
+        "key": flag_key,
+        "name": f"Capacity Flag {i}",
+        "type": "BOOLEAN_FLAG_TYPE",
+        "enabled": False,
+    })
+    _create(session, f"{api}/flags/{flag_key}/rollouts", {
+        "rank": 1,
+        "type": "SEGMENT_ROLLOUT_TYPE",
+        "segment": {"segmentKey": segment_key, "value": True},
+    })
+    _create(session, f"{api}/flags/{flag_key}/rollouts", {
+        "rank": 2,
+        "type": "THRESHOLD_ROLLOUT_TYPE",
+        "threshold": {"percentage": 50.0, "value": True},
+    })
+
+
+def _delete(session, url):
+    resp = session.delete(url, timeout=REQUEST_TIMEOUT)
+    if resp.status_code not in (200, 404):
+        print(f"  Delete response for {url}: {resp.status_code} {resp.text}")
+        return False
+    return True
+
+
+def cleanup_capacity_fixtures(session, base, flags, pool):
+    api = f"{base}/api/v1/namespaces/{NAMESPACE}"
+    print(f"Cleaning up {flags} capacity fixtures ...")
+    start = time.perf_counter()
+    # Flags go first: Flipt refuses to delete a segment that a rollout still uses
+    flag_urls = [f"{api}/flags/{_capacity_keys(i)[1]}" for i in range(flags)]
+    segment_urls = [f"{api}/segments/{_capacity_keys(i)[0]}" for i in range(flags)]
+    ok = all(pool.map(lambda url: _delete(session, url), flag_urls))
+    ok = all(pool.map(lambda url: _delete(session, url), segment_urls)) and ok
+    print(f"  Done in {time.perf_counter() - start:.2f}s\n")
+    return ok
+
+
+def _expected_capacity(flag_key, entity_id, plan):
+    """What the capacity fixtures should return: the segment wins, then 50% of entities."""
+    if plan == "pro":
+        return True
+    return zlib.crc32((entity_id + flag_key).encode()) % 100 < 50
+
+
+def _percentile(samples, pct):
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+def run_capacity(base, flags, evaluations, workers, max_p99_ms=None):
+    """Provision *flags* fixtures in parallel, evaluate a burst against them and clean up."""
+    session = pooled_session(workers)
+    api = f"{base}/api/v1/namespaces/{NAMESPACE}"
+    pool = ThreadPoolExecutor(max_workers=workers)
+
+    def evaluate(i):
+        _, flag_key = _capacity_keys(i % flags)
+        entity_id = f"capacity-user-{i}"
+        plan = CAPACITY_PLANS[i % len(CAPACITY_PLANS)]
+        start = time.perf_counter()
+        try:
+            resp = session.post(f"{base}/evaluate/v1/boolean", json={
+                "namespaceKey": NAMESPACE,
+                "flagKey": flag_key,
+                "entityId": entity_id,
+                "context": {"plan": plan},
+            }, timeout=REQUEST_TIMEOUT)
+            resp.raise_for_status()
+            enabled = resp.json().get("enabled", False)
+        except requests.exceptions.RequestException as e:
+            return time.perf_counter() - start, f"{flag_key}/{entity_id}: {e}"
+        elapsed = time.perf_counter() - start
+        if enabled != _expected_capacity(flag_key, entity_id, plan):
+            return elapsed, f"{flag_key}/{entity_id}: expected {not enabled}, got {enabled}"
+        return elapsed, None
+
+    failures = []
+    try:
+        print(f"Provisioning {flags} segments, flags and rollouts with {workers} workers ...")
+        start = time.perf_counter()
+        for future in [pool.submit(_provision_capacity_fixture, session, api, i) for i in range(flags)]:
+            future.result()
+        print(f"  Done in {time.perf_counter() - start:.2f}s\n")
+
+        print(f"Evaluating {evaluations} times with {workers} workers ...")
+        start = time.perf_counter()
+        results = list(pool.map(evaluate, range(evaluations)))
+        wall = time.perf_counter() - start
+
+        failures = [error for _, error in results if error]
+        for error in failures[:10]:
+            print(f"  {error}")
+        latencies = sorted(elapsed * 1000 for elapsed, _ in results)
+        p99 = _percentile(latencies, 99)
+        print(f"  {evaluations / wall:.0f} evaluations/s, {len(failures)} failed")
+        print(
+            f"  Latency ms: p50={_percentile(latencies, 50):.1f} p95={_percentile(latencies, 95):.1f} "
+            f"p99={p99:.1f} max={latencies[-1]:.1f}\n"
+        )
+    finally:
+        cleanup_capacity_fixtures(session, base, flags, pool)
+        pool.shutdown()
+
+    if failures:
+        print(f"Capacity FAILED: {len(failures)} of {evaluations} evaluations were wrong or errored")
+        sys.exit(1)
+    if max_p99_ms is not None and p99 > max_p99_ms:
+        print(f"Capacity FAILED: p99 {p99:.1f}ms is above {max_p99_ms:.1f}ms")
+        sys.exit(1)
+    print(f"Capacity OK: {evaluations} evaluations across {flags} flags.")
+
 
 def main():
+    parser = argparse.ArgumentParser(description="Flipt smoke test")
+    parser.add_argument("--parity", action="store_true", help="Check local evaluation engine parity")
+    parser.add_argument("--entities", type=int, default=200, help="Entities to compare in --parity mode")
+    parser.add_argument("--capacity", action="store_true", help="Provision flags in parallel and run an evaluation burst")
+    parser.add_argument("--flags", type=int, default=20, help="Flags to provision in --capacity mode")
+    parser.add_argument("--evaluations", type=int, default=2000, help="Evaluations to run in --capacity mode")
+    parser.add_argument("--workers", type=int, default=16, help="Concurrent requests in --capacity mode")
+    parser.add_argument("--max-p99-ms", type=float, help="Fail --capacity mode if p99 latency exceeds this")
+    args = parser.parse_args()
+    for name in ("entities", "flags", "evaluations", "workers"):
+        if getattr(args, name) < 1:
+            parser.error(f"--{name} must be at least 1")
+
     session = requests.Session()
     base = FLIPT_URL.rstrip("/")
 
@@ -35,6 +371,14 @@ def main():
         print(f"  Cannot reach Flipt: {e}")
         sys.exit(1)
 
+    if args.parity:
+        run_parity(session, base, args.entities)
+        return
+
+    if args.capacity:
+        run_capacity(base, args.flags, args.evaluations, args.workers, args.max_p99_ms)
+        return
+
     # 2. Create a boolean flag
     print(f"Creating boolean flag '{FLAG_KEY}' ...")
     resp = session.post(
@@ -0,0 +1,554 @@
+"""Minimal in-process Kubernetes API client for the smoke tests.
+
+Talks to the API server directly instead of forking ``kubectl`` for every
+discovery call and port-forward: kubeconfig parsing, a pooled HTTPS session
+for list/get calls, and pod port-forwarding over the API server's websocket
+stream.  Only ``requests`` is required; PyYAML is used to read kubeconfig
+files when it is installed (JSON kubeconfigs work without it).
+
+The storagebox and gitea smoke tests each carry a copy of this file; keep
+them identical (.github/workflows/smoke-test-shared-modules.yml checks).
+"""
+
+import atexit
+import base64
+import hashlib
+import json
+import logging
+import os
+import socket
+import ssl
+import struct
+import subprocess
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+log = logging.getLogger(__name__)
+
+SERVICE_ACCOUNT_DIR = "/var/run/secrets/kubernetes.io/serviceaccount"
+
+# Port-forward stream protocol: channel 0 carries data, channel 1 errors
+PORT_FORWARD_PROTOCOL = "v4.channel.k8s.io"
+DATA_CHANNEL = 0
+ERROR_CHANNEL = 1
+
+_temp_files = []
+
+
+class KubeApiError(RuntimeError):
+    """Raised for kubeconfig, API and port-forward stream errors."""
+
+
+@atexit.register
+def _remove_temp_files():
+    for path in _temp_files:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def _data_file(data, suffix):
+    """Write base64 kubeconfig data (a CA, cert or key) to a private temp file."""
+    fd, path = tempfile.mkstemp(prefix="kube-api-", suffix=suffix)
+    with os.fdopen(fd, "wb") as f:
+        f.write(base64.b64decode(data))
+    _temp_files.append(path)
+    return path
+
+
+def _pem_file(pem, suffix):
+    return _data_file(base64.b64encode(pem.encode()), suffix)
+
+
+def _read_kubeconfig(path):
+    with open(path) as f:
+        text = f.read()
+    try:
+        import yaml
+    except ImportError:
+        try:
+            return json.loads(text)
+        except ValueError:
+            raise KubeApiError(f"{path} is YAML; install PyYAML to read it")
+    return yaml.safe_load(text)
+
+
+def _exec_credential(spec, base_dir):
+    """Run a kubeconfig exec credential plugin (e.g. for EKS or GKE) once."""
+    env = dict(os.environ)
+    for item in spec.get("env") or []:
+        env[item["name"]] = item["value"]
+    command = spec["command"]
+    if os.sep in command and not os.path.isabs(command):
+        command = os.path.join(base_dir, command)
+    result = subprocess.run(
+        [command] + list(spec.get("args") or []),
+        capture_output=True, text=True, env=env, timeout=60,
+    )
+    if result.returncode != 0:
+        raise KubeApiError(f"credential plugin {command} failed: {result.stderr.strip()}")
+    return json.loads(result.stdout).get("status", {})
+
+
+def _by_name(entries, name, kind):
+    for entry in entries or []:
+        if entry.get("name") == name:
+            return entry.get(kind) or {}
+    raise KubeApiError(f"{kind} {name!r} not found in kubeconfig")
+
+
+def load_kubeconfig(path=None, context=None):
+    """Resolve connection settings from a kubeconfig or the in-cluster service account.
+
+    Returns a dict with ``server``, ``verify`` (bool or CA bundle path),
+    ``cert`` ((cert, key) paths or None) and ``token`` (or None).
+    """
+    if path is None:
+        candidates = os.environ.get("KUBECONFIG", "").split(os.pathsep)
+        candidates.append(os.path.expanduser("~/.kube/config"))
+        path = next((p for p in candidates if p and os.path.exists(p)), None)
+
+    if path is None:
+        if "KUBERNETES_SERVICE_HOST" not in os.environ:
+            raise KubeApiError("no kubeconfig found and not running in a cluster")
+        with open(os.path.join(SERVICE_ACCOUNT_DIR, "token")) as f:
+            token = f.read().strip()
+        host = os.environ["KUBERNETES_SERVICE_HOST"]
+        if ":" in host:
+            host = f"[{host}]"
+        return {
+            "server": f"https://{host}:{os.environ.get('KUBERNETES_SERVICE_PORT', '443')}",
+            "verify": os.path.join(SERVICE_ACCOUNT_DIR, "ca.crt"),
+            "cert": None,
+            "token": token,
+        }
+
+    config = _read_kubeconfig(path) or {}
+    base_dir = os.path.dirname(os.path.abspath(path))
+
+    def local_path(value):
+        return value if os.path.isabs(value) else os.path.join(base_dir, value)
+
+    context_name = context or config.get("current-context")
+    ctx = _by_name(config.get("contexts"), context_name, "context")
+    cluster = _by_name(config.get("clusters"), ctx.get("cluster"), "cluster")
+    user = _by_name(config.get("users"), ctx.get("user"), "user") if ctx.get("user") else {}
+
+    if cluster.get("insecure-skip-tls-verify"):
+        verify = False
+    elif cluster.get("certificate-authority-data"):
+        verify = _data_file(cluster["certificate-authority-data"], ".crt")
+    elif cluster.get("certificate-authority"):
+        verify = local_path(cluster["certificate-authority"])
+    else:
+        verify = True
+
+    cert = None
+    token = user.get("token")
+    if user.get("client-certificate-data"):
+        cert = (
+            _data_file(user["client-certificate-data"], ".crt"),
+            _data_file(user["client-key-data"], ".key"),
+        )
+    elif user.get("client-certificate"):
+        cert = (local_path(user["client-certificate"]), local_path(user["client-key"]))
+    if not token and user.get("tokenFile"):
+        with open(local_path(user["tokenFile"])) as f:
+            token = f.read().strip()
+    if not token and not cert and user.get("exec"):
+        status = _exec_credential(user["exec"], base_dir)
+        token = status.get("token")
+        if status.get("clientCertificateData"):
+            cert = (
+                _pem_file(status["clientCertificateData"], ".crt"),
+                _pem_file(status["clientKeyData"], ".key"),
+            )
+
+    return {"server": cluster["server"].rstrip("/"), "verify": verify, "cert": cert, "token": token}
+
+
+def _mask(payload, mask):
+    if not payload:
+        return payload
+    n = len(payload)
+    key = (mask * (n // 4 + 1))[:n]
+    return (int.from_bytes(payload, "big") ^ int.from_bytes(key, "big")).to_bytes(n, "big")
+
+
+class WebSocket:
+    """Just enough of an RFC 6455 client for the port-forward stream."""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self._send_lock = threading.Lock()
+        self._buffer = b""
+
+    @classmethod
+    def connect(cls, url, headers, subprotocol, ssl_context=None, timeout=30):
+        parts = urlsplit(url)
+        secure = parts.scheme in ("https", "wss")
+        port = parts.port or (443 if secure else 80)
+        sock = socket.create_connection((parts.hostname, port), timeout=timeout)
+        if secure:
+            sock = (ssl_context or ssl.create_default_context()).wrap_socket(
+                sock, server_hostname=parts.hostname,
+            )
+
+        key = base64.b64encode(os.urandom(16)).decode()
+        request = [
+            f"GET {parts.path}?{parts.query} HTTP/1.1",
+            f"Host: {parts.netloc}",
+            "Upgrade: websocket",
+            "Connection: Upgrade",
+            f"Sec-WebSocket-Key: {key}",
+            "Sec-WebSocket-Version: 13",
+            f"Sec-WebSocket-Protocol: {subprotocol}",
+        ] + [f"{name}: {value}" for name, value in headers.items()]
+        sock.sendall(("\r\n".join(request) + "\r\n\r\n").encode())
+
+        ws = cls(sock)
+        head = ws._read_until(b"\r\n\r\n").decode("latin-1")
+        status_line, *header_lines = head.split("\r\n")
+        if " 101 " not in f"{status_line} ":
+            raise KubeApiError(f"websocket upgrade refused: {status_line}")
+        response_headers = {
+            name.strip().lower(): value.strip()
+            for name, _, value in (line.partition(":") for line in header_lines if line)
+        }
+        expected = base64.b64encode(
+            hashlib.sha1((key + "258EAFA5-E914-47DA-95CA-C5AB0DC85B11").encode()).digest()
+        ).decode()
+        if response_headers.get("sec-websocket-accept") != expected:
+            raise KubeApiError("websocket upgrade returned a bad Sec-WebSocket-Accept")
+        sock.settimeout(None)
+        return ws
+
+    def _read_until(self, marker):
+        while marker not in self._buffer:
+            chunk = self.sock.recv(4096)
+            if not chunk:
+                raise KubeApiError("connection closed during websocket handshake")
+            self._buffer += chunk
+        head, _, self._buffer = self._buffer.partition(marker)
+        return head
+
+    def _read_exact(self, n):
+        while len(self._buffer) < n:
+            chunk = self.sock.recv(max(65536, n - len(self._buffer)))
+            if not chunk:
+                raise EOFError
+            self._buffer += chunk
+        data, self._buffer = self._buffer[:n], self._buffer[n:]
+        return data
+
+    def send(self, payload, opcode=0x2):
+        header = bytes([0x80 | opcode])
+        length = len(payload)
+        if length < 126:
+            header += bytes([0x80 | length])
+        elif length < 1 << 16:
+            header += bytes([0x80 | 126]) + struct.pack("!H", length)
+        else:
+            header += bytes([0x80 | 127]) + struct.pack("!Q", length)
+        mask = os.urandom(4)
+        with self._send_lock:
+            self.sock.sendall(header + mask + _mask(payload, mask))
+
+    def recv(self):
+        """Return the next data message, or None once the peer closes."""
+        message = b""
+        while True:
+            try:
+                first, second = self._read_exact(2)
+            except (EOFError, OSError):
+                return None
+            opcode = first & 0x0F
+            length = second & 0x7F
+            if length == 126:
+                length = struct.unpack("!H", self._read_exact(2))[0]
+            elif length == 127:
+                length = struct.unpack("!Q", self._read_exact(8))[0]
+            mask = self._read_exact(4) if second & 0x80 else None
+            payload = self._read_exact(length)
+            if mask:
+                payload = _mask(payload, mask)
+
+            if opcode == 0x8:
+                return None
+            if opcode == 0x9:
+                self.send(payload, opcode=0xA)
+                continue
+            if opcode == 0xA:
+                continue
+            message += payload
+            if first & 0x80:
+                return message
+
+    def close(self):
+        try:
+            self.send(b"\x03\xe8", opcode=0x8)
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class ApiPortForward:
+    """A local listener that tunnels each connection to a pod port.
+
+    Every accepted connection gets its own port-forward websocket, the same
+    way ``kubectl port-forward`` opens a stream per connection.  Exposes the
+    ``poll``/``terminate``/``wait``/``kill`` subset of ``subprocess.Popen``
+    the smoke tests use to manage kubectl processes.
+    """
+
+    def __init__(self, client, namespace, pod, port, local_port=0):
+        self.client = client
+        self.namespace = namespace
+        self.pod = pod
+        self.port = port
+        self._listener = socket.create_server(("127.0.0.1", local_port))
+        self.local_port = self._listener.getsockname()[1]
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._accept, name=f"port-forward-{pod}-{port}", daemon=True,
+        )
+        self._thread.start()
+
+    def _accept(self):
+        while not self._stopped.is_set():
+            try:
+                conn, _ = self._listener.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._tunnel, args=(conn,), daemon=True).start()
+
+    def _tunnel(self, conn):
+        try:
+            ws = self.client.port_forward_stream(self.namespace, self.pod, self.port)
+        except (KubeApiError, OSError) as exc:
+            log.warning("port-forward to %s:%s failed: %s", self.pod, self.port, exc)
+            conn.close()
+            return
+
+        def upstream():
+            try:
+                while True:
+                    data = conn.recv(65536)
+                    if not data:
+                        break
+                    ws.send(bytes([DATA_CHANNEL]) + data)
+            except OSError:
+                pass
+            ws.close()
+
+        threading.Thread(target=upstream, daemon=True).start()
+        # The first frame on each channel is the port number, not data
+        seen = set()
+        try:
+            while True:
+                message = ws.recv()
+                if not message:
+                    break
+                channel, payload = message[0], message[1:]
+                if channel not in seen:
+                    seen.add(channel)
+                    payload = payload[2:]
+                if not payload:
+                    continue
+                if channel == ERROR_CHANNEL:
+                    log.warning("port-forward to %s:%s: %s", self.pod, self.port, payload.decode(errors="replace"))
+                    break
+                conn.sendall(payload)
+        except OSError:
+            pass
+        finally:
+            ws.close()
+            # shutdown() also wakes the upstream thread blocked in recv()
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            conn.close()
+
+    def poll(self):
+        return 0 if self._stopped.is_set() else None
+
+    def terminate(self):
+        self._stopped.set()
+        # shutdown() wakes the accept() call; close() alone would not
+        try:
+            self._listener.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._listener.close()
+
+    kill = terminate
+
+    def wait(self, timeout=None):
+        self._thread.join(timeout)
+        return 0
+
+
+class KubeClient:
+    """Pooled HTTPS client for the handful of API calls the smoke tests need."""
+
+    def __init__(self, kubeconfig=None, context=None, pool_size=10, timeout=30):
+        self.config = load_kubeconfig(kubeconfig, context)
+        self.server = self.config["server"]
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.verify = self.config["verify"]
+        self.session.cert = self.config["cert"]
+        if self.config["token"]:
+            self.session.headers["Authorization"] = f"Bearer {self.config['token']}"
+
+    def get(self, path, **params):
+        resp = self.session.get(f"{self.server}{path}", params=params or None, timeout=self.timeout)
+        if resp.status_code >= 400:
+            raise KubeApiError(f"GET {path}: {resp.status_code} {resp.text.strip()[:200]}")
+        return resp.json()
+
+    def list_services(self, namespace, label_selector=None):
+        params = {"labelSelector": label_selector} if label_selector else {}
+        return self.get(f"/api/v1/namespaces/{namespace}/services", **params)
+
+    def get_service(self, namespace, name):
+        return self.get(f"/api/v1/namespaces/{namespace}/services/{name}")
+
+    def list_pods(self, namespace, label_selector=None):
+        params = {"labelSelector": label_selector} if label_selector else {}
+        return self.get(f"/api/v1/namespaces/{namespace}/pods", **params)
+
+    def resolve_service_port(self, namespace, service, port):
+        """Pick a running pod behind *service* and the pod port its *port* targets.
+
+        Mirrors ``kubectl port-forward svc/NAME``: the first running pod
+        matching the service selector, with named target ports looked up in
+        the pod's container ports.
+        """
+        svc = self.get_service(namespace, service)
+        selector = svc.get("spec", {}).get("selector") or {}
+        if not selector:
+            raise KubeApiError(f"service {service} has no selector")
+        pods = self.list_pods(namespace, ",".join(f"{k}={v}" for k, v in selector.items()))
+        running = [p for p in pods.get("items", []) if p.get("status", {}).get("phase") == "Running"]
+        if not running:
+            raise KubeApiError(f"no running pods for service {service}")
+        pod = running[0]
+
+        target = port
+        for svc_port in svc["spec"].get("ports") or []:
+            if svc_port.get("port") == port:
+                target = svc_port.get("targetPort", port)
+                break
+        if isinstance(target, str):
+            for container in pod.get("spec", {}).get("containers") or []:
+                for container_port in container.get("ports") or []:
+                    if container_port.get("name") == target:
+                        target = container_port["containerPort"]
+                        break
+                if not isinstance(target, str):
+                    break
+            else:
+                raise KubeApiError(f"named port {target!r} not found on pod {pod['metadata']['name']}")
+        return pod["metadata"]["name"], int(target)
+
+    @staticmethod
+    def _slice_ready(endpoint_slice):
+        # A missing ready condition means ready, per the discovery.k8s.io/v1 API
+        return any(
+            (endpoint.get("conditions") or {}).get("ready") is not False
+            for endpoint in endpoint_slice.get("endpoints") or []
+        )
+
+    def wait_for_endpoints(self, namespace, service, timeout):
+        """Wait until *service* has a ready endpoint, watching its EndpointSlices.
+
+        Returns True as soon as a ready endpoint appears and False if none did
+        within *timeout* seconds.
+        """
+        path = f"/apis/discovery.k8s.io/v1/namespaces/{namespace}/endpointslices"
+        selector = f"kubernetes.io/service-name={service}"
+        deadline = time.monotonic() + timeout
+
+        while time.monotonic() < deadline:
+            listing = self.get(path, labelSelector=selector)
+            ready = {s["metadata"]["name"]: self._slice_ready(s) for s in listing.get("items", [])}
+            if any(ready.values()):
+                return True
+
+            remaining = deadline - time.monotonic()
+            params = {
+                "labelSelector": selector,
+                "watch": "1",
+                "resourceVersion": listing.get("metadata", {}).get("resourceVersion", ""),
+                "timeoutSeconds": max(1, int(remaining)),
+            }
+            try:
+                with self.session.get(
+                    f"{self.server}{path}", params=params, stream=True,
+                    timeout=(self.timeout, remaining + 1),
+                ) as resp:
+                    if resp.status_code >= 400:
+                        raise KubeApiError(f"watch {path}: {resp.status_code} {resp.text.strip()[:200]}")
+                    for line in resp.iter_lines():
+                        if not line:
+                            continue
+                        event = json.loads(line)
+                        obj = event.get("object") or {}
+                        if event.get("type") == "ERROR":
+                            # Usually 410 Gone: our resourceVersion expired, so list again
+                            break
+                        if event.get("type") == "DELETED":
+                            ready.pop(obj["metadata"]["name"], None)
+                        elif event.get("type") in ("ADDED", "MODIFIED"):
+                            ready[obj["metadata"]["name"]] = self._slice_ready(obj)
+                        if any(ready.values()):
+                            return True
+                        if time.monotonic() >= deadline:
+                            return False
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+                # Watches are long-lived; a dropped one is re-established
+                # from a fresh list until the deadline
+                continue
+        return False
+
+    def _ssl_context(self):
+        verify = self.config["verify"]
+        if verify is False:
+            context = ssl.create_default_context()
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+        elif isinstance(verify, str):
+            context = ssl.create_default_context(cafile=verify)
+        else:
+            context = ssl.create_default_context()
+        if self.config["cert"]:
+            context.load_cert_chain(*self.config["cert"])
+        return context
+
+    def port_forward_stream(self, namespace, pod, port):
+        """Open one port-forward websocket to *pod*:*port*."""
+        query = urlencode({"ports": port})
+        url = f"{self.server}/api/v1/namespaces/{namespace}/pods/{pod}/portforward?{query}"
+        headers = {}
+        if self.config["token"]:
+            headers["Authorization"] = f"Bearer {self.config['token']}"
+        context = self._ssl_context() if url.startswith("https") else None
+        return WebSocket.connect(url, headers, PORT_FORWARD_PROTOCOL, context, self.timeout)
+
+    def port_forward(self, namespace, service, remote_port, local_port=0):
+        """Forward a local port to *service*:*remote_port* and return the ApiPortForward."""
+        pod, pod_port = self.resolve_service_port(namespace, service, remote_port)
+        log.debug("port-forward svc/%s:%s resolved to pod %s:%s", service, remote_port, pod, pod_port)
+        return ApiPortForward(self, namespace, pod, pod_port, local_port)
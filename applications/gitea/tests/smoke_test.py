@@ -6,20 +6,34 @@ Validates that the three core components are reachable after a Helm install:
   - PostgreSQL via CloudNativePG (port 5432)
   - Valkey cache (Redis-compatible, port 6379)
 
+With ``--backend api`` discovery and port-forwards talk to the Kubernetes API
+directly (see kube_api.py) instead of running kubectl.  With ``--monitor``
+the checks repeat every ``--interval`` seconds and their results are served
+as Prometheus metrics (see monitor.py).  ``--json`` and ``--junit`` write each
+check's result with a breakdown of where its time went (see reporting.py).
+
 Usage:
-    python smoke_test.py [--namespace NAMESPACE] [--release RELEASE]
+    python smoke_test.py [--namespace NAMESPACE] [--release RELEASE] [--backend kubectl|api]
+                         [--wait-ready] [--monitor [--interval 60] [--listen :9300]]
+                         [--json PATH] [--junit PATH]
 """
 
 import argparse
 import json
 import logging
+import random
 import socket
 import subprocess
 import sys
+import threading
 import time
 
 import requests
 
+import kube_api
+import monitor
+import reporting
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s [%(levelname)s] %(message)s",
@@ -30,6 +44,10 @@ log = logging.getLogger(__name__)
 # Helpers
 # ---------------------------------------------------------------------------
 
+# Set by --backend api; when None, kubectl subprocesses are used.
+_api: kube_api.KubeClient | None = None
+
+
 def _kubectl(args: list[str], namespace: str | None = None) -> str:
     """Run a kubectl command and return stdout."""
     cmd = ["kubectl"]
@@ -53,22 +71,29 @@ def discover_service(
     substring are considered (useful for picking the CNPG ``-rw`` service
     out of the ``-r``, ``-ro``, ``-rw`` triple).
     """
-    try:
-        out = _kubectl(
-            ["get", "svc", "-l", label_selector, "-o", "json"],
-            namespace=namespace,
-        )
-        services = json.loads(out)
-        items = services.get("items", [])
-        if name_contains:
-            items = [i for i in items if name_contains in i["metadata"]["name"]]
-        if items:
-            name = items[0]["metadata"]["name"]
-            log.info("Discovered service %s via labels '%s'", name, label_selector)
-            return name
-    except (subprocess.CalledProcessError, json.JSONDecodeError, KeyError) as exc:
-        log.warning("Label-based discovery failed (%s), using fallback: %s", exc, fallback_name)
-    return fallback_name
+    with reporting.phase("discover"):
+        try:
+            if _api is not None:
+                services = _api.list_services(namespace, label_selector)
+            else:
+                out = _kubectl(
+                    ["get", "svc", "-l", label_selector, "-o", "json"],
+                    namespace=namespace,
+                )
+                services = json.loads(out)
+            items = services.get("items", [])
+            if name_contains:
+                items = [i for i in items if name_contains in i["metadata"]["name"]]
+            if items:
+                name = items[0]["metadata"]["name"]
+                log.info("Discovered service %s via labels '%s'", name, label_selector)
+                return name
+        except (
+            subprocess.CalledProcessError, json.JSONDecodeError, KeyError,
+            kube_api.KubeApiError, requests.RequestException,
+        ) as exc:
+            log.warning("Label-based discovery failed (%s), using fallback: %s", exc, fallback_name)
+        return fallback_name
 
 
 def _free_port() -> int:
@@ -78,37 +103,134 @@ def _free_port() -> int:
         return s.getsockname()[1]
 
 
+class PortForwardManager:
+    """Long-lived ``kubectl port-forward`` processes, one per service port.
+
+    Forwards are started on first use and reused until the run ends.
+    Readiness comes from kubectl's "Forwarding from" line instead of a fixed
+    sleep; a forward that has exited or was discarded is restarted on the
+    next request.
+    """
+
+    def __init__(self, ready_timeout: float = 15.0):
+        self.ready_timeout = ready_timeout
+        self._forwards: dict[tuple[str, str, int], tuple[subprocess.Popen, int]] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, namespace: str, service: str, remote_port: int) -> tuple[subprocess.Popen, int]:
+        if _api is not None:
+            try:
+                forward = _api.port_forward(namespace, service, remote_port)
+            except (kube_api.KubeApiError, requests.RequestException) as exc:
+                raise RuntimeError(f"port-forward to {service}:{remote_port} failed: {exc}") from exc
+            log.info("Started API port-forward: svc/%s %s:%s", service, forward.local_port, remote_port)
+            return forward, forward.local_port
+
+        local_port = _free_port()
+        cmd = [
+            "kubectl", "-n", namespace,
+            "port-forward", f"svc/{service}",
+            f"{local_port}:{remote_port}",
+        ]
+        log.info("Starting port-forward: %s", " ".join(cmd))
+        proc = subprocess.Popen(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+        )
+
+        # kubectl logs every forwarded connection, so keep draining its pipes
+        # or it blocks once they fill up.
+        ready = threading.Event()
+        errors: list[str] = []
+
+        def _drain(pipe, sink: list[str] | None) -> None:
+            for line in pipe:
+                if line.startswith("Forwarding from"):
+                    ready.set()
+                if sink is not None:
+                    sink.append(line.strip())
+                    del sink[:-5]
+
+        drainers = [
+            threading.Thread(target=_drain, args=(pipe, sink), daemon=True)
+            for pipe, sink in ((proc.stdout, None), (proc.stderr, errors))
+        ]
+        for drainer in drainers:
+            drainer.start()
+
+        deadline = time.monotonic() + self.ready_timeout
+        while not ready.wait(0.05):
+            if proc.poll() is not None or time.monotonic() > deadline:
+                self._stop(proc)
+                drainers[1].join(timeout=1)
+                reason = " ".join(errors) or f"not ready after {self.ready_timeout}s"
+                raise RuntimeError(f"port-forward to {service}:{remote_port} failed: {reason}")
+        return proc, local_port
+
+    @staticmethod
+    def _stop(proc: subprocess.Popen) -> None:
+        if proc.poll() is None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    def get(self, namespace: str, service: str, remote_port: int) -> int:
+        """Return the local port forwarded to *service*:*remote_port*, starting it if needed."""
+        key = (namespace, service, remote_port)
+        with self._lock:
+            forward = self._forwards.get(key)
+            if forward is None or forward[0].poll() is not None:
+                with reporting.phase("forward_ready"):
+                    forward = self._forwards[key] = self._start(namespace, service, remote_port)
+            return forward[1]
+
+    def discard(self, namespace: str, service: str, remote_port: int) -> None:
+        """Stop a forward so that the next request starts a fresh one."""
+        with self._lock:
+            forward = self._forwards.pop((namespace, service, remote_port), None)
+        if forward:
+            self._stop(forward[0])
+
+    def close(self) -> None:
+        with self._lock:
+            forwards, self._forwards = list(self._forwards.values()), {}
+        for proc, _ in forwards:
+            self._stop(proc)
+
+
+_forwards = PortForwardManager()
+
+# Shared by the HTTP probes so repeated checks (e.g. under --monitor) reuse
+# their connections through the port-forwards.
+_http = requests.Session()
+
+
 class PortForward:
-    """Context manager that runs ``kubectl port-forward`` in the background."""
+    """Context manager exposing a shared port-forward as ``local_port``.
+
+    The underlying kubectl process is owned by the module's
+    PortForwardManager and outlives the block; it is only restarted if the
+    block raises, in case the tunnel itself broke.
+    """
 
     def __init__(self, namespace: str, service: str, remote_port: int):
         self.namespace = namespace
         self.service = service
         self.remote_port = remote_port
-        self.local_port = _free_port()
-        self._proc: subprocess.Popen | None = None
+
+    @property
+    def local_port(self) -> int:
+        # Looked up on every use so a retry after kubectl exited gets a new forward
+        return _forwards.get(self.namespace, self.service, self.remote_port)
 
     def __enter__(self):
-        cmd = [
-            "kubectl", "-n", self.namespace,
-            "port-forward", f"svc/{self.service}",
-            f"{self.local_port}:{self.remote_port}",
-        ]
-        log.info("Starting port-forward: %s", " ".join(cmd))
-        self._proc = subprocess.Popen(
-            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-        )
-        # Give the tunnel a moment to establish.
-        time.sleep(3)
-        if self._proc.poll() is not None:
-            stderr = self._proc.stderr.read().decode() if self._proc.stderr else ""
-            raise RuntimeError(f"port-forward exited immediately: {stderr}")
+        _forwards.get(self.namespace, self.service, self.remote_port)
         return self
 
-    def __exit__(self, *_exc):
-        if self._proc and self._proc.poll() is None:
-            self._proc.terminate()
-            self._proc.wait(timeout=5)
+    def __exit__(self, exc_type, *_exc):
+        if exc_type is not None:
+            _forwards.discard(self.namespace, self.service, self.remote_port)
 
 
 def tcp_check(host: str, port: int, timeout: float = 5.0) -> bool:
@@ -120,19 +242,104 @@ def tcp_check(host: str, port: int, timeout: float = 5.0) -> bool:
         return False
 
 
-def _retry(fn, description: str, retries: int = 10, interval: float = 3.0):
-    """Retry *fn* until it returns a truthy value or we run out of attempts."""
-    for attempt in range(1, retries + 1):
-        log.info("[%d/%d] %s", attempt, retries, description)
+# Latency of each check's last successful probe: {check: (protocol, seconds)}
+_latencies: dict[str, tuple[str, float]] = {}
+
+
+def _timed(check: str, protocol: str, probe):
+    """Wrap *probe* so a successful call records its latency in ``_latencies``."""
+    def timed():
+        start = time.monotonic()
+        result = probe()
+        if result:
+            _latencies[check] = (protocol, time.monotonic() - start)
+        return result
+    return timed
+
+
+# About the budget of the former 10 attempts 3s apart
+RETRY_TIMEOUT = 30.0
+RETRY_INITIAL_DELAY = 0.5
+RETRY_MAX_DELAY = 8.0
+RETRY_JITTER = 0.5
+
+# Set on SIGINT/SIGTERM in --monitor mode so a retry stops waiting
+_cancel = threading.Event()
+
+# Set by --wait-ready: wait for a ready endpoint before probing each service.
+_wait_ready = False
+
+
+def _backoff_delays(
+    initial: float = RETRY_INITIAL_DELAY,
+    maximum: float = RETRY_MAX_DELAY,
+    jitter: float = RETRY_JITTER,
+):
+    """Yield exponentially growing delays, each randomly shortened by up to *jitter*."""
+    delay = initial
+    while True:
+        yield delay * (1 - jitter * random.random())
+        delay = min(delay * 2, maximum)
+
+
+def _retry(fn, description: str, timeout: float = RETRY_TIMEOUT):
+    """Retry *fn* until it returns a truthy value or *timeout* seconds pass.
+
+    Attempts back off exponentially with jitter, starting short so a service
+    that is already up passes at once; no wait runs past the deadline, and
+    setting _cancel ends it early.
+    """
+    deadline = time.monotonic() + timeout
+    for attempt, delay in enumerate(_backoff_delays(), start=1):
+        log.info("[%d] %s", attempt, description)
         try:
             result = fn()
+            reporting.attempt(bool(result))
             if result:
                 return result
         except Exception as exc:
+            reporting.attempt(False, exc)
             log.warning("  attempt %d failed: %s", attempt, exc)
-        if attempt < retries:
-            time.sleep(interval)
-    raise RuntimeError(f"All {retries} attempts failed: {description}")
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise RuntimeError(f"All {attempt} attempts failed within {timeout:.0f}s: {description}")
+        if _cancel.wait(min(delay, remaining)):
+            raise RuntimeError(f"Cancelled after {attempt} attempts: {description}")
+
+
+def wait_for_endpoints(namespace: str, service: str, timeout: float = RETRY_TIMEOUT) -> bool | None:
+    """Block until *service* has a ready endpoint, if --wait-ready was given.
+
+    Watches EndpointSlices through the API backend or ``kubectl wait``.
+    Returns None when not waiting or when readiness could not be determined.
+    """
+    if not _wait_ready:
+        return None
+    with reporting.phase("wait_ready"):
+        start = time.monotonic()
+        if _api is not None:
+            try:
+                ready = _api.wait_for_endpoints(namespace, service, timeout)
+            except (kube_api.KubeApiError, requests.RequestException) as exc:
+                log.debug("Endpoint watch for %s failed: %s", service, exc)
+                return None
+        else:
+            try:
+                _kubectl([
+                    "wait", "endpointslice",
+                    "-l", f"kubernetes.io/service-name={service}",
+                    "--for=jsonpath={.endpoints[0].conditions.ready}=true",
+                    f"--timeout={max(1, int(timeout))}s",
+                ], namespace=namespace)
+                ready = True
+            except subprocess.CalledProcessError as exc:
+                log.debug("kubectl wait for %s failed: %s", service, exc.stderr)
+                if "timed out" not in (exc.stderr or ""):
+                    return None
+                ready = False
+        log.info("Endpoints for %s %s after %.1fs", service,
+                 "ready" if ready else "not ready", time.monotonic() - start)
+        return ready
 
 
 # ---------------------------------------------------------------------------
@@ -147,16 +354,17 @@ def check_gitea(namespace: str, release: str) -> bool:
         fallback_name=f"{release}-http",
         name_contains="-http",
     )
+    wait_for_endpoints(namespace, svc)
     with PortForward(namespace, svc, 3000) as pf:
         def _probe():
             url = f"http://127.0.0.1:{pf.local_port}/api/v1/version"
-            resp = requests.get(url, timeout=5)
+            resp = _http.get(url, timeout=5)
             resp.raise_for_status()
             data = resp.json()
             log.info("Gitea version: %s", data.get("version", "unknown"))
             return True
 
-        _retry(_probe, "Checking Gitea HTTP /api/v1/version")
+        _retry(_timed("Gitea HTTP", "HTTP", _probe), "Checking Gitea HTTP /api/v1/version")
     log.info("Gitea HTTP check passed")
     return True
 
@@ -169,11 +377,12 @@ def check_postgres(namespace: str, release: str) -> bool:
         fallback_name=f"{release}-postgres-rw",
         name_contains="-rw",
     )
+    wait_for_endpoints(namespace, svc)
     with PortForward(namespace, svc, 5432) as pf:
         def _probe():
             return tcp_check("127.0.0.1", pf.local_port)
 
-        _retry(_probe, "Checking PostgreSQL TCP connectivity")
+        _retry(_timed("PostgreSQL", "TCP", _probe), "Checking PostgreSQL TCP connectivity")
     log.info("PostgreSQL check passed")
     return True
 
@@ -185,11 +394,12 @@ def check_valkey(namespace: str, release: str) -> bool:
         label_selector=f"app.kubernetes.io/name=valkey,app.kubernetes.io/instance={release}",
         fallback_name=f"{release}-valkey",
     )
+    wait_for_endpoints(namespace, svc)
     with PortForward(namespace, svc, 6379) as pf:
         def _probe():
             return tcp_check("127.0.0.1", pf.local_port)
 
-        _retry(_probe, "Checking Valkey TCP connectivity")
+        _retry(_timed("Valkey", "TCP", _probe), "Checking Valkey TCP connectivity")
     log.info("Valkey check passed")
     return True
 
@@ -198,26 +408,93 @@ def check_valkey(namespace: str, release: str) -> bool:
 # Main
 # ---------------------------------------------------------------------------
 
+CHECKS = [
+    ("Gitea HTTP", check_gitea),
+    ("PostgreSQL", check_postgres),
+    ("Valkey", check_valkey),
+]
+
+
+def run_checks(namespace: str, release: str) -> dict[str, reporting.CheckResult]:
+    """Run every check in order and return their results by name."""
+    results = {}
+    for name, fn in CHECKS:
+        log.info("--- Running check: %s ---", name)
+        try:
+            with reporting.record(name) as result:
+                fn(namespace, release)
+                result.ok = True
+        except Exception as exc:
+            log.error("FAIL: %s — %s", name, exc)
+        results[name] = result
+    return results
+
+
 def main():
     parser = argparse.ArgumentParser(description="Gitea Helm chart smoke tests")
     parser.add_argument("--namespace", default="default", help="Kubernetes namespace")
     parser.add_argument("--release", default="gitea", help="Helm release name")
+    parser.add_argument(
+        "--backend", choices=["kubectl", "api"], default="kubectl",
+        help="Use kubectl subprocesses or talk to the Kubernetes API directly",
+    )
+    parser.add_argument(
+        "--wait-ready", action="store_true",
+        help="Watch for ready endpoints before probing each service",
+    )
+    parser.add_argument(
+        "--monitor", action="store_true",
+        help="Keep running, re-check every --interval seconds and serve Prometheus metrics",
+    )
+    parser.add_argument("--interval", type=float, default=60, help="Seconds between monitoring cycles")
+    parser.add_argument("--listen", default=":9300", help="HOST:PORT for the /metrics endpoint")
+    parser.add_argument("--json", metavar="PATH", help="Write check results with phase timings as JSON")
+    parser.add_argument("--junit", metavar="PATH", help="Write check results as JUnit XML")
     args = parser.parse_args()
 
-    checks = [
-        ("Gitea HTTP", check_gitea),
-        ("PostgreSQL", check_postgres),
-        ("Valkey", check_valkey),
-    ]
-
-    failed = []
-    for name, fn in checks:
-        log.info("--- Running check: %s ---", name)
+    global _api, _wait_ready
+    _wait_ready = args.wait_ready
+    if args.backend == "api":
         try:
-            fn(args.namespace, args.release)
-        except Exception as exc:
-            log.error("FAIL: %s — %s", name, exc)
-            failed.append(name)
+            _api = kube_api.KubeClient()
+        except (kube_api.KubeApiError, OSError) as exc:
+            log.error("Cannot use the Kubernetes API backend: %s", exc)
+            sys.exit(1)
+
+    if args.monitor:
+        def cycle():
+            _latencies.clear()
+            results = run_checks(args.namespace, args.release)
+            return {name: (r.ok, r.seconds) for name, r in results.items()}, dict(_latencies)
+
+        metrics = monitor.Metrics("gitea_smoke")
+        server = monitor.serve(metrics, args.listen)
+        try:
+            monitor.run(cycle, metrics, args.interval, stop=_cancel)
+        finally:
+            server.shutdown()
+            _forwards.close()
+        sys.exit(0)
+
+    started = time.monotonic()
+    try:
+        results = run_checks(args.namespace, args.release)
+    finally:
+        _forwards.close()
+    elapsed = time.monotonic() - started
+    failed = [name for name, result in results.items() if not result.ok]
+
+    if args.json:
+        reporting.write_json(args.json, "gitea", list(results.values()), elapsed=elapsed,
+                             namespace=args.namespace, release=args.release)
+    if args.junit:
+        reporting.write_junit(args.junit, "gitea", list(results.values()), elapsed=elapsed)
+
+    print()
+    for name, result in results.items():
+        phases = " ".join(f"{phase}={seconds:.1f}s" for phase, seconds in result.phases.items())
+        print(f"{name:<12} {'PASS' if result.ok else 'FAIL'} {result.seconds:6.1f}s  "
+              f"[{phases} retries={result.retries}]")
 
     print()
     if failed:
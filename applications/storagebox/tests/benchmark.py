@@ -0,0 +1,511 @@
+"""Short, bounded storage workloads for ``smoke_test.py --benchmark``.
+
+Each ``bench_*`` function drives one storagebox component through an address
+that smoke_test.py has already port-forwarded and returns
+``{workload: stats}``, where stats holds the operation count, errors,
+throughput and latency percentiles.  A workload stops after a fixed number
+of operations or after its time limit, whichever comes first, and removes the
+objects, rows or files it created.
+
+Garage (S3), rqlite (HTTP) and Cassandra (CQL native protocol v4) are driven
+with requests and plain sockets.  Postgres needs psycopg.  NFS is measured
+through a local mount of the export, because an NFS export cannot be
+mounted through a port-forward.
+"""
+
+import hashlib
+import hmac
+import math
+import os
+import random
+import socket
+import struct
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import requests
+
+try:
+    import psycopg
+except ImportError:
+    psycopg = None
+
+MIB = 1024 * 1024
+
+# Size of the value column in the Postgres, rqlite and Cassandra rows
+ROW_BYTES = 100
+
+
+class SkipBenchmark(Exception):
+    """The workload cannot run here, e.g. a driver or credentials are missing."""
+
+
+class BenchmarkError(RuntimeError):
+    """The server rejected a request the workload depends on."""
+
+
+# ---------------------------------------------------------------------------
+# Workload runner
+# ---------------------------------------------------------------------------
+
+def parse_size(text):
+    """Parse a size such as ``4096``, ``64K``, ``64KiB`` or ``1MB`` into bytes."""
+    value = text.strip().upper().removesuffix("IB").removesuffix("B")
+    multiplier = {"K": 1024, "M": MIB, "G": 1024 * MIB}.get(value[-1:], 1)
+    if multiplier != 1:
+        value = value[:-1]
+    return int(value) * multiplier
+
+
+def format_size(size):
+    for unit, multiplier in (("GiB", 1024 * MIB), ("MiB", MIB), ("KiB", 1024)):
+        if size >= multiplier and size % multiplier == 0:
+            return f"{size // multiplier}{unit}"
+    return f"{size}B"
+
+
+def _percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def run_workload(session, count, concurrency, duration, bytes_per_op=0, rows_per_op=0):
+    """Run *count* operations on *concurrency* threads and summarize them.
+
+    *session* is a context manager factory: each thread enters one session
+    and calls the operation it yields with successive operation indexes.
+    Threads stop taking new operations after *duration* seconds.
+    """
+    deadline = time.monotonic() + duration
+    indexes = iter(range(count))
+    lock = threading.Lock()
+    latencies, errors = [], []
+
+    def worker():
+        try:
+            with session() as op:
+                while time.monotonic() < deadline:
+                    with lock:
+                        i = next(indexes, None)
+                    if i is None:
+                        return
+                    start = time.perf_counter()
+                    try:
+                        op(i)
+                    except Exception as exc:
+                        with lock:
+                            errors.append(str(exc))
+                        continue
+                    elapsed = time.perf_counter() - start
+                    with lock:
+                        latencies.append(elapsed)
+        except Exception as exc:
+            with lock:
+                errors.append(f"session: {exc}")
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(max(1, min(concurrency, count)))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    ok = len(latencies)
+    stats = {
+        "ops": ok,
+        "errors": len(errors),
+        "concurrency": len(threads),
+        "seconds": round(elapsed, 3),
+        "ops_per_sec": round(ok / elapsed, 1) if elapsed else 0.0,
+    }
+    if bytes_per_op:
+        stats["mib_per_sec"] = round(ok * bytes_per_op / MIB / elapsed, 2) if elapsed else 0.0
+    if rows_per_op:
+        stats["rows_per_sec"] = round(ok * rows_per_op / elapsed, 1) if elapsed else 0.0
+    stats["latency_ms"] = {
+        name: round(_percentile(latencies, pct) * 1000, 3)
+        for name, pct in (("p50", 50), ("p90", 90), ("p99", 99), ("max", 100))
+    } if latencies else None
+    if ok + len(errors) < count:
+        stats["stopped_at_deadline"] = True
+    if errors:
+        stats["first_error"] = errors[0]
+    return stats
+
+
+# ---------------------------------------------------------------------------
+# S3 (Garage)
+# ---------------------------------------------------------------------------
+
+EMPTY_SHA256 = hashlib.sha256(b"").hexdigest()
+UNSIGNED_PAYLOAD = "UNSIGNED-PAYLOAD"
+
+
+def sigv4_headers(method, host, path, region, access_key, secret_key, payload_hash=EMPTY_SHA256):
+    """AWS Signature V4 headers for an S3 request without a query string.
+
+    Pass ``payload_hash=UNSIGNED_PAYLOAD`` for uploads so large bodies are
+    not hashed on the client.
+    """
+    amz_date = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+    date = amz_date[:8]
+    signed_headers = "host;x-amz-content-sha256;x-amz-date"
+    canonical = "\n".join([
+        method, path, "",
+        f"host:{host}", f"x-amz-content-sha256:{payload_hash}", f"x-amz-date:{amz_date}", "",
+        signed_headers, payload_hash,
+    ])
+    scope = f"{date}/{region}/s3/aws4_request"
+    to_sign = "\n".join([
+        "AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical.encode()).hexdigest(),
+    ])
+    key = f"AWS4{secret_key}".encode()
+    for part in (date, region, "s3", "aws4_request"):
+        key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+    signature = hmac.new(key, to_sign.encode(), hashlib.sha256).hexdigest()
+    return {
+        "x-amz-content-sha256": payload_hash,
+        "x-amz-date": amz_date,
+        "Authorization": (
+            f"AWS4-HMAC-SHA256 Credential={access_key}/{scope}, "
+            f"SignedHeaders={signed_headers}, Signature={signature}"
+        ),
+    }
+
+
+def bench_s3(host, port, bucket, access_key, secret_key, region, sizes, ops, concurrency, duration):
+    """PUT then GET *ops* objects of each size in *sizes*, then delete them."""
+    if not (access_key and secret_key):
+        raise SkipBenchmark("no S3 credentials")
+    endpoint = f"{host}:{port}"
+    prefix = f"storagebox-bench-{uuid.uuid4().hex[:8]}"
+
+    def request(http, method, key, body=None):
+        path = f"/{bucket}/{key}"
+        headers = sigv4_headers(
+            method, endpoint, path, region, access_key, secret_key,
+            payload_hash=UNSIGNED_PAYLOAD if body is not None else EMPTY_SHA256,
+        )
+        resp = http.request(method, f"http://{endpoint}{path}", data=body, headers=headers, timeout=30)
+        if resp.status_code >= 300:
+            raise BenchmarkError(f"{method} {path}: HTTP {resp.status_code} {resp.text[:200]}")
+        return resp
+
+    def session(method, size):
+        payload = os.urandom(size) if method == "PUT" else None
+
+        @contextmanager
+        def s3_session():
+            with requests.Session() as http:
+                def op(i):
+                    resp = request(http, method, f"{prefix}/{size}/{i}", payload)
+                    if method == "GET" and len(resp.content) != size:
+                        raise BenchmarkError(f"GET returned {len(resp.content)} of {size} bytes")
+                yield op
+        return s3_session
+
+    results = {}
+    try:
+        for size in sizes:
+            label = format_size(size)
+            for method in ("PUT", "GET"):
+                results[f"{method.lower()}_{label}"] = run_workload(
+                    session(method, size), ops, concurrency, duration, bytes_per_op=size,
+                )
+    finally:
+        for size in sizes:
+            run_workload(session("DELETE", size), ops, concurrency, 60)
+    return results
+
+
+# ---------------------------------------------------------------------------
+# rqlite
+# ---------------------------------------------------------------------------
+
+def bench_rqlite(host, port, ops, batch, concurrency, duration):
+    """Bulk INSERT *batch* rows per request, then SELECT them back by range."""
+    base = f"http://{host}:{port}"
+    table = f"storagebox_bench_{uuid.uuid4().hex[:8]}"
+    value = "x" * ROW_BYTES
+
+    def post(http, path, statements):
+        resp = http.post(f"{base}{path}", json=statements, timeout=30)
+        resp.raise_for_status()
+        for result in resp.json().get("results", []):
+            if "error" in result:
+                raise BenchmarkError(result["error"])
+        return resp
+
+    @contextmanager
+    def insert_session():
+        with requests.Session() as http:
+            yield lambda i: post(http, "/db/execute?transaction", [
+                [f"INSERT INTO {table}(id, v) VALUES(?, ?)", i * batch + j, value] for j in range(batch)
+            ])
+
+    @contextmanager
+    def select_session():
+        with requests.Session() as http:
+            yield lambda i: post(http, "/db/query", [
+                [f"SELECT id, v FROM {table} WHERE id >= ? AND id < ?", i * batch, (i + 1) * batch]
+            ])
+
+    with requests.Session() as http:
+        post(http, "/db/execute", [f"CREATE TABLE {table} (id INTEGER PRIMARY KEY, v TEXT)"])
+        try:
+            return {
+                "insert": run_workload(insert_session, ops, concurrency, duration, rows_per_op=batch),
+                "select": run_workload(select_session, ops, concurrency, duration, rows_per_op=batch),
+            }
+        finally:
+            post(http, "/db/execute", [f"DROP TABLE {table}"])
+
+
+# ---------------------------------------------------------------------------
+# Postgres
+# ---------------------------------------------------------------------------
+
+def bench_postgres(host, port, user, password, dbname, ops, batch, concurrency, duration):
+    """Bulk INSERT *batch* rows per transaction, then SELECT them back by range."""
+    if psycopg is None:
+        raise SkipBenchmark("psycopg not installed")
+    table = f"storagebox_bench_{uuid.uuid4().hex[:8]}"
+    value = "x" * ROW_BYTES
+
+    def connect():
+        return psycopg.connect(
+            host=host, port=port, user=user, password=password, dbname=dbname,
+            connect_timeout=10, autocommit=True,
+        )
+
+    @contextmanager
+    def insert_session():
+        with connect() as conn:
+            def op(i):
+                with conn.transaction(), conn.cursor() as cur:
+                    cur.executemany(
+                        f"INSERT INTO {table} (id, v) VALUES (%s, %s)",
+                        [(i * batch + j, value) for j in range(batch)],
+                    )
+            yield op
+
+    @contextmanager
+    def select_session():
+        with connect() as conn:
+            def op(i):
+                with conn.cursor() as cur:
+                    cur.execute(f"SELECT id, v FROM {table} WHERE id >= %s AND id < %s", (i * batch, (i + 1) * batch))
+                    cur.fetchall()
+            yield op
+
+    with connect() as conn:
+        conn.execute(f"CREATE TABLE {table} (id integer PRIMARY KEY, v text)")
+        try:
+            return {
+                "insert": run_workload(insert_session, ops, concurrency, duration, rows_per_op=batch),
+                "select": run_workload(select_session, ops, concurrency, duration, rows_per_op=batch),
+            }
+        finally:
+            conn.execute(f"DROP TABLE {table}")
+
+
+# ---------------------------------------------------------------------------
+# Cassandra (CQL native protocol v4)
+# ---------------------------------------------------------------------------
+
+# Shared with smoke_test.py's CQL probe
+CQL_VERSION = 0x04
+CQL_ERROR, CQL_STARTUP, CQL_READY, CQL_AUTHENTICATE = 0x00, 0x01, 0x02, 0x03
+CQL_OPTIONS, CQL_SUPPORTED, CQL_QUERY = 0x05, 0x06, 0x07
+CQL_AUTH_RESPONSE, CQL_AUTH_SUCCESS = 0x0F, 0x10
+CQL_CONSISTENCY_ONE = 0x0001
+
+
+def recv_exact(sock, n):
+    """Read exactly *n* bytes, raising ConnectionError if the peer closes first."""
+    data = b""
+    while len(data) < n:
+        chunk = sock.recv(n - len(data))
+        if not chunk:
+            raise ConnectionError(f"connection closed after {len(data)} of {n} bytes")
+        data += chunk
+    return data
+
+
+def cql_string_map(mapping):
+    body = struct.pack("!H", len(mapping))
+    for key, value in mapping.items():
+        for item in (key.encode(), value.encode()):
+            body += struct.pack("!H", len(item)) + item
+    return body
+
+
+def cql_exchange(sock, opcode, body=b"", stream=0):
+    """Send one CQL v4 request frame and return ``(opcode, body)`` of the reply."""
+    sock.sendall(struct.pack("!BBhBI", CQL_VERSION, 0, stream, opcode, len(body)) + body)
+    _, _, _, reply, length = struct.unpack("!BBhBI", recv_exact(sock, 9))
+    return reply, recv_exact(sock, length)
+
+
+def cql_error_message(payload):
+    """Format the code and message of an ERROR frame body."""
+    code, message_length = struct.unpack("!iH", payload[:6])
+    return f"0x{code:04x}: {payload[6:6 + message_length].decode(errors='replace')}"
+
+
+class CqlConnection:
+    """A CQL native protocol v4 connection that sends one request at a time.
+
+    Speaking the protocol directly keeps the driver from discovering the
+    cluster's pod addresses, which are unreachable from outside the
+    port-forward.
+    """
+
+    def __init__(self, host, port, username=None, password=None, timeout=10):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        try:
+            opcode, _ = self.request(CQL_STARTUP, cql_string_map({"CQL_VERSION": "3.0.0"}))
+            if opcode == CQL_AUTHENTICATE:
+                if not username:
+                    raise BenchmarkError("Cassandra requires credentials")
+                token = b"\0" + username.encode() + b"\0" + (password or "").encode()
+                opcode, _ = self.request(CQL_AUTH_RESPONSE, struct.pack("!i", len(token)) + token)
+                if opcode != CQL_AUTH_SUCCESS:
+                    raise BenchmarkError(f"unexpected CQL opcode 0x{opcode:02x} after AUTH_RESPONSE")
+            elif opcode != CQL_READY:
+                raise BenchmarkError(f"unexpected CQL opcode 0x{opcode:02x} after STARTUP")
+        except Exception:
+            self.sock.close()
+            raise
+
+    def request(self, opcode, body=b""):
+        reply, payload = cql_exchange(self.sock, opcode, body)
+        if reply == CQL_ERROR:
+            raise BenchmarkError(f"CQL error {cql_error_message(payload)}")
+        return reply, payload
+
+    def query(self, cql, values=(), consistency=CQL_CONSISTENCY_ONE):
+        """Run *cql* with already serialized *values*; return the RESULT body."""
+        statement = cql.encode()
+        body = struct.pack("!i", len(statement)) + statement + struct.pack("!H", consistency)
+        if values:
+            body += struct.pack("!BH", 0x01, len(values))
+            body += b"".join(struct.pack("!i", len(v)) + v for v in values)
+        else:
+            body += b"\x00"
+        return self.request(CQL_QUERY, body)[1]
+
+    def close(self):
+        self.sock.close()
+
+
+def bench_cql(host, port, username, password, ops, concurrency, duration):
+    """INSERT *ops* single rows at consistency ONE into a scratch table.
+
+    The table lives in a keyspace of its own, named per run so concurrent
+    runs don't collide, and dropped afterwards even if the workload fails.
+    """
+    keyspace = f"storagebox_bench_{uuid.uuid4().hex[:8]}"
+    table = f"{keyspace}.kv"
+    value = b"x" * ROW_BYTES
+
+    @contextmanager
+    def write_session():
+        conn = CqlConnection(host, port, username, password)
+        try:
+            yield lambda i: conn.query(
+                f"INSERT INTO {table} (id, v) VALUES (?, ?)", (struct.pack("!i", i), value),
+            )
+        finally:
+            conn.close()
+
+    admin = CqlConnection(host, port, username, password, timeout=60)
+    try:
+        admin.query(
+            f"CREATE KEYSPACE {keyspace} "
+            "WITH replication = {'class': 'SimpleStrategy', 'replication_factor': 1}"
+        )
+        try:
+            admin.query(f"CREATE TABLE {table} (id int PRIMARY KEY, v blob)")
+            return {"write": run_workload(write_session, ops, concurrency, duration, bytes_per_op=ROW_BYTES)}
+        finally:
+            admin.query(f"DROP KEYSPACE {keyspace}")
+    finally:
+        admin.close()
+
+
+# ---------------------------------------------------------------------------
+# NFS (through a local mount)
+# ---------------------------------------------------------------------------
+
+def _drop_cache(fd):
+    """Ask the kernel to forget cached pages so reads go back to the server."""
+    if hasattr(os, "posix_fadvise"):
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+
+
+def bench_filesystem(path, file_size, block_size, random_block_size, ops, concurrency, duration):
+    """Sequential and random IO on a scratch file under *path*.
+
+    Sequential writes are flushed with one fsync, which counts towards the
+    throughput.  Random writes use O_DSYNC so each one reaches the server.
+    """
+    if not path:
+        raise SkipBenchmark("no --nfs-path given")
+    if not os.path.isdir(path):
+        raise SkipBenchmark(f"{path} is not a directory")
+    filename = os.path.join(path, f"storagebox-bench-{uuid.uuid4().hex[:8]}.dat")
+    blocks = max(1, file_size // block_size)
+    random_blocks = max(1, blocks * block_size // random_block_size)
+    block = os.urandom(block_size)
+    random_block = os.urandom(random_block_size)
+
+    def session(flags, op_for_fd, sync=False):
+        @contextmanager
+        def file_session():
+            fd = os.open(filename, flags, 0o600)
+            try:
+                _drop_cache(fd)
+                yield lambda i: op_for_fd(fd, i)
+                if sync:
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
+        return file_session
+
+    def offset(i):
+        return random.randrange(random_blocks) * random_block_size
+
+    def read_exact(fd, size, position):
+        if len(os.pread(fd, size, position)) != size:
+            raise BenchmarkError(f"short read at offset {position}")
+
+    try:
+        return {
+            "seq_write": run_workload(
+                session(os.O_WRONLY | os.O_CREAT | os.O_TRUNC, lambda fd, i: os.pwrite(fd, block, i * block_size), sync=True),
+                blocks, 1, duration, bytes_per_op=block_size,
+            ),
+            "seq_read": run_workload(
+                session(os.O_RDONLY, lambda fd, i: read_exact(fd, block_size, i * block_size)),
+                blocks, 1, duration, bytes_per_op=block_size,
+            ),
+            "rand_write": run_workload(
+                session(os.O_WRONLY | os.O_DSYNC, lambda fd, i: os.pwrite(fd, random_block, offset(i))),
+                ops, concurrency, duration, bytes_per_op=random_block_size,
+            ),
+            "rand_read": run_workload(
+                session(os.O_RDONLY, lambda fd, i: read_exact(fd, random_block_size, offset(i))),
+                ops, concurrency, duration, bytes_per_op=random_block_size,
+            ),
+        }
+    finally:
+        try:
+            os.unlink(filename)
+        except OSError:
+            pass
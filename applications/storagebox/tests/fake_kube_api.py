@@ -0,0 +1,205 @@
+"""A fake Kubernetes API server for testing kube_api.py without a cluster.
+
+Serves just the calls kube_api.KubeClient makes: service and pod lists,
+EndpointSlice list and watch, and pod port-forwarding over a
+``v4.channel.k8s.io`` websocket.  Port-forwards echo data back on the data
+channel, or report ``port_forward_error`` on the error channel.  Every
+request is recorded in ``requests`` so tests can check what was sent.
+"""
+
+import base64
+import hashlib
+import json
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+TOKEN = "fake-token"
+
+
+def endpoint_slice(name, ready, resource_version="1"):
+    """An EndpointSlice with one endpoint whose ready condition is *ready*."""
+    return {
+        "metadata": {"name": name, "resourceVersion": resource_version},
+        "endpoints": [{"conditions": {"ready": ready}}],
+    }
+
+
+def _recv_exact(sock, n):
+    data = b""
+    while len(data) < n:
+        chunk = sock.recv(n - len(data))
+        if not chunk:
+            raise EOFError
+        data += chunk
+    return data
+
+
+def send_frame(sock, payload, opcode=0x2):
+    """Send an unmasked (server) websocket frame."""
+    length = len(payload)
+    if length < 126:
+        header = bytes([0x80 | opcode, length])
+    elif length < 1 << 16:
+        header = bytes([0x80 | opcode, 126]) + struct.pack("!H", length)
+    else:
+        header = bytes([0x80 | opcode, 127]) + struct.pack("!Q", length)
+    sock.sendall(header + payload)
+
+
+def recv_frame(sock):
+    """Read one client frame, which RFC 6455 requires to be masked."""
+    first, second = _recv_exact(sock, 2)
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack("!H", _recv_exact(sock, 2))[0]
+    elif length == 127:
+        length = struct.unpack("!Q", _recv_exact(sock, 8))[0]
+    if not second & 0x80:
+        raise AssertionError("client frame is not masked")
+    mask = _recv_exact(sock, 4)
+    payload = bytes(b ^ mask[i % 4] for i, b in enumerate(_recv_exact(sock, length)))
+    return first & 0x0F, payload
+
+
+class FakeKubeApi:
+    """Fake API server; use as a context manager and point a kubeconfig at ``url``."""
+
+    def __init__(self):
+        self.services = []
+        self.pods = []
+        # Each EndpointSlice list returns the next entry; the last one repeats
+        self.slice_lists = [[]]
+        # (delay seconds, event) pairs sent on every watch before it is held open
+        self.watch_events = []
+        self.port_forward_error = None
+        self.accept_key_override = None
+        self.requests = []
+        self.lists = 0
+        self.watches = 0
+        self._stop = threading.Event()
+
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _json(self, obj, status=200):
+                body = json.dumps(obj).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                fake.requests.append((url.path, query, dict(self.headers)))
+                if self.headers.get("Authorization") != f"Bearer {TOKEN}":
+                    return self._json({"kind": "Status", "code": 401}, 401)
+
+                parts = url.path.strip("/").split("/")
+                if url.path.endswith("/endpointslices"):
+                    return fake._endpoint_slices(self, query)
+                if parts[-1] == "portforward":
+                    return fake._port_forward(self, int(query["ports"]))
+                if parts[-1] == "services":
+                    return self._json({"items": fake.services})
+                if parts[-2] == "services":
+                    for svc in fake.services:
+                        if svc["metadata"]["name"] == parts[-1]:
+                            return self._json(svc)
+                    return self._json({"kind": "Status", "code": 404}, 404)
+                if parts[-1] == "pods":
+                    return self._json({"items": fake.pods})
+                self._json({"kind": "Status", "code": 404}, 404)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def kubeconfig(self, path):
+        """Write a JSON kubeconfig for this server to *path* and return it."""
+        config = {
+            "apiVersion": "v1",
+            "kind": "Config",
+            "current-context": "fake",
+            "contexts": [{"name": "fake", "context": {"cluster": "fake", "user": "fake"}}],
+            "clusters": [{"name": "fake", "cluster": {"server": self.url}}],
+            "users": [{"name": "fake", "user": {"token": TOKEN}}],
+        }
+        with open(path, "w") as f:
+            json.dump(config, f)
+        return str(path)
+
+    def _endpoint_slices(self, handler, query):
+        if "watch" not in query:
+            items = self.slice_lists[min(self.lists, len(self.slice_lists) - 1)]
+            self.lists += 1
+            return handler._json({"metadata": {"resourceVersion": str(self.lists)}, "items": items})
+
+        self.watches += 1
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Transfer-Encoding", "chunked")
+        handler.end_headers()
+        try:
+            for delay, event in self.watch_events:
+                time.sleep(delay)
+                line = (json.dumps(event) + "\n").encode()
+                handler.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+                handler.wfile.flush()
+            # Like the API server, hold the watch open until timeoutSeconds
+            self._stop.wait(int(query.get("timeoutSeconds", 1)))
+            handler.wfile.write(b"0\r\n\r\n")
+        except OSError:
+            pass
+        handler.close_connection = True
+
+    def _port_forward(self, handler, port):
+        key = handler.headers["Sec-WebSocket-Key"]
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+        handler.send_response(101)
+        handler.send_header("Upgrade", "websocket")
+        handler.send_header("Connection", "Upgrade")
+        handler.send_header("Sec-WebSocket-Accept", self.accept_key_override or accept)
+        handler.send_header("Sec-WebSocket-Protocol", handler.headers["Sec-WebSocket-Protocol"])
+        handler.end_headers()
+        handler.close_connection = True
+        sock = handler.connection
+
+        # The first frame on each channel is the little-endian port number
+        prefix = struct.pack("<H", port)
+        send_frame(sock, b"\x00" + prefix)
+        send_frame(sock, b"\x01" + prefix)
+        if self.port_forward_error:
+            send_frame(sock, b"\x01" + self.port_forward_error.encode())
+            send_frame(sock, b"\x03\xe8", opcode=0x8)
+            return
+
+        try:
+            while True:
+                opcode, payload = recv_frame(sock)
+                if opcode == 0x8:
+                    break
+                if opcode == 0x2 and payload[:1] == b"\x00":
+                    send_frame(sock, payload)
+            send_frame(sock, b"\x03\xe8", opcode=0x8)
+        except (EOFError, OSError):
+            pass
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self.server.shutdown()
+        self.server.server_close()
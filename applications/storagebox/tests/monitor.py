@@ -0,0 +1,173 @@
+"""Continuous monitoring mode for the smoke tests.
+
+``--monitor`` turns a smoke test into a synthetic monitor: the component
+checks are re-run on a fixed interval, reusing the same port-forwards, and
+the results are served in the Prometheus text format on ``/metrics``:
+
+- ``<prefix>_up{component}``: 1 if the last check passed, else 0
+- ``<prefix>_check_duration_seconds{component}``: histogram of check durations
+- ``<prefix>_probe_latency_seconds{component,protocol}``: histogram of
+  protocol handshake latencies
+- ``<prefix>_checks_total{component,result}``: checks run, by result
+- ``<prefix>_last_check_timestamp_seconds{component}``: when the last check ended
+
+Only the standard library is used.  The storagebox and gitea smoke tests
+each carry a copy of this file; keep them identical
+(.github/workflows/smoke-test-shared-modules.yml checks).
+"""
+
+import logging
+import signal
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+log = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in labels
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def _value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+
+class Histogram:
+    """Cumulative Prometheus histogram for one label set."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name, labels):
+        for bound, count in zip(self.buckets, self.counts):
+            yield f"{name}_bucket{_labels(labels + (('le', _value(bound)),))} {count}"
+        yield f"{name}_sum{_labels(labels)} {_value(self.sum)}"
+        yield f"{name}_count{_labels(labels)} {self.count}"
+
+
+class Metrics:
+    """Per-component check results, rendered in the Prometheus text format."""
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._up = {}
+        self._last = {}
+        self._totals = {}
+        self._durations = {}
+        self._latencies = {}
+
+    def observe_check(self, component, ok, seconds):
+        key = (("component", component),)
+        with self._lock:
+            self._up[key] = 1 if ok else 0
+            self._last[key] = time.time()
+            result = key + (("result", "pass" if ok else "fail"),)
+            self._totals[result] = self._totals.get(result, 0) + 1
+            self._durations.setdefault(key, Histogram(DURATION_BUCKETS)).observe(seconds)
+
+    def observe_probe(self, component, protocol, seconds):
+        key = (("component", component), ("protocol", protocol))
+        with self._lock:
+            self._latencies.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(seconds)
+
+    def render(self):
+        p = self.prefix
+        lines = []
+        with self._lock:
+            for name, kind, help_text, series in (
+                (f"{p}_up", "gauge", "Whether the component's last check passed.", self._up),
+                (f"{p}_last_check_timestamp_seconds", "gauge",
+                 "Unix time the component's last check finished.", self._last),
+                (f"{p}_checks_total", "counter", "Checks run, by result.", self._totals),
+            ):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                lines += [f"{name}{_labels(labels)} {_value(v)}" for labels, v in sorted(series.items())]
+            for name, help_text, series in (
+                (f"{p}_check_duration_seconds", "Time each check took, including retries.", self._durations),
+                (f"{p}_probe_latency_seconds", "Protocol handshake latency.", self._latencies),
+            ):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for labels, histogram in sorted(series.items()):
+                    lines += histogram.samples(name, labels)
+        return "\n".join(lines) + "\n"
+
+
+def serve(metrics, address):
+    """Serve *metrics* on ``http://ADDRESS/metrics`` from a daemon thread.
+
+    *address* is ``HOST:PORT``; an empty host listens on all interfaces.
+    Returns the server so the caller can shut it down.
+    """
+    host, _, port = address.rpartition(":")
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, fmt, *args):
+            log.debug("metrics: " + fmt, *args)
+
+    server = ThreadingHTTPServer((host, int(port)), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    log.info("Serving metrics on http://%s:%s/metrics", host or "0.0.0.0", server.server_address[1])
+    return server
+
+
+def run(cycle, metrics, interval, stop=None):
+    """Call *cycle* every *interval* seconds until SIGINT/SIGTERM or *stop* is set.
+
+    *cycle* returns ``(results, probes)``: ``{component: (ok, seconds)}`` and
+    ``{component: (protocol, seconds)}`` for the handshakes it measured.
+    A cycle that overruns the interval is followed immediately by the next.
+    """
+    stop = stop or threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+
+    while not stop.is_set():
+        started = time.monotonic()
+        try:
+            results, probes = cycle()
+        except Exception as exc:
+            log.error("Monitoring cycle failed: %s", exc)
+            results, probes = {}, {}
+        for component, (ok, seconds) in results.items():
+            metrics.observe_check(component, ok, seconds)
+        for component, (protocol, seconds) in probes.items():
+            metrics.observe_probe(component, protocol, seconds)
+        down = sorted(c for c, (ok, _) in results.items() if not ok)
+        log.info("Cycle finished in %.1fs: %d up, %d down%s", time.monotonic() - started,
+                 len(results) - len(down), len(down), f" ({', '.join(down)})" if down else "")
+        stop.wait(max(0, interval - (time.monotonic() - started)))
@@ -0,0 +1,157 @@
+"""Structured smoke test results with per-phase timings.
+
+Each check runs inside ``record(name)``, which makes its CheckResult the
+current result for that thread.  The discovery, port-forward and retry code
+report into it through ``phase()`` and ``attempt()``, so a check's result
+shows where its time went:
+
+- ``discover``: service discovery
+- ``wait_ready``: waiting for a ready endpoint (``--wait-ready``)
+- ``forward_ready``: starting port-forwards until they accept connections
+- ``first_success``: from the start of the check to its first passing probe
+
+plus the number of attempts and retries.  Results can be written as JSON
+and as JUnit XML for CI.
+
+The storagebox and gitea smoke tests each carry a copy of this file; keep
+them identical (.github/workflows/smoke-test-shared-modules.yml checks).
+"""
+
+import json
+import socket
+import threading
+import time
+import xml.etree.ElementTree as ET
+from contextlib import contextmanager
+
+_current = threading.local()
+
+
+class CheckResult:
+    """Outcome and timing breakdown of one check."""
+
+    def __init__(self, name):
+        self.name = name
+        self.ok = False
+        self.error = None
+        self.seconds = 0.0
+        self.phases = {}
+        self.attempts = 0
+        self.retries = 0
+        self.last_error = None
+        self.started = time.time()
+        self._start = time.monotonic()
+
+    def add_phase(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "ok": self.ok,
+            "error": self.error,
+            "seconds": round(self.seconds, 3),
+            "phases": {phase: round(seconds, 3) for phase, seconds in self.phases.items()},
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.started)),
+        }
+
+
+@contextmanager
+def record(name):
+    """Run a check as *name* on this thread and yield its CheckResult.
+
+    An exception leaving the block marks the check failed with the
+    exception as its error, and is re-raised.  A check that fails without
+    an error of its own reports the error of its last failed attempt.
+    """
+    result = CheckResult(name)
+    _current.result = result
+    try:
+        yield result
+    except Exception as exc:
+        result.ok = False
+        result.error = result.error or str(exc)
+        raise
+    finally:
+        result.seconds = time.monotonic() - result._start
+        if not result.ok and result.error is None and result.last_error is not None:
+            result.error = str(result.last_error)
+        _current.result = None
+
+
+def current():
+    """The CheckResult being recorded on this thread, or None."""
+    return getattr(_current, "result", None)
+
+
+@contextmanager
+def phase(name):
+    """Add the time spent in the block to phase *name* of the current check."""
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        result = current()
+        if result is not None:
+            result.add_phase(name, time.monotonic() - start)
+
+
+def attempt(ok, error=None):
+    """Count one probe attempt; the first passing one sets ``first_success``."""
+    result = current()
+    if result is None:
+        return
+    result.attempts += 1
+    if not ok:
+        result.retries += 1
+        result.last_error = error or result.last_error
+    elif "first_success" not in result.phases:
+        result.phases["first_success"] = time.monotonic() - result._start
+
+
+def write_json(path, suite, results, elapsed=None, **extra):
+    """Write *results* (CheckResult objects) and *extra* fields as a JSON document.
+
+    *elapsed* is the wall-clock time of the run; it defaults to the sum of
+    the check durations, which overstates it when checks ran concurrently.
+    """
+    document = {
+        "suite": suite,
+        "ok": all(r.ok for r in results),
+        "seconds": round(elapsed if elapsed is not None else sum(r.seconds for r in results), 3),
+        **extra,
+        "checks": [r.to_dict() for r in results],
+    }
+    with open(path, "w") as f:
+        json.dump(document, f, indent=2)
+        f.write("\n")
+
+
+def write_junit(path, suite, results, elapsed=None):
+    """Write *results* as a JUnit XML report with one testcase per check.
+
+    *elapsed* is as for write_json.  Phase timings, attempts and retries become testcase properties.
+    """
+    failures = sum(1 for r in results if not r.ok)
+    total = elapsed if elapsed is not None else sum(r.seconds for r in results)
+    suites = ET.Element("testsuites", tests=str(len(results)), failures=str(failures), time=f"{total:.3f}")
+    testsuite = ET.SubElement(
+        suites, "testsuite",
+        name=suite, tests=str(len(results)), failures=str(failures), errors="0", skipped="0",
+        time=f"{total:.3f}", hostname=socket.gethostname(),
+        timestamp=time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(min((r.started for r in results), default=time.time()))),
+    )
+    for r in results:
+        case = ET.SubElement(testsuite, "testcase", classname=suite, name=r.name, time=f"{r.seconds:.3f}")
+        properties = ET.SubElement(case, "properties")
+        for name, seconds in r.phases.items():
+            ET.SubElement(properties, "property", name=f"phase.{name}", value=f"{seconds:.3f}")
+        ET.SubElement(properties, "property", name="attempts", value=str(r.attempts))
+        ET.SubElement(properties, "property", name="retries", value=str(r.retries))
+        if not r.ok:
+            message = r.error or "check failed"
+            ET.SubElement(case, "failure", message=message).text = message
+    ET.indent(suites)
+    ET.ElementTree(suites).write(path, encoding="utf-8", xml_declaration=True)
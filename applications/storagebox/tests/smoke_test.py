@@ -4,25 +4,55 @@
 Validates that all enabled storage components are reachable after a Helm install.
 Each component is tested via kubectl port-forward with a dynamically allocated
 local port.  Service names are discovered via label selectors so the tests are
-resilient to operator-generated naming changes.
+resilient to operator-generated naming changes.  Components are checked
+concurrently, so a run takes as long as the slowest component (bounded by
+--deadline) rather than the sum of all of them.
+
+With ``--backend api`` discovery and port-forwards go straight to the
+Kubernetes API (see kube_api.py) instead of through kubectl subprocesses.
+Failed attempts are retried with exponential backoff and jitter; with
+``--wait-ready`` each check first waits for a ready endpoint on an
+EndpointSlice watch.
+
+With ``--benchmark`` the components that pass are then put through short
+throughput workloads (see benchmark.py) and a JSON report with throughput
+and latency percentiles is written to ``--output``.  With ``--monitor`` the
+checks repeat every ``--interval`` seconds and their results are served as
+Prometheus metrics (see monitor.py).  ``--json`` and ``--junit`` write each
+check's result with a breakdown of where its time went (see reporting.py).
 
 Usage:
-    python smoke_test.py <namespace> [--kubeconfig PATH] [--timeout 120]
+    python smoke_test.py <namespace> [--kubeconfig PATH] [--timeout 120] [--deadline 150]
+                         [--backend kubectl|api] [--wait-ready] [--json PATH] [--junit PATH]
+                         [--benchmark [--output FILE] [--nfs-path PATH]]
+                         [--monitor [--interval 60] [--listen :9300]]
 """
 
 import argparse
+import base64
 import json
 import logging
 import os
+import random
 import socket
+import struct
 import subprocess
 import sys
+import threading
 import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
+from urllib.parse import urlsplit
 
 import requests
 import urllib3
 
+import benchmark
+import kube_api
+import monitor
+import reporting
+
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 logging.basicConfig(
@@ -37,6 +67,9 @@ log = logging.getLogger(__name__)
 
 KUBECTL = os.environ.get("KUBECTL", "kubectl")
 
+# Set by --backend api; when None, kubectl subprocesses are used
+_api = None
+
 
 def _kubectl(*args, kubeconfig=None, namespace=None):
     """Run a kubectl command and return stdout."""
@@ -53,44 +86,157 @@ def _kubectl(*args, kubeconfig=None, namespace=None):
     return result.stdout.strip()
 
 
+def _parse_selector(label_selector):
+    """Split a label selector into (key, operator, values) requirements.
+
+    Supports the equality (``k=v``, ``k==v``, ``k!=v``), existence (``k``,
+    ``!k``) and set (``k in (a,b)``, ``k notin (a,b)``) forms kubectl accepts.
+    """
+    requirements = []
+    parts, depth, current = [], 0, ""
+    for ch in label_selector:
+        depth += {"(": 1, ")": -1}.get(ch, 0)
+        if ch == "," and depth == 0:
+            parts.append(current)
+            current = ""
+        else:
+            current += ch
+    parts.append(current)
+
+    for part in (p.strip() for p in parts):
+        if not part:
+            continue
+        for op in (" notin ", " in "):
+            if op in part:
+                key, values = part.split(op, 1)
+                values = {v.strip() for v in values.strip().strip("()").split(",")}
+                requirements.append((key.strip(), op.strip(), values))
+                break
+        else:
+            if "!=" in part:
+                key, value = part.split("!=", 1)
+                requirements.append((key.strip(), "notin", {value.strip()}))
+            elif "=" in part:
+                key, value = part.replace("==", "=").split("=", 1)
+                requirements.append((key.strip(), "in", {value.strip()}))
+            elif part.startswith("!"):
+                requirements.append((part[1:].strip(), "!", set()))
+            else:
+                requirements.append((part, "exists", set()))
+    return requirements
+
+
+class ServiceIndex:
+    """All services in a namespace, fetched with a single ``kubectl get svc``.
+
+    Services are indexed by label and by port so each component's selector
+    resolves without another kubectl call.  Items keep the order kubectl
+    returned them in, so selections match what ``get svc -l`` would return.
+    """
+
+    def __init__(self, items):
+        self.items = items
+        self.by_label = {}
+        self.by_port = {}
+        self._position = {id(svc): i for i, svc in enumerate(items)}
+        for i, svc in enumerate(items):
+            for label in (svc.get("metadata", {}).get("labels") or {}).items():
+                self.by_label.setdefault(label, []).append(i)
+            for p in svc.get("spec", {}).get("ports") or []:
+                self.by_port.setdefault(p.get("port"), []).append(i)
+
+    def select(self, label_selector):
+        """Return the services matching *label_selector*, in list order."""
+        matched = set(range(len(self.items)))
+        for key, op, values in _parse_selector(label_selector):
+            if op == "in":
+                matched &= {i for v in values for i in self.by_label.get((key, v), [])}
+                continue
+            for i in list(matched):
+                labels = self.items[i].get("metadata", {}).get("labels") or {}
+                if op == "exists":
+                    keep = key in labels
+                elif op == "!":
+                    keep = key not in labels
+                else:  # notin also matches services without the label
+                    keep = labels.get(key) not in values
+                if not keep:
+                    matched.discard(i)
+        return [self.items[i] for i in sorted(matched)]
+
+    def exposes(self, svc, port):
+        return self._position[id(svc)] in self.by_port.get(port, [])
+
+
+_service_indexes = {}
+_service_index_lock = threading.Lock()
+
+
+def _service_index(namespace, kubeconfig=None):
+    """Return the cached ServiceIndex for *namespace*, fetching it on first use.
+
+    The lock makes concurrent checks share one kubectl call.  A failed fetch
+    is not cached so the next lookup tries again.
+    """
+    key = (namespace, kubeconfig)
+    with _service_index_lock:
+        if key not in _service_indexes:
+            if _api is not None:
+                try:
+                    data = _api.list_services(namespace)
+                except (kube_api.KubeApiError, requests.RequestException) as exc:
+                    log.warning("service list failed: %s", exc)
+                    return None
+            else:
+                raw = _kubectl("get", "svc", "-o", "json", kubeconfig=kubeconfig, namespace=namespace)
+                if not raw:
+                    return None
+                data = json.loads(raw)
+            _service_indexes[key] = ServiceIndex(data.get("items", []))
+        return _service_indexes[key]
+
+
+def _forget_services():
+    """Drop the cached service indexes so the next lookup lists services again.
+
+    Called at the start of each monitoring cycle, since services may have
+    been recreated or renamed since the index was built.
+    """
+    with _service_index_lock:
+        _service_indexes.clear()
+
+
 def discover_service(namespace, label_selector, kubeconfig=None, prefer_port=None):
     """Return (service_name, port) for the first non-headless service matching *label_selector*.
 
     If *prefer_port* is given, look for that port number among the service's
     ports instead of blindly returning the first one.
     """
-    raw = _kubectl(
-        "get", "svc",
-        "-l", label_selector,
-        "-o", "json",
-        kubeconfig=kubeconfig,
-        namespace=namespace,
-    )
-    if not raw:
-        return None, None
-    data = json.loads(raw)
-    items = data.get("items", [])
-    if not items:
-        return None, None
-    # Prefer non-headless (clusterIP != "None") services
-    non_headless = [s for s in items if s.get("spec", {}).get("clusterIP") != "None"]
-    if non_headless:
-        candidates = non_headless
-    else:
-        # All headless - prefer those that actually define ports
-        with_ports = [s for s in items if s.get("spec", {}).get("ports")]
-        candidates = with_ports or items
-    # If prefer_port is set, try to find a service that exposes it
-    if prefer_port:
-        for svc in candidates:
-            for p in svc.get("spec", {}).get("ports", []):
-                if p.get("port") == prefer_port:
+    with reporting.phase("discover"):
+        index = _service_index(namespace, kubeconfig)
+        if index is None:
+            return None, None
+        items = index.select(label_selector)
+        if not items:
+            return None, None
+        # Prefer non-headless (clusterIP != "None") services
+        non_headless = [s for s in items if s.get("spec", {}).get("clusterIP") != "None"]
+        if non_headless:
+            candidates = non_headless
+        else:
+            # All headless - prefer those that actually define ports
+            with_ports = [s for s in items if s.get("spec", {}).get("ports")]
+            candidates = with_ports or items
+        # If prefer_port is set, try to find a service that exposes it
+        if prefer_port:
+            for svc in candidates:
+                if index.exposes(svc, prefer_port):
                     return svc["metadata"]["name"], prefer_port
-    svc = candidates[0]
-    name = svc["metadata"]["name"]
-    ports = svc.get("spec", {}).get("ports", [])
-    port = ports[0]["port"] if ports else None
-    return name, port
+        svc = candidates[0]
+        name = svc["metadata"]["name"]
+        ports = svc.get("spec", {}).get("ports", [])
+        port = ports[0]["port"] if ports else None
+        return name, port
 
 
 def _free_port():
@@ -100,53 +246,303 @@ def _free_port():
         return s.getsockname()[1]
 
 
+class PortForwarder:
+    """Long-lived ``kubectl port-forward`` processes, one per service port.
+
+    Targets are service names; ``pod/NAME`` forwards to one pod instead.
+
+    A forward is started the first time a service port is requested and
+    reused by every later retry and check.  Readiness is taken from kubectl's
+    "Forwarding from" line rather than a fixed sleep.  A forward whose process
+    has exited, or that was discarded after a failed attempt, is restarted on
+    the next request.  Once closed it refuses new forwards, so a check still
+    running at shutdown cannot leave a kubectl process behind.
+    """
+
+    def __init__(self, ready_timeout=15):
+        self.ready_timeout = ready_timeout
+        self._forwards = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _start(self, namespace, service, remote_port, kubeconfig):
+        if _api is not None:
+            try:
+                if service.startswith("pod/"):
+                    forward = kube_api.ApiPortForward(_api, namespace, service[len("pod/"):], remote_port)
+                else:
+                    forward = _api.port_forward(namespace, service, remote_port)
+            except (kube_api.KubeApiError, requests.RequestException) as exc:
+                raise RuntimeError(f"port-forward to {service}:{remote_port} not ready: {exc}")
+            log.info("port-forward %s:%s -> localhost:%s (api)", service, remote_port, forward.local_port)
+            return forward, forward.local_port
+
+        local_port = _free_port()
+        cmd = [KUBECTL]
+        if kubeconfig:
+            cmd += ["--kubeconfig", kubeconfig]
+        cmd += [
+            "-n", namespace,
+            "port-forward",
+            service if "/" in service else f"svc/{service}",
+            f"{local_port}:{remote_port}",
+        ]
+        log.info("port-forward %s:%s -> localhost:%s", service, remote_port, local_port)
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+
+        # Drain both pipes for the life of the process: kubectl logs a line
+        # per forwarded connection and would block once a pipe fills up
+        ready = threading.Event()
+        errors = []
+
+        def drain(pipe, sink):
+            for line in pipe:
+                if line.startswith("Forwarding from"):
+                    ready.set()
+                if sink is not None:
+                    sink.append(line.strip())
+                    del sink[:-5]
+
+        drainers = [
+            threading.Thread(target=drain, args=(pipe, sink), daemon=True)
+            for pipe, sink in ((proc.stdout, None), (proc.stderr, errors))
+        ]
+        for drainer in drainers:
+            drainer.start()
+
+        deadline = time.monotonic() + self.ready_timeout
+        while not ready.wait(0.05):
+            if proc.poll() is not None or time.monotonic() > deadline:
+                self._stop(proc)
+                drainers[1].join(timeout=1)
+                raise RuntimeError(
+                    f"port-forward to {service}:{remote_port} not ready: {' '.join(errors) or 'timed out'}"
+                )
+        return proc, local_port
+
+    @staticmethod
+    def _stop(proc):
+        if proc.poll() is None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    def get(self, namespace, service, remote_port, kubeconfig=None):
+        """Return the local port forwarding to *service*:*remote_port*, starting it if needed."""
+        key = (namespace, service, remote_port, kubeconfig)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError(f"port-forward to {service}:{remote_port} refused: shutting down")
+            key_lock = self._locks.setdefault(key, threading.Lock())
+        # Per-service lock: one component starting a forward doesn't hold up the others
+        with key_lock:
+            with self._lock:
+                forward = self._forwards.get(key)
+            if forward is None or forward[0].poll() is not None:
+                with reporting.phase("forward_ready"):
+                    forward = self._start(namespace, service, remote_port, kubeconfig)
+                with self._lock:
+                    # close() may have run while the forward was starting
+                    closed = self._closed
+                    if not closed:
+                        self._forwards[key] = forward
+                if closed:
+                    self._stop(forward[0])
+                    raise RuntimeError(f"port-forward to {service}:{remote_port} refused: shutting down")
+            return forward[1]
+
+    def discard(self, namespace, service, remote_port, kubeconfig=None):
+        """Stop a forward so the next request starts a fresh one."""
+        with self._lock:
+            forward = self._forwards.pop((namespace, service, remote_port, kubeconfig), None)
+        if forward:
+            self._stop(forward[0])
+
+    def close(self):
+        """Stop every forward and refuse new ones."""
+        with self._lock:
+            self._closed = True
+            forwards = list(self._forwards.values())
+            self._forwards.clear()
+        for proc, _ in forwards:
+            self._stop(proc)
+
+
+_forwarder = PortForwarder()
+
+# Set at shutdown so retry loops give up and check threads can be joined
+_cancel = threading.Event()
+_workers = []
+
+# Shared by the HTTP probes so repeated checks (e.g. under --monitor) reuse
+# their connections through the port-forwards
+_http = requests.Session()
+
+
 @contextmanager
 def port_forward(namespace, service, remote_port, kubeconfig=None):
-    """Context manager that runs ``kubectl port-forward`` and yields the local port."""
-    local_port = _free_port()
-    cmd = [KUBECTL]
-    if kubeconfig:
-        cmd += ["--kubeconfig", kubeconfig]
-    cmd += [
-        "-n", namespace,
-        "port-forward",
-        f"svc/{service}",
-        f"{local_port}:{remote_port}",
-    ]
-    log.info("port-forward %s:%s -> localhost:%s", service, remote_port, local_port)
-    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    # Give port-forward a moment to bind
-    time.sleep(2)
+    """Context manager that yields a local port forwarded to *service*:*remote_port*.
+
+    The forward is shared and stays up after the block; if the block raises,
+    it is restarted on the next use in case the tunnel itself was broken.
+    """
+    local_port = _forwarder.get(namespace, service, remote_port, kubeconfig)
     try:
         yield local_port
-    finally:
-        proc.terminate()
-        proc.wait(timeout=5)
+    except Exception:
+        _forwarder.discard(namespace, service, remote_port, kubeconfig)
+        raise
 
 
-def tcp_check(host, port, timeout=5):
-    """Return True if a TCP connection can be established."""
-    try:
-        with socket.create_connection((host, port), timeout=timeout):
-            return True
-    except (socket.timeout, OSError):
-        return False
+# ---------------------------------------------------------------------------
+# Protocol probes
+#
+# Each probe speaks just enough of a component's wire protocol to prove the
+# server behind the port-forward is answering, not merely that kubectl
+# accepted the local connection.  Probes return the handshake latency in
+# seconds and raise ProbeError when the server answers wrongly.
+# ---------------------------------------------------------------------------
+
+class ProbeError(Exception):
+    """The server answered, but not with what the protocol requires."""
+
+
+def probe_postgres(host, port, timeout=5):
+    """Send a Postgres SSLRequest and expect the one-byte 'S' or 'N' answer."""
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        start = time.monotonic()
+        sock.sendall(struct.pack("!II", 8, 80877103))
+        answer = benchmark.recv_exact(sock, 1)
+        latency = time.monotonic() - start
+    if answer not in (b"S", b"N"):
+        raise ProbeError(f"unexpected SSLRequest answer {answer!r}")
+    return latency
+
+
+NFS_PROGRAM = 100003
+
+
+def probe_nfs(host, port, timeout=5, version=4):
+    """Call the NFS NULL procedure over ONC RPC and expect an accepted reply.
+
+    A PROG_MISMATCH reply (the server speaks other NFS versions) still proves
+    the RPC service is up, so it counts as a pass.
+    """
+    xid = random.getrandbits(32)
+    # xid, CALL, RPC v2, program, version, NULL proc, AUTH_NONE cred and verifier
+    call = struct.pack("!10I", xid, 0, 2, NFS_PROGRAM, version, 0, 0, 0, 0, 0)
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        start = time.monotonic()
+        # Record marking: last-fragment bit plus fragment length
+        sock.sendall(struct.pack("!I", 0x80000000 | len(call)) + call)
+        length = struct.unpack("!I", benchmark.recv_exact(sock, 4))[0] & 0x7FFFFFFF
+        reply = benchmark.recv_exact(sock, length)
+        latency = time.monotonic() - start
+    if len(reply) < 24:
+        raise ProbeError(f"short RPC reply ({len(reply)} bytes)")
+    reply_xid, msg_type, reply_stat = struct.unpack("!III", reply[:12])
+    if reply_xid != xid or msg_type != 1:
+        raise ProbeError("RPC reply does not match the call")
+    if reply_stat != 0:
+        raise ProbeError("RPC call denied")
+    # Skip the verifier (flavor, length, body) to reach accept_stat
+    verf_length = struct.unpack("!I", reply[16:20])[0]
+    accept_stat = struct.unpack("!I", reply[20 + verf_length:24 + verf_length])[0]
+    if accept_stat not in (0, 2):  # SUCCESS, PROG_MISMATCH
+        raise ProbeError(f"RPC accept_stat {accept_stat}")
+    return latency
+
+
+def _cql_request(sock, stream, opcode, body=b""):
+    reply_opcode, reply = benchmark.cql_exchange(sock, opcode, body, stream)
+    if reply_opcode == benchmark.CQL_ERROR:
+        raise ProbeError(f"CQL error {benchmark.cql_error_message(reply)}")
+    return reply_opcode
+
+
+def probe_cql(host, port, timeout=5):
+    """Exchange CQL v4 OPTIONS/SUPPORTED and STARTUP/READY frames.
+
+    AUTHENTICATE in answer to STARTUP means the node accepts sessions but
+    wants credentials, which still passes.
+    """
+    startup = benchmark.cql_string_map({"CQL_VERSION": "3.0.0"})
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        start = time.monotonic()
+        if _cql_request(sock, 1, benchmark.CQL_OPTIONS) != benchmark.CQL_SUPPORTED:
+            raise ProbeError("no SUPPORTED answer to OPTIONS")
+        reply = _cql_request(sock, 2, benchmark.CQL_STARTUP, startup)
+        if reply not in (benchmark.CQL_READY, benchmark.CQL_AUTHENTICATE):
+            raise ProbeError("no READY or AUTHENTICATE answer to STARTUP")
+        return time.monotonic() - start
+
+
+def probe_s3(host, port, access_key=None, secret_key=None, region="garage", timeout=5):
+    """Call S3 ListBuckets.
+
+    With credentials the call must succeed.  Without them, an S3 XML error
+    (AccessDenied) is enough to prove the S3 API is serving.
+    """
+    headers = {}
+    if access_key and secret_key:
+        headers = benchmark.sigv4_headers("GET", f"{host}:{port}", "/", region, access_key, secret_key)
+    start = time.monotonic()
+    resp = _http.get(f"http://{host}:{port}/", headers=headers, timeout=timeout)
+    latency = time.monotonic() - start
+    if resp.status_code == 200 and b"ListAllMyBucketsResult" in resp.content:
+        return latency
+    if not headers and resp.status_code in (400, 403) and b"<Error>" in resp.content:
+        return latency
+    raise ProbeError(f"ListBuckets returned HTTP {resp.status_code}: {resp.text[:200]}")
+
+
+# Handshake latency per component, filled in by the checks for the results table
+_latencies = {}
+
+
+def _timed_probe(component, protocol, probe, host, port, **kwargs):
+    latency = probe(host, port, **kwargs)
+    _latencies[component] = (protocol, latency)
+    log.info("[%s] %s handshake in %.1fms", component, protocol, latency * 1000)
+    return True
 
 
 # ---------------------------------------------------------------------------
 # Component checks
 # ---------------------------------------------------------------------------
 
+# Created by our chart template
+POSTGRES_SERVICE = "postgres-nodeport"
+
+
 def check_postgres(namespace, kubeconfig, timeout):
-    """TCP connect to PostgreSQL on port 5432."""
-    svc_name = "postgres-nodeport"  # created by our chart template
+    """Postgres SSLRequest handshake on port 5432."""
+    svc_name = POSTGRES_SERVICE
     port = 5432
     log.info("[postgres] using service %s:%s", svc_name, port)
-    return _retry_port_forward_tcp(namespace, svc_name, port, kubeconfig, timeout)
+    return _retry_port_forward(
+        "postgres", namespace, svc_name, port, kubeconfig, timeout,
+        lambda lp: _timed_probe("postgres", "SSLRequest", probe_postgres, "localhost", lp),
+    )
+
+
+def _garage_s3_service(namespace, kubeconfig):
+    """Return (service_name, 3900) for the Garage S3 API, or (None, None)."""
+    svc_name, svc_port = discover_service(
+        namespace, "app.kubernetes.io/name=garage", kubeconfig=kubeconfig, prefer_port=3900,
+    )
+    return (svc_name, svc_port) if svc_port == 3900 else (None, None)
 
 
 def check_garage(namespace, kubeconfig, timeout):
-    """HTTP GET /health on the Garage admin API (port 3903)."""
+    """HTTP GET /health on the Garage admin API (port 3903), then S3 ListBuckets (port 3900).
+
+    ListBuckets is signed with GARAGE_ACCESS_KEY_ID / GARAGE_SECRET_ACCESS_KEY
+    when they are set; otherwise an S3 AccessDenied answer is enough.
+    """
     svc_name, svc_port = discover_service(
         namespace, "app.kubernetes.io/name=garage", kubeconfig=kubeconfig,
         prefer_port=3903,
@@ -155,23 +551,36 @@ def check_garage(namespace, kubeconfig, timeout):
         svc_name, svc_port = "storagebox-garage", 3903
     svc_port = svc_port or 3903
     log.info("[garage] discovered service %s:%s", svc_name, svc_port)
-    deadline = time.time() + timeout
-    while time.time() < deadline:
-        try:
-            with port_forward(namespace, svc_name, svc_port, kubeconfig) as lp:
-                resp = requests.get(f"http://localhost:{lp}/health", timeout=5)
-                if resp.status_code == 200:
-                    log.info("[garage] health check passed (HTTP %s)", resp.status_code)
-                    return True
-                log.warning("[garage] unexpected status %s", resp.status_code)
-        except Exception as exc:
-            log.debug("[garage] attempt failed: %s", exc)
-        time.sleep(5)
-    return False
+
+    def probe(lp):
+        resp = _http.get(f"http://localhost:{lp}/health", timeout=5)
+        if resp.status_code == 200:
+            log.info("[garage] health check passed (HTTP %s)", resp.status_code)
+            return True
+        log.warning("[garage] unexpected status %s", resp.status_code)
+        return False
+
+    deadline = time.monotonic() + timeout
+    if not _retry_port_forward("garage", namespace, svc_name, svc_port, kubeconfig, timeout, probe):
+        return False
+
+    s3_name, s3_port = _garage_s3_service(namespace, kubeconfig)
+    if not s3_name:
+        log.warning("[garage] no service exposes the S3 API port 3900, skipping ListBuckets")
+        return True
+    return _retry_port_forward(
+        "garage", namespace, s3_name, s3_port, kubeconfig, max(1, deadline - time.monotonic()),
+        lambda lp: _timed_probe(
+            "garage", "S3 ListBuckets", probe_s3, "localhost", lp,
+            access_key=os.environ.get("GARAGE_ACCESS_KEY_ID"),
+            secret_key=os.environ.get("GARAGE_SECRET_ACCESS_KEY"),
+            region=os.environ.get("GARAGE_REGION", "garage"),
+        ),
+    )
 
 
 def check_nfs(namespace, kubeconfig, timeout):
-    """TCP connect to the NFS server on port 2049."""
+    """NFS NULL RPC to the NFS server on port 2049."""
     # The nfs-server subchart creates a service whose name is templated from
     # the release.  Try label-based discovery first.
     svc_name, svc_port = discover_service(
@@ -182,11 +591,13 @@ def check_nfs(namespace, kubeconfig, timeout):
         svc_name, svc_port = "storagebox-nfs-server", 2049
     svc_port = svc_port or 2049
     log.info("[nfs] discovered service %s:%s", svc_name, svc_port)
-    return _retry_port_forward_tcp(namespace, svc_name, svc_port, kubeconfig, timeout)
+    return _retry_port_forward(
+        "nfs", namespace, svc_name, svc_port, kubeconfig, timeout,
+        lambda lp: _timed_probe("nfs", "NULL RPC", probe_nfs, "localhost", lp),
+    )
 
 
-def check_rqlite(namespace, kubeconfig, timeout):
-    """HTTP GET /status on the rqlite service."""
+def _rqlite_service(namespace, kubeconfig):
     # The rqlite subchart labels services with the release name as
     # app.kubernetes.io/name, not "rqlite".  Use the chart label instead.
     svc_name, svc_port = discover_service(
@@ -194,25 +605,235 @@ def check_rqlite(namespace, kubeconfig, timeout):
     )
     if not svc_name:
         svc_name, svc_port = "storagebox-rqlite", 80
-    svc_port = svc_port or 80
-    log.info("[rqlite] discovered service %s:%s", svc_name, svc_port)
-    deadline = time.time() + timeout
-    while time.time() < deadline:
+    return svc_name, svc_port or 80
+
+
+# Set by --rqlite-burst / --rqlite-max-lag; the burst writes to the
+# cluster, so it only runs when asked for
+_rqlite_burst = 0
+_rqlite_max_lag = 100
+
+
+def _rqlite_status(local_port):
+    """GET /status on one rqlite node; return its Raft state and the round-trip time."""
+    start = time.monotonic()
+    resp = _http.get(f"http://localhost:{local_port}/status", timeout=5)
+    rtt = time.monotonic() - start
+    resp.raise_for_status()
+    store = resp.json().get("store", {})
+    raft = store.get("raft", {})
+    return {
+        "state": raft.get("state"),
+        "applied_index": int(raft.get("applied_index", 0)),
+        "commit_index": int(raft.get("commit_index", 0)),
+        "leader": (store.get("leader") or {}).get("addr"),
+        "rtt": rtt,
+    }
+
+
+def _rqlite_nodes(local_port):
+    """GET /nodes; return a list of node dicts for both the v7/v8 map and the ver=2 list forms."""
+    resp = _http.get(f"http://localhost:{local_port}/nodes", params={"ver": "2"}, timeout=10)
+    resp.raise_for_status()
+    data = resp.json()
+    if isinstance(data.get("nodes"), list):
+        return data["nodes"]
+    return [dict(info, id=node_id) for node_id, info in data.items()]
+
+
+def _list_pods(namespace, kubeconfig, label_selector):
+    if _api is not None:
+        return _api.list_pods(namespace, label_selector).get("items", [])
+    raw = _kubectl("get", "pods", "-l", label_selector, "-o", "json", kubeconfig=kubeconfig, namespace=namespace)
+    return json.loads(raw).get("items", []) if raw else []
+
+
+def _rqlite_node_pods(namespace, kubeconfig, svc_name, nodes):
+    """Map each node id to ``(pod/NAME, api_port)`` so every voter can be queried directly.
+
+    A node's api_addr is either the pod's stable DNS name or its IP; both
+    are matched against the pods behind *svc_name*.
+    """
+    index = _service_index(namespace, kubeconfig)
+    svc = next((s for s in (index.items if index else []) if s["metadata"]["name"] == svc_name), None)
+    selector = (svc or {}).get("spec", {}).get("selector")
+    if not selector:
+        return {}
+    pods = {}
+    for pod in _list_pods(namespace, kubeconfig, ",".join(f"{k}={v}" for k, v in selector.items())):
+        pods[pod["metadata"]["name"]] = pod
+        if pod.get("status", {}).get("podIP"):
+            pods[pod["status"]["podIP"]] = pod
+    targets = {}
+    for node in nodes:
+        addr = urlsplit(node.get("api_addr") or "")
+        pod = pods.get(addr.hostname or "") or pods.get((addr.hostname or "").split(".")[0])
+        if pod:
+            targets[node["id"]] = (f"pod/{pod['metadata']['name']}", addr.port or 4001)
+    return targets
+
+
+def _rqlite_lag(namespace, kubeconfig, targets):
+    """Query every voter's /status at once; return ``({node: status}, lag)``.
+
+    Lag is how many Raft entries the slowest voter has applied behind the
+    furthest one.
+    """
+    if not targets:
+        return {}, 0
+
+    def status(target):
+        with port_forward(namespace, *target, kubeconfig) as lp:
+            return _rqlite_status(lp)
+
+    with ThreadPoolExecutor(max_workers=len(targets)) as pool:
+        futures = {node: pool.submit(status, target) for node, target in targets.items()}
+    statuses = {}
+    for node, future in futures.items():
         try:
-            with port_forward(namespace, svc_name, svc_port, kubeconfig) as lp:
-                resp = requests.get(f"http://localhost:{lp}/status", timeout=5)
-                if resp.status_code == 200:
-                    log.info("[rqlite] status check passed (HTTP %s)", resp.status_code)
-                    return True
-                log.warning("[rqlite] unexpected status %s", resp.status_code)
+            statuses[node] = future.result()
         except Exception as exc:
-            log.debug("[rqlite] attempt failed: %s", exc)
-        time.sleep(5)
-    return False
+            log.warning("[rqlite] %s: /status failed: %s", node, exc)
+    applied = [st["applied_index"] for st in statuses.values()]
+    return statuses, (max(applied) - min(applied) if applied else 0)
 
 
-def check_cassandra(namespace, kubeconfig, timeout):
-    """TCP connect to the K8ssandra CQL service on port 9042."""
+def _rqlite_burst_run(namespace, kubeconfig, svc_name, svc_port, targets, writes, duration):
+    """Run parallel writes and reads at each consistency level while sampling voter lag.
+
+    The rows go to a scratch table that is dropped again even if the burst
+    fails.  Returns ``({workload: stats}, max_lag)``; stats come from
+    benchmark.run_workload.
+    """
+    table = f"storagebox_smoke_{uuid.uuid4().hex[:8]}"
+
+    def post(http, lp, path, statements):
+        resp = http.post(f"http://localhost:{lp}{path}", json=statements, timeout=10)
+        resp.raise_for_status()
+        for result in resp.json().get("results", []):
+            if "error" in result:
+                raise RuntimeError(result["error"])
+
+    def session(lp, path, statement):
+        @contextmanager
+        def rqlite_session():
+            with requests.Session() as http:
+                yield lambda i: post(http, lp, path, [statement(i)])
+        return rqlite_session
+
+    stop = threading.Event()
+    max_lag = [0]
+
+    def sample():
+        while not stop.is_set():
+            max_lag[0] = max(max_lag[0], _rqlite_lag(namespace, kubeconfig, targets)[1])
+            stop.wait(0.2)
+
+    with port_forward(namespace, svc_name, svc_port, kubeconfig) as lp, requests.Session() as http:
+        workloads = {
+            "write": session(lp, "/db/execute", lambda i: [f"INSERT INTO {table}(id, v) VALUES(?, ?)", i, "x"]),
+        }
+        for level in ("none", "weak", "strong"):
+            workloads[f"read_{level}"] = session(
+                lp, f"/db/query?level={level}", lambda i: [f"SELECT v FROM {table} WHERE id = ?", i],
+            )
+
+        post(http, lp, "/db/execute", [f"CREATE TABLE {table} (id INTEGER PRIMARY KEY, v TEXT)"])
+        sampler = threading.Thread(target=sample, daemon=True)
+        if targets:
+            sampler.start()
+        try:
+            with ThreadPoolExecutor(max_workers=len(workloads)) as pool:
+                futures = {
+                    name: pool.submit(benchmark.run_workload, workload, writes, 4, duration)
+                    for name, workload in workloads.items()
+                }
+            results = {name: future.result() for name, future in futures.items()}
+        finally:
+            stop.set()
+            if sampler.is_alive():
+                sampler.join()
+            post(http, lp, "/db/execute", [f"DROP TABLE IF EXISTS {table}"])
+    return results, max_lag[0]
+
+
+def check_rqlite(namespace, kubeconfig, timeout):
+    """rqlite cluster health: leader election, voter lag and a read/write burst.
+
+    Waits for /status on the service to report a leader, then uses /nodes
+    to confirm every voter is reachable, queries each voter's /status
+    directly to compare Raft applied indexes, and runs a short burst of
+    parallel writes and reads at consistency levels none/weak/strong,
+    tracking voter lag while it runs.  The burst writes to the cluster, so
+    it only runs with --rqlite-burst.
+    """
+    svc_name, svc_port = _rqlite_service(namespace, kubeconfig)
+    log.info("[rqlite] discovered service %s:%s", svc_name, svc_port)
+    deadline = time.monotonic() + timeout
+
+    def probe(lp):
+        status = _rqlite_status(lp)
+        if not status["leader"]:
+            log.info("[rqlite] no leader elected yet (state %s)", status["state"])
+            return False
+        log.info("[rqlite] status check passed, leader %s", status["leader"])
+        return True
+
+    if not _retry_port_forward("rqlite", namespace, svc_name, svc_port, kubeconfig, timeout, probe):
+        return False
+
+    ok = True
+    with port_forward(namespace, svc_name, svc_port, kubeconfig) as lp:
+        nodes = _rqlite_nodes(lp)
+    leaders = [n["id"] for n in nodes if n.get("leader")]
+    voters = [n for n in nodes if n.get("voter", True)]
+    log.info("[rqlite] %d voter(s), leader %s", len(voters), ", ".join(leaders) or "none")
+    if len(leaders) != 1:
+        log.error("[rqlite] expected exactly one leader, /nodes reports %d", len(leaders))
+        ok = False
+    for node in voters:
+        if not node.get("reachable"):
+            log.error("[rqlite] voter %s unreachable: %s", node["id"], node.get("error") or "no error given")
+            ok = False
+
+    targets = _rqlite_node_pods(namespace, kubeconfig, svc_name, voters)
+    if len(targets) < len(voters):
+        log.warning("[rqlite] could not map %d voter(s) to pods, lag is measured on %d",
+                    len(voters) - len(targets), len(targets))
+    statuses, lag = _rqlite_lag(namespace, kubeconfig, targets)
+    for node in voters:
+        st = statuses.get(node["id"])
+        leader_time = f"{node['time'] * 1000:.1f}ms" if isinstance(node.get("time"), (int, float)) else "-"
+        if st:
+            log.info("[rqlite]   %-24s %-9s applied %-8d rtt %5.1fms  leader->node %s",
+                     node["id"], st["state"], st["applied_index"], st["rtt"] * 1000, leader_time)
+        else:
+            log.info("[rqlite]   %-24s %-9s leader->node %s", node["id"], "?", leader_time)
+    log.info("[rqlite] applied-index lag across voters: %d", lag)
+    if lag > _rqlite_max_lag:
+        log.error("[rqlite] voter lag %d exceeds %d", lag, _rqlite_max_lag)
+        ok = False
+
+    if _rqlite_burst > 0:
+        remaining = max(1, deadline - time.monotonic())
+        results, burst_lag = _rqlite_burst_run(
+            namespace, kubeconfig, svc_name, svc_port, targets, _rqlite_burst, remaining,
+        )
+        for name, stats in results.items():
+            latency = stats["latency_ms"] or {}
+            log.info("[rqlite] burst %-11s %4d ok %3d errors  p50 %s ms  p99 %s ms",
+                     name, stats["ops"], stats["errors"], latency.get("p50", "-"), latency.get("p99", "-"))
+            if stats["errors"]:
+                log.error("[rqlite] burst %s failed: %s", name, stats["first_error"])
+                ok = False
+        log.info("[rqlite] max applied-index lag during burst: %d", burst_lag)
+        if burst_lag > _rqlite_max_lag:
+            log.error("[rqlite] voter lag %d under load exceeds %d", burst_lag, _rqlite_max_lag)
+            ok = False
+    return ok
+
+
+def _cassandra_service(namespace, kubeconfig):
     # Use datacenter label to target the DC-level service which has the CQL port.
     # The cluster-level label also matches seed services that have no ports.
     svc_name, svc_port = discover_service(
@@ -223,28 +844,251 @@ def check_cassandra(namespace, kubeconfig, timeout):
     )
     if not svc_name:
         svc_name, svc_port = "storagebox-cassandra-dc1-service", 9042
-    svc_port = svc_port or 9042
+    return svc_name, svc_port or 9042
+
+
+def check_cassandra(namespace, kubeconfig, timeout):
+    """CQL OPTIONS/STARTUP handshake with the K8ssandra CQL service on port 9042."""
+    svc_name, svc_port = _cassandra_service(namespace, kubeconfig)
     log.info("[cassandra] discovered service %s:%s", svc_name, svc_port)
-    return _retry_port_forward_tcp(namespace, svc_name, svc_port, kubeconfig, timeout)
+    return _retry_port_forward(
+        "cassandra", namespace, svc_name, svc_port, kubeconfig, timeout,
+        lambda lp: _timed_probe("cassandra", "CQL", probe_cql, "localhost", lp),
+    )
 
 
 # ---------------------------------------------------------------------------
 # Retry helper
 # ---------------------------------------------------------------------------
 
-def _retry_port_forward_tcp(namespace, svc_name, svc_port, kubeconfig, timeout):
-    """Retry TCP connect through port-forward until *timeout*."""
-    deadline = time.time() + timeout
-    while time.time() < deadline:
+# Backoff between attempts: starts short so a service that is already up
+# passes at once, and backs off so one that is still starting isn't hammered
+RETRY_INITIAL_DELAY = 0.5
+RETRY_MAX_DELAY = 8.0
+RETRY_JITTER = 0.5
+
+# Set by --wait-ready: wait for a ready endpoint before the first attempt
+_wait_ready = False
+
+
+def _backoff_delays(initial=RETRY_INITIAL_DELAY, maximum=RETRY_MAX_DELAY, jitter=RETRY_JITTER):
+    """Yield exponentially growing delays, each randomly shortened by up to *jitter*."""
+    delay = initial
+    while True:
+        yield delay * (1 - jitter * random.random())
+        delay = min(delay * 2, maximum)
+
+
+def _retry(fn, deadline, description):
+    """Call *fn* until it returns truthy or the monotonic *deadline* passes.
+
+    Exceptions count as failed attempts.  Sleeps between attempts follow
+    _backoff_delays but never run past the deadline, and the loop gives up
+    early once _cancel is set.
+    """
+    for attempt, delay in enumerate(_backoff_delays(), start=1):
+        try:
+            if fn():
+                reporting.attempt(True)
+                return True
+            reporting.attempt(False)
+        except Exception as exc:
+            reporting.attempt(False, exc)
+            log.debug("[%s] attempt %d failed: %s", description, attempt, exc)
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or _cancel.wait(min(delay, remaining)):
+            return False
+
+
+def wait_for_endpoints(namespace, service, kubeconfig, timeout):
+    """Block until *service* has a ready endpoint; return False if it didn't in time.
+
+    Uses an EndpointSlice watch, through the API backend or ``kubectl wait``,
+    so a check starts the moment the service becomes routable.  Returns None
+    if readiness could not be determined, e.g. before any EndpointSlice exists.
+    """
+    if _api is not None:
+        try:
+            return _api.wait_for_endpoints(namespace, service, timeout)
+        except (kube_api.KubeApiError, requests.RequestException) as exc:
+            log.debug("[%s] endpoint watch failed: %s", service, exc)
+            return None
+
+    cmd = [KUBECTL]
+    if kubeconfig:
+        cmd += ["--kubeconfig", kubeconfig]
+    cmd += [
+        "-n", namespace,
+        "wait", "endpointslice",
+        "-l", f"kubernetes.io/service-name={service}",
+        "--for=jsonpath={.endpoints[0].conditions.ready}=true",
+        f"--timeout={max(1, int(timeout))}s",
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout + 10)
+    except subprocess.TimeoutExpired:
+        return False
+    if result.returncode != 0:
+        log.debug("[%s] kubectl wait: %s", service, result.stderr.strip())
+        return False if "timed out" in result.stderr else None
+    return True
+
+
+def _retry_port_forward(component, namespace, svc_name, svc_port, kubeconfig, timeout, probe):
+    """Run *probe(local_port)* through a port-forward until it passes or *timeout* expires."""
+    deadline = time.monotonic() + timeout
+    if _wait_ready:
+        start = time.monotonic()
+        with reporting.phase("wait_ready"):
+            ready = wait_for_endpoints(namespace, svc_name, kubeconfig, timeout)
+        if ready is not None:
+            log.info("[%s] endpoints %s after %.1fs", component,
+                     "ready" if ready else "not ready", time.monotonic() - start)
+
+    def attempt():
+        with port_forward(namespace, svc_name, svc_port, kubeconfig) as lp:
+            return probe(lp)
+
+    return _retry(attempt, deadline, component)
+
+
+# ---------------------------------------------------------------------------
+# Benchmarks
+#
+# --benchmark runs short workloads (see benchmark.py) against each component
+# that passed its check.  Credentials come from the environment first, then
+# from the Secrets the chart creates.
+# ---------------------------------------------------------------------------
+
+def read_secret(namespace, kubeconfig, name=None, label_selector=None):
+    """Return the decoded data of Secret *name* or of the first Secret matching *label_selector*.
+
+    Returns an empty dict if the Secret cannot be read.
+    """
+    try:
+        if _api is not None:
+            if name:
+                secret = _api.get(f"/api/v1/namespaces/{namespace}/secrets/{name}")
+            else:
+                secret = _api.get(f"/api/v1/namespaces/{namespace}/secrets", labelSelector=label_selector)
+        else:
+            args = ["get", "secret", name] if name else ["get", "secret", "-l", label_selector]
+            raw = _kubectl(*args, "-o", "json", kubeconfig=kubeconfig, namespace=namespace)
+            secret = json.loads(raw) if raw else {}
+    except (kube_api.KubeApiError, requests.RequestException, ValueError) as exc:
+        log.warning("cannot read secret %s: %s", name or label_selector, exc)
+        return {}
+    if not name:
+        items = secret.get("items") or [{}]
+        secret = items[0]
+    return {k: base64.b64decode(v).decode() for k, v in (secret.get("data") or {}).items()}
+
+
+def bench_postgres(namespace, kubeconfig, options):
+    secret = read_secret(namespace, kubeconfig, name="postgres-initdb-secret")
+    with port_forward(namespace, POSTGRES_SERVICE, 5432, kubeconfig) as lp:
+        return benchmark.bench_postgres(
+            "localhost", lp,
+            user=os.environ.get("POSTGRES_USER") or secret.get("username", "postgres"),
+            password=os.environ.get("POSTGRES_PASSWORD") or secret.get("password", "postgres"),
+            dbname=os.environ.get("POSTGRES_DB", "postgres"),
+            ops=options.bench_ops, batch=options.bench_batch,
+            concurrency=options.bench_concurrency, duration=options.bench_duration,
+        )
+
+
+def bench_garage(namespace, kubeconfig, options):
+    svc_name, svc_port = _garage_s3_service(namespace, kubeconfig)
+    if not svc_name:
+        raise benchmark.SkipBenchmark("no service exposes the S3 API port 3900")
+    # Written by the chart's garage-setup Job
+    secret = read_secret(namespace, kubeconfig, label_selector="app.kubernetes.io/managed-by=garage-setup")
+    with port_forward(namespace, svc_name, svc_port, kubeconfig) as lp:
+        return benchmark.bench_s3(
+            "localhost", lp,
+            bucket=os.environ.get("GARAGE_BUCKET", "storagebox"),
+            access_key=os.environ.get("GARAGE_ACCESS_KEY_ID") or secret.get("access-key-id"),
+            secret_key=os.environ.get("GARAGE_SECRET_ACCESS_KEY") or secret.get("secret-access-key"),
+            region=os.environ.get("GARAGE_REGION", "garage"),
+            sizes=options.bench_object_sizes, ops=options.bench_ops,
+            concurrency=options.bench_concurrency, duration=options.bench_duration,
+        )
+
+
+def bench_nfs(namespace, kubeconfig, options):
+    return benchmark.bench_filesystem(
+        options.nfs_path, file_size=options.nfs_file_size, block_size=benchmark.MIB,
+        random_block_size=4096, ops=options.bench_ops,
+        concurrency=options.bench_concurrency, duration=options.bench_duration,
+    )
+
+
+def bench_rqlite(namespace, kubeconfig, options):
+    svc_name, svc_port = _rqlite_service(namespace, kubeconfig)
+    with port_forward(namespace, svc_name, svc_port, kubeconfig) as lp:
+        return benchmark.bench_rqlite(
+            "localhost", lp, ops=options.bench_ops, batch=options.bench_batch,
+            concurrency=options.bench_concurrency, duration=options.bench_duration,
+        )
+
+
+def bench_cassandra(namespace, kubeconfig, options):
+    svc_name, svc_port = _cassandra_service(namespace, kubeconfig)
+    secret = read_secret(namespace, kubeconfig, name="cassandra-superuser-secret")
+    with port_forward(namespace, svc_name, svc_port, kubeconfig) as lp:
+        return benchmark.bench_cql(
+            "localhost", lp,
+            username=os.environ.get("CASSANDRA_USERNAME") or secret.get("username", "cassandra"),
+            password=os.environ.get("CASSANDRA_PASSWORD") or secret.get("password", "cassandra"),
+            ops=options.bench_ops, concurrency=options.bench_concurrency, duration=options.bench_duration,
+        )
+
+
+BENCHMARKS = {
+    "postgres": bench_postgres,
+    "garage": bench_garage,
+    "nfs": bench_nfs,
+    "rqlite": bench_rqlite,
+    "cassandra": bench_cassandra,
+}
+
+
+def run_benchmarks(targets, namespace, kubeconfig, options):
+    """Benchmark each of *targets* in turn.
+
+    Components run one at a time so they don't compete for the node's disk
+    and network.  Returns ``{name: {workload: stats}}``; a component that
+    could not be measured gets ``{"skipped": reason}`` or ``{"error": message}``.
+    """
+    report = {}
+    for name in targets:
+        log.info("--- Benchmarking %s ---", name)
         try:
-            with port_forward(namespace, svc_name, svc_port, kubeconfig) as lp:
-                if tcp_check("localhost", lp):
-                    log.info("[%s] TCP connect succeeded on port %s", svc_name, svc_port)
-                    return True
+            report[name] = BENCHMARKS[name](namespace, kubeconfig, options)
+        except benchmark.SkipBenchmark as exc:
+            log.warning("[%s] skipping benchmark: %s", name, exc)
+            report[name] = {"skipped": str(exc)}
+            continue
         except Exception as exc:
-            log.debug("[%s] attempt failed: %s", svc_name, exc)
-        time.sleep(5)
-    return False
+            log.error("[%s] benchmark failed: %s", name, exc)
+            report[name] = {"error": str(exc)}
+            continue
+        for workload, stats in report[name].items():
+            latency = stats["latency_ms"] or {}
+            log.info("[%s] %-12s %5d ops %8.1f ops/s  p50 %s ms  p99 %s ms  %d errors",
+                     name, workload, stats["ops"], stats["ops_per_sec"],
+                     latency.get("p50", "-"), latency.get("p99", "-"), stats["errors"])
+    return report
+
+
+def write_report(path, report):
+    data = json.dumps(report, indent=2) + "\n"
+    if path == "-":
+        sys.stdout.write(data)
+    else:
+        with open(path, "w") as f:
+            f.write(data)
+        log.info("Benchmark report written to %s", path)
 
 
 # ---------------------------------------------------------------------------
@@ -260,39 +1104,189 @@ COMPONENTS = {
 }
 
 
+def run_checks(targets, namespace, kubeconfig, timeout, deadline):
+    """Run the *targets* checks concurrently.
+
+    Returns ``{name: reporting.CheckResult}`` in *targets* order.  A check
+    still running when *deadline* seconds have passed is reported as failed;
+    its thread is left in _workers for shutdown() to join.
+    """
+    results = {}
+
+    def run(name):
+        with reporting.record(name) as result:
+            try:
+                result.ok = bool(COMPONENTS[name](namespace, kubeconfig, timeout))
+            except Exception as exc:
+                log.error("[%s] unexpected error: %s", name, exc)
+                result.error = str(exc)
+        results[name] = result
+        log.info("[%s] %s in %.1fs", name, "PASS" if result.ok else "FAIL", result.seconds)
+
+    started = time.monotonic()
+    threads = [
+        threading.Thread(target=run, args=(name,), name=f"check-{name}", daemon=True)
+        for name in targets
+    ]
+    for thread in threads:
+        log.info("--- Testing %s ---", thread.name[len("check-"):])
+        thread.start()
+    for thread in threads:
+        thread.join(max(0, started + deadline - time.monotonic()))
+    _workers[:] = [thread for thread in _workers + threads if thread.is_alive()]
+
+    ordered = {}
+    for name in targets:
+        if name in results:
+            ordered[name] = results[name]
+        else:
+            log.error("[%s] did not finish within the %ss deadline", name, deadline)
+            result = ordered[name] = reporting.CheckResult(name)
+            result.error = f"did not finish within the {deadline}s deadline"
+            result.seconds = time.monotonic() - started
+    return ordered
+
+
+def shutdown(grace=10):
+    """Cancel the running checks, wait up to *grace* seconds for them, then stop the port-forwards."""
+    _cancel.set()
+    end = time.monotonic() + grace
+    for thread in _workers:
+        thread.join(max(0, end - time.monotonic()))
+        if thread.is_alive():
+            log.warning("[%s] still running at shutdown", thread.name[len("check-"):])
+    _forwarder.close()
+
+
 def main():
     parser = argparse.ArgumentParser(description="Storagebox smoke tests")
     parser.add_argument("namespace", help="Kubernetes namespace where storagebox is installed")
     parser.add_argument("--kubeconfig", default=os.environ.get("KUBECONFIG"), help="Path to kubeconfig file")
     parser.add_argument("--timeout", type=int, default=120, help="Per-component timeout in seconds (default: 120)")
+    parser.add_argument("--deadline", type=int, help="Overall deadline in seconds for all checks (default: timeout + 30)")
     parser.add_argument("--components", nargs="*", choices=list(COMPONENTS.keys()), help="Test only specific components")
+    parser.add_argument("--backend", choices=["kubectl", "api"], default="kubectl",
+                        help="Use kubectl subprocesses or talk to the Kubernetes API directly (default: kubectl)")
+    parser.add_argument("--wait-ready", action="store_true",
+                        help="Watch for ready endpoints before probing each component")
+    parser.add_argument("--rqlite-burst", type=int, default=0, metavar="N",
+                        help="Run N writes and reads per consistency level against a scratch rqlite table "
+                             "(default: 0, no burst)")
+    parser.add_argument("--rqlite-max-lag", type=int, default=100,
+                        help="Largest Raft applied-index lag allowed between rqlite voters (default: 100)")
+    parser.add_argument("--json", metavar="PATH", help="Write check results with phase timings as JSON")
+    parser.add_argument("--junit", metavar="PATH", help="Write check results as JUnit XML")
     parser.add_argument("--debug", action="store_true", help="Enable debug logging")
+    watch = parser.add_argument_group("monitoring")
+    watch.add_argument("--monitor", action="store_true",
+                       help="Keep running, re-check every --interval seconds and serve Prometheus metrics")
+    watch.add_argument("--interval", type=float, default=60, help="Seconds between monitoring cycles (default: 60)")
+    watch.add_argument("--listen", default=":9300", help="HOST:PORT for the /metrics endpoint (default: :9300)")
+    bench = parser.add_argument_group("benchmark")
+    bench.add_argument("--benchmark", action="store_true",
+                       help="After the checks, run short workloads against each passing component")
+    bench.add_argument("--output", default="-", help="Where to write the JSON benchmark report (default: stdout)")
+    bench.add_argument("--bench-ops", type=int, default=200, help="Operations per workload (default: 200)")
+    bench.add_argument("--bench-concurrency", type=int, default=4, help="Concurrent clients per workload (default: 4)")
+    bench.add_argument("--bench-duration", type=float, default=30,
+                       help="Time limit in seconds for each workload (default: 30)")
+    bench.add_argument("--bench-batch", type=int, default=100,
+                       help="Rows per INSERT/SELECT for postgres and rqlite (default: 100)")
+    bench.add_argument("--bench-object-sizes", default="4KiB,1MiB",
+                       type=lambda v: [benchmark.parse_size(s) for s in v.split(",")],
+                       help="Comma-separated S3 object sizes (default: 4KiB,1MiB)")
+    bench.add_argument("--nfs-path", default=os.environ.get("NFS_BENCH_PATH"),
+                       help="Local mount of the storagebox NFS export to benchmark (default: $NFS_BENCH_PATH)")
+    bench.add_argument("--nfs-file-size", default="64MiB", type=benchmark.parse_size,
+                       help="Size of the NFS scratch file (default: 64MiB)")
     args = parser.parse_args()
 
     if args.debug:
         logging.getLogger().setLevel(logging.DEBUG)
 
+    global _api, _wait_ready, _rqlite_burst, _rqlite_max_lag
+    _wait_ready = args.wait_ready
+    _rqlite_burst = args.rqlite_burst
+    _rqlite_max_lag = args.rqlite_max_lag
+    if args.backend == "api":
+        try:
+            _api = kube_api.KubeClient(args.kubeconfig)
+        except (kube_api.KubeApiError, OSError) as exc:
+            log.error("Cannot use the Kubernetes API backend: %s", exc)
+            sys.exit(1)
+
     targets = args.components or list(COMPONENTS.keys())
-    results = {}
+    # Discovery and port-forward setup happen outside the per-component retry
+    # loops, so leave them some headroom beyond --timeout
+    deadline = args.deadline if args.deadline is not None else args.timeout + 30
+    timeout = min(args.timeout, deadline)
 
-    for name in targets:
-        log.info("--- Testing %s ---", name)
+    if args.monitor:
+        def cycle():
+            _latencies.clear()
+            _forget_services()
+            results = run_checks(targets, args.namespace, args.kubeconfig, timeout, deadline)
+            return {name: (r.ok, r.seconds) for name, r in results.items()}, dict(_latencies)
+
+        metrics = monitor.Metrics("storagebox_smoke")
+        server = monitor.serve(metrics, args.listen)
         try:
-            ok = COMPONENTS[name](args.namespace, args.kubeconfig, args.timeout)
-        except Exception as exc:
-            log.error("[%s] unexpected error: %s", name, exc)
-            ok = False
-        results[name] = ok
-        status = "PASS" if ok else "FAIL"
-        log.info("[%s] %s", name, status)
-
-    log.info("--- Results ---")
-    all_pass = True
-    for name, ok in results.items():
-        status = "PASS" if ok else "FAIL"
-        log.info("  %-12s %s", name, status)
-        if not ok:
-            all_pass = False
+            monitor.run(cycle, metrics, args.interval)
+        finally:
+            server.shutdown()
+            shutdown()
+        sys.exit(0)
+
+    started = time.monotonic()
+    try:
+        results = run_checks(targets, args.namespace, args.kubeconfig, timeout, deadline)
+
+        log.info("--- Results (%.1fs) ---", time.monotonic() - started)
+        all_pass = True
+        for name, result in results.items():
+            status = "PASS" if result.ok else "FAIL"
+            protocol, latency = _latencies.get(name, (None, None))
+            handshake = f"  {protocol} {latency * 1000:.1f}ms" if protocol else ""
+            phases = " ".join(f"{phase}={seconds:.1f}s" for phase, seconds in result.phases.items())
+            log.info("  %-12s %s %7.1fs%s  [%s retries=%d]", name, status, result.seconds, handshake,
+                     phases, result.retries)
+            if not result.ok:
+                all_pass = False
+
+        if args.json:
+            reporting.write_json(args.json, "storagebox", list(results.values()),
+                                 elapsed=time.monotonic() - started, namespace=args.namespace)
+            log.info("JSON results written to %s", args.json)
+        if args.junit:
+            reporting.write_junit(args.junit, "storagebox", list(results.values()),
+                                  elapsed=time.monotonic() - started)
+            log.info("JUnit results written to %s", args.junit)
+
+        if args.benchmark:
+            passed = [name for name, result in results.items() if result.ok]
+            benchmarks = run_benchmarks(passed, args.namespace, args.kubeconfig, args)
+            write_report(args.output, {
+                "namespace": args.namespace,
+                "settings": {
+                    "ops": args.bench_ops,
+                    "concurrency": args.bench_concurrency,
+                    "duration": args.bench_duration,
+                    "batch": args.bench_batch,
+                    "object_sizes": args.bench_object_sizes,
+                    "nfs_file_size": args.nfs_file_size,
+                },
+                "components": {
+                    name: {
+                        "check": result.to_dict(),
+                        "benchmark": benchmarks.get(name, {"skipped": "check failed"}),
+                    }
+                    for name, result in results.items()
+                },
+            })
+            if any("error" in report for report in benchmarks.values()):
+                all_pass = False
+    finally:
+        shutdown()
 
     if all_pass:
         log.info("All component checks passed.")
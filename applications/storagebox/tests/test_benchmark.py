@@ -0,0 +1,100 @@
+"""Tests for benchmark.py's CQL workload against a stand-in CQL server.
+
+Run: pip install pytest -r requirements.txt && pytest test_benchmark.py
+"""
+
+import re
+import socket
+import struct
+import threading
+
+import pytest
+
+import benchmark
+
+HOST = "127.0.0.1"
+RESULT, VOID = 0x08, struct.pack("!i", 1)
+
+
+@pytest.fixture
+def cql():
+    """A CQL v4 server that records each QUERY and fails those matching ``server.fail``."""
+
+    class Server:
+        queries = []
+        fail = None
+
+    listener = socket.socket()
+    listener.bind((HOST, 0))
+    listener.listen()
+    Server.port = listener.getsockname()[1]
+
+    def reply(conn, stream, opcode, body):
+        conn.sendall(struct.pack("!BBhBI", 0x84, 0, stream, opcode, len(body)) + body)
+
+    def handle(conn):
+        with conn:
+            try:
+                while True:
+                    _, _, stream, opcode, length = struct.unpack("!BBhBI", benchmark.recv_exact(conn, 9))
+                    body = benchmark.recv_exact(conn, length)
+                    if opcode != benchmark.CQL_QUERY:
+                        reply(conn, stream, benchmark.CQL_READY, b"")
+                        continue
+                    statement = body[4:4 + struct.unpack("!i", body[:4])[0]].decode()
+                    if not statement.startswith("INSERT"):
+                        Server.queries.append(statement)
+                    if Server.fail and re.match(Server.fail, statement):
+                        message = b"refused"
+                        reply(conn, stream, benchmark.CQL_ERROR, struct.pack("!iH", 0x2400, len(message)) + message)
+                    else:
+                        reply(conn, stream, RESULT, VOID)
+            except ConnectionError:
+                pass
+
+    def accept():
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=handle, args=(conn,), daemon=True).start()
+
+    threading.Thread(target=accept, daemon=True).start()
+    yield Server
+    listener.close()
+
+
+def run(server):
+    return benchmark.bench_cql(HOST, server.port, None, None, ops=10, concurrency=2, duration=5)
+
+
+def keyspaces(queries):
+    return [re.search(r"KEYSPACE (\S+)", q).group(1) for q in queries if "KEYSPACE" in q]
+
+
+def test_cql_uses_a_keyspace_per_run(cql):
+    assert run(cql)["write"]["ops"] == 10
+    first = cql.queries[:]
+    assert first[0].startswith("CREATE KEYSPACE storagebox_bench_")
+    assert first[-1].startswith("DROP KEYSPACE storagebox_bench_")
+    assert not any("IF NOT EXISTS" in q or "IF EXISTS" in q for q in first)
+    assert len(set(keyspaces(first))) == 1
+
+    cql.queries.clear()
+    run(cql)
+    assert set(keyspaces(cql.queries)).isdisjoint(keyspaces(first))
+
+
+def test_cql_keyspace_is_dropped_when_the_run_fails(cql):
+    cql.fail = "CREATE TABLE"
+    with pytest.raises(benchmark.BenchmarkError):
+        run(cql)
+    assert [q.split(" ")[0] for q in cql.queries] == ["CREATE", "CREATE", "DROP"]
+
+
+def test_cql_keyspace_it_did_not_create_is_left_alone(cql):
+    cql.fail = "CREATE KEYSPACE"
+    with pytest.raises(benchmark.BenchmarkError, match="refused"):
+        run(cql)
+    assert len(cql.queries) == 1
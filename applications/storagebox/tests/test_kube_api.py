@@ -0,0 +1,159 @@
+"""Tests for kube_api.py against the fake API server in fake_kube_api.py.
+
+Run: pip install pytest -r requirements.txt && pytest test_kube_api.py
+"""
+
+import logging
+import socket
+import time
+
+import pytest
+
+import kube_api
+from fake_kube_api import FakeKubeApi, TOKEN, endpoint_slice
+
+
+@pytest.fixture
+def api(tmp_path):
+    with FakeKubeApi() as fake:
+        fake.client = kube_api.KubeClient(fake.kubeconfig(tmp_path / "kubeconfig"), timeout=5)
+        yield fake
+
+
+def test_load_kubeconfig(api, tmp_path):
+    config = kube_api.load_kubeconfig(str(tmp_path / "kubeconfig"))
+    assert config == {"server": api.url, "verify": True, "cert": None, "token": TOKEN}
+
+
+def test_resolve_service_port_follows_named_target_port(api):
+    api.services = [{
+        "metadata": {"name": "garage"},
+        "spec": {"selector": {"app": "garage"}, "ports": [{"port": 3903, "targetPort": "admin"}]},
+    }]
+    api.pods = [
+        {"metadata": {"name": "garage-0"}, "status": {"phase": "Pending"}},
+        {
+            "metadata": {"name": "garage-1"},
+            "status": {"phase": "Running"},
+            "spec": {"containers": [{"ports": [{"name": "admin", "containerPort": 13903}]}]},
+        },
+    ]
+    assert api.client.resolve_service_port("ns", "garage", 3903) == ("garage-1", 13903)
+
+
+# ---------------------------------------------------------------------------
+# Port-forward websocket
+# ---------------------------------------------------------------------------
+
+def test_websocket_handshake(api):
+    ws = api.client.port_forward_stream("ns", "pod-0", 5432)
+    try:
+        path, query, headers = api.requests[-1]
+        assert path == "/api/v1/namespaces/ns/pods/pod-0/portforward"
+        assert query == {"ports": "5432"}
+        assert headers["Sec-WebSocket-Protocol"] == kube_api.PORT_FORWARD_PROTOCOL
+        assert headers["Sec-WebSocket-Version"] == "13"
+        assert headers["Authorization"] == f"Bearer {TOKEN}"
+        # Port prefixes, little-endian, first on the data and then the error channel
+        assert ws.recv() == b"\x00" + (5432).to_bytes(2, "little")
+        assert ws.recv() == b"\x01" + (5432).to_bytes(2, "little")
+    finally:
+        ws.close()
+
+
+def test_websocket_handshake_rejects_bad_accept_key(api):
+    api.accept_key_override = "bm90IHRoZSByaWdodCBrZXk="
+    with pytest.raises(kube_api.KubeApiError, match="Sec-WebSocket-Accept"):
+        api.client.port_forward_stream("ns", "pod-0", 5432)
+
+
+def test_websocket_handshake_rejects_refused_upgrade(api):
+    api.client.config["token"] = "wrong"
+    with pytest.raises(kube_api.KubeApiError, match="upgrade refused.*401"):
+        api.client.port_forward_stream("ns", "pod-0", 5432)
+
+
+def _exchange(port, payloads):
+    with socket.create_connection(("127.0.0.1", port), timeout=5) as conn:
+        received = []
+        for payload in payloads:
+            conn.sendall(payload)
+            data = b""
+            while len(data) < len(payload):
+                chunk = conn.recv(65536)
+                if not chunk:
+                    break
+                data += chunk
+            received.append(data)
+        return received
+
+
+def test_port_forward_strips_port_prefixes(api):
+    forward = kube_api.ApiPortForward(api.client, "ns", "pod-0", 6379)
+    try:
+        # Bytes that look like a port prefix must come through on later frames
+        payloads = [b"PING\r\n", (6379).to_bytes(2, "little") + b"data", b"x" * 200_000]
+        assert _exchange(forward.local_port, payloads) == payloads
+        # One websocket per local connection, like kubectl
+        assert _exchange(forward.local_port, [b"again"]) == [b"again"]
+        assert sum(path.endswith("/portforward") for path, _, _ in api.requests) == 2
+    finally:
+        forward.terminate()
+        forward.wait(5)
+    assert forward.poll() == 0
+
+
+def test_port_forward_error_channel_closes_connection(api, caplog):
+    api.port_forward_error = "error forwarding port 5432: connection refused"
+    forward = kube_api.ApiPortForward(api.client, "ns", "pod-0", 5432)
+    try:
+        with caplog.at_level(logging.WARNING, logger="kube_api"):
+            with socket.create_connection(("127.0.0.1", forward.local_port), timeout=5) as conn:
+                assert conn.recv(1024) == b""
+        assert "connection refused" in caplog.text
+    finally:
+        forward.terminate()
+
+
+# ---------------------------------------------------------------------------
+# EndpointSlice list + watch
+# ---------------------------------------------------------------------------
+
+def test_wait_for_endpoints_ready_in_list(api):
+    api.slice_lists = [[endpoint_slice("svc-a", False), endpoint_slice("svc-b", True)]]
+    assert api.client.wait_for_endpoints("ns", "svc", timeout=5)
+    assert (api.lists, api.watches) == (1, 0)
+    path, query, _ = api.requests[-1]
+    assert path == "/apis/discovery.k8s.io/v1/namespaces/ns/endpointslices"
+    assert query == {"labelSelector": "kubernetes.io/service-name=svc"}
+
+
+def test_wait_for_endpoints_watches_from_list_resource_version(api):
+    api.slice_lists = [[endpoint_slice("svc-a", False)]]
+    api.watch_events = [
+        (0, {"type": "ADDED", "object": endpoint_slice("svc-b", False)}),
+        (0.1, {"type": "MODIFIED", "object": endpoint_slice("svc-a", True)}),
+    ]
+    assert api.client.wait_for_endpoints("ns", "svc", timeout=5)
+    assert (api.lists, api.watches) == (1, 1)
+    _, query, _ = api.requests[-1]
+    assert query["watch"] == "1"
+    assert query["resourceVersion"] == "1"
+
+
+def test_wait_for_endpoints_relists_after_watch_error(api):
+    api.slice_lists = [[endpoint_slice("svc-a", False)], [endpoint_slice("svc-a", True)]]
+    api.watch_events = [(0, {"type": "ERROR", "object": {"kind": "Status", "code": 410}})]
+    assert api.client.wait_for_endpoints("ns", "svc", timeout=5)
+    assert (api.lists, api.watches) == (2, 1)
+
+
+def test_wait_for_endpoints_deleted_slice_is_not_ready(api):
+    api.slice_lists = [[endpoint_slice("svc-a", False)]]
+    api.watch_events = [
+        (0, {"type": "MODIFIED", "object": endpoint_slice("svc-b", False)}),
+        (0, {"type": "DELETED", "object": endpoint_slice("svc-a", True)}),
+    ]
+    start = time.monotonic()
+    assert not api.client.wait_for_endpoints("ns", "svc", timeout=1)
+    assert time.monotonic() - start < 3
@@ -0,0 +1,201 @@
+"""Tests for smoke_test.py's protocol probes against local socket stand-ins.
+
+Run: pip install pytest -r requirements.txt && pytest test_probes.py
+"""
+
+import socket
+import struct
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import benchmark
+import smoke_test
+
+HOST = "127.0.0.1"
+
+
+@pytest.fixture
+def serve():
+    """Start a TCP server that hands each connection to *handler*; return its port."""
+    listeners = []
+
+    def start(handler):
+        listener = socket.socket()
+        listener.bind((HOST, 0))
+        listener.listen()
+        listeners.append(listener)
+
+        def accept():
+            while True:
+                try:
+                    conn, _ = listener.accept()
+                except OSError:
+                    return
+                with conn:
+                    try:
+                        handler(conn)
+                    except OSError:
+                        pass
+
+        threading.Thread(target=accept, daemon=True).start()
+        return listener.getsockname()[1]
+
+    yield start
+    for listener in listeners:
+        listener.close()
+
+
+# ---------------------------------------------------------------------------
+# Postgres
+# ---------------------------------------------------------------------------
+
+def postgres_server(answer):
+    def handler(conn):
+        assert benchmark.recv_exact(conn, 8) == struct.pack("!II", 8, 80877103)
+        conn.sendall(answer)
+
+    return handler
+
+
+@pytest.mark.parametrize("answer", [b"S", b"N"])
+def test_postgres_ssl_answer_passes(serve, answer):
+    assert smoke_test.probe_postgres(HOST, serve(postgres_server(answer))) >= 0
+
+
+def test_postgres_wrong_answer_fails(serve):
+    with pytest.raises(smoke_test.ProbeError, match="SSLRequest"):
+        smoke_test.probe_postgres(HOST, serve(postgres_server(b"E")))
+
+
+def test_postgres_closed_connection_fails(serve):
+    with pytest.raises(ConnectionError):
+        smoke_test.probe_postgres(HOST, serve(postgres_server(b"")))
+
+
+# ---------------------------------------------------------------------------
+# NFS (ONC RPC NULL call)
+# ---------------------------------------------------------------------------
+
+def nfs_server(reply_stat=0, accept_stat=0, xid_offset=0):
+    def handler(conn):
+        length = struct.unpack("!I", benchmark.recv_exact(conn, 4))[0] & 0x7FFFFFFF
+        call = benchmark.recv_exact(conn, length)
+        xid, msg_type, rpc_version, program = struct.unpack("!IIII", call[:16])
+        assert (msg_type, rpc_version, program) == (0, 2, smoke_test.NFS_PROGRAM)
+        # xid, REPLY, reply_stat, AUTH_NONE verifier, accept_stat (+ mismatch range)
+        reply = struct.pack("!IIIIII", (xid + xid_offset) % 2**32, 1, reply_stat, 0, 0, accept_stat)
+        if accept_stat == 2:
+            reply += struct.pack("!II", 3, 4)
+        conn.sendall(struct.pack("!I", 0x80000000 | len(reply)) + reply)
+
+    return handler
+
+
+@pytest.mark.parametrize("accept_stat", [0, 2], ids=["success", "prog_mismatch"])
+def test_nfs_accepted_reply_passes(serve, accept_stat):
+    assert smoke_test.probe_nfs(HOST, serve(nfs_server(accept_stat=accept_stat))) >= 0
+
+
+@pytest.mark.parametrize(
+    "server, message",
+    [
+        (nfs_server(reply_stat=1), "denied"),
+        (nfs_server(accept_stat=1), "accept_stat 1"),
+        (nfs_server(xid_offset=1), "does not match"),
+    ],
+    ids=["denied", "prog_unavail", "wrong_xid"],
+)
+def test_nfs_bad_reply_fails(serve, server, message):
+    with pytest.raises(smoke_test.ProbeError, match=message):
+        smoke_test.probe_nfs(HOST, serve(server))
+
+
+# ---------------------------------------------------------------------------
+# Cassandra (CQL native protocol v4)
+# ---------------------------------------------------------------------------
+
+def cql_server(replies):
+    """Answer each request frame with the next ``(opcode, body)`` in *replies*."""
+    def handler(conn):
+        for opcode, body in replies:
+            _, _, stream, _, length = struct.unpack("!BBhBI", benchmark.recv_exact(conn, 9))
+            benchmark.recv_exact(conn, length)
+            conn.sendall(struct.pack("!BBhBI", 0x84, 0, stream, opcode, len(body)) + body)
+
+    return handler
+
+
+SUPPORTED = (benchmark.CQL_SUPPORTED, struct.pack("!H", 0))
+
+
+@pytest.mark.parametrize("startup_reply", [benchmark.CQL_READY, benchmark.CQL_AUTHENTICATE])
+def test_cql_handshake_passes(serve, startup_reply):
+    port = serve(cql_server([SUPPORTED, (startup_reply, b"")]))
+    assert smoke_test.probe_cql(HOST, port) >= 0
+
+
+def test_cql_error_frame_fails(serve):
+    message = b"Bootstrapping"
+    error = (benchmark.CQL_ERROR, struct.pack("!iH", 0x1001, len(message)) + message)
+    with pytest.raises(smoke_test.ProbeError, match="0x1001: Bootstrapping"):
+        smoke_test.probe_cql(HOST, serve(cql_server([SUPPORTED, error])))
+
+
+def test_cql_unexpected_opcode_fails(serve):
+    with pytest.raises(smoke_test.ProbeError, match="SUPPORTED"):
+        smoke_test.probe_cql(HOST, serve(cql_server([(benchmark.CQL_READY, b"")])))
+
+
+# ---------------------------------------------------------------------------
+# Garage (S3 ListBuckets)
+# ---------------------------------------------------------------------------
+
+@pytest.fixture
+def s3():
+    """An HTTP server whose ListBuckets answer the test sets with ``server.reply``."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            status, body = server.reply(self.headers)
+            self.send_response(status)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((HOST, 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+ACCESS_DENIED = (403, b"<?xml version='1.0'?><Error><Code>AccessDenied</Code></Error>")
+BUCKETS = (200, b"<ListAllMyBucketsResult><Buckets/></ListAllMyBucketsResult>")
+
+
+def test_s3_signed_list_buckets_passes(s3):
+    s3.reply = lambda headers: BUCKETS if "AWS4-HMAC-SHA256" in headers["Authorization"] else ACCESS_DENIED
+    assert smoke_test.probe_s3(HOST, s3.server_port, "GK123", "secret") >= 0
+
+
+def test_s3_anonymous_access_denied_passes(s3):
+    s3.reply = lambda headers: ACCESS_DENIED
+    assert smoke_test.probe_s3(HOST, s3.server_port) >= 0
+
+
+def test_s3_signed_access_denied_fails(s3):
+    s3.reply = lambda headers: ACCESS_DENIED
+    with pytest.raises(smoke_test.ProbeError, match="HTTP 403"):
+        smoke_test.probe_s3(HOST, s3.server_port, "GK123", "wrong")
+
+
+def test_s3_non_s3_server_fails(s3):
+    s3.reply = lambda headers: (200, b"<html>It works!</html>")
+    with pytest.raises(smoke_test.ProbeError, match="HTTP 200"):
+        smoke_test.probe_s3(HOST, s3.server_port)
@@ -0,0 +1,74 @@
+"""Tests for smoke_test.py's rqlite check against a stand-in rqlite HTTP API.
+
+Run: pip install pytest -r requirements.txt && pytest test_rqlite.py
+"""
+
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import kube_api
+import smoke_test
+from fake_kube_api import FakeKubeApi
+
+STATUS = {"store": {"leader": {"addr": "rqlite-0:4002"},
+                    "raft": {"state": "Leader", "applied_index": 7, "commit_index": 7}}}
+NODES = {"nodes": [{"id": "rqlite-0", "api_addr": "http://10.1.2.3:4001", "leader": True,
+                    "voter": True, "reachable": True, "time": 0.001}]}
+
+
+@pytest.fixture
+def rqlite():
+    """An HTTP server answering /status and /nodes like a one-voter rqlite cluster."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = json.dumps(STATUS if self.path.startswith("/status") else NODES).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def cluster(tmp_path, monkeypatch, rqlite):
+    """Point smoke_test at a fake API server with no services, forwarding everything to *rqlite*."""
+    forwards = []
+
+    @contextmanager
+    def port_forward(namespace, service, remote_port, kubeconfig=None):
+        forwards.append(service)
+        yield rqlite.server_port
+
+    with FakeKubeApi() as fake:
+        monkeypatch.setattr(smoke_test, "_api", kube_api.KubeClient(fake.kubeconfig(tmp_path / "kubeconfig")))
+        monkeypatch.setattr(smoke_test, "_service_indexes", {})
+        monkeypatch.setattr(smoke_test, "port_forward", port_forward)
+        yield forwards
+
+
+def test_unmapped_voters_skip_the_lag_check(cluster, caplog):
+    # No rqlite service is found, so the fallback name has no selector to map voters to pods
+    with caplog.at_level(logging.WARNING):
+        assert smoke_test.check_rqlite("ns", None, timeout=5)
+    assert "could not map 1 voter(s) to pods" in caplog.text
+    assert set(cluster) == {"storagebox-rqlite"}
+
+
+def test_rqlite_lag_without_targets():
+    assert smoke_test._rqlite_lag("ns", None, {}) == ({}, 0)
@@ -0,0 +1,60 @@
+"""Tests for smoke_test.py's shutdown: the port-forwarder and check threads.
+
+Run: pip install pytest -r requirements.txt && pytest test_shutdown.py
+"""
+
+import threading
+import time
+
+import pytest
+
+import kube_api
+import smoke_test
+from fake_kube_api import FakeKubeApi
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    with FakeKubeApi() as fake:
+        monkeypatch.setattr(smoke_test, "_api", kube_api.KubeClient(fake.kubeconfig(tmp_path / "kubeconfig")))
+        yield fake
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(smoke_test, "_forwarder", smoke_test.PortForwarder())
+    monkeypatch.setattr(smoke_test, "_cancel", threading.Event())
+    monkeypatch.setattr(smoke_test, "_workers", [])
+
+
+def test_closed_forwarder_refuses_new_forwards(api):
+    forwarder = smoke_test._forwarder
+    forwarder.get("ns", "pod/pod-0", 5432)
+    forwarder.close()
+    with pytest.raises(RuntimeError, match="shutting down"):
+        forwarder.get("ns", "pod/pod-0", 5432)
+    assert forwarder._forwards == {}
+
+
+def test_shutdown_cancels_and_joins_running_checks(api, monkeypatch):
+    attempts = []
+
+    def never_passes(namespace, kubeconfig, timeout):
+        def probe(lp):
+            attempts.append(lp)
+            return False
+
+        return smoke_test._retry_port_forward("stuck", namespace, "pod/pod-0", 5432, kubeconfig, timeout, probe)
+
+    monkeypatch.setitem(smoke_test.COMPONENTS, "stuck", never_passes)
+    results = smoke_test.run_checks(["stuck"], "ns", None, timeout=60, deadline=0.5)
+    assert not results["stuck"].ok
+    [worker] = smoke_test._workers
+    assert worker.is_alive()
+
+    start = time.monotonic()
+    smoke_test.shutdown(grace=5)
+    assert not worker.is_alive()
+    assert time.monotonic() - start < 5
+    assert attempts
+    assert smoke_test._forwarder._forwards == {}